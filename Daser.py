@@ -1,80 +1,427 @@
 import os
+import sys
+
+# "python Daser.py lote ..." es la carga por lotes sin interfaz: se atiende antes
+# de importar customtkinter y tkinter, que en un servidor sin Tk no están
+if __name__ == "__main__" and len(sys.argv) > 1 and sys.argv[1] == "lote":
+    from aserradero.cli import main
+    sys.exit(main(sys.argv[1:]))
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
 import pandas as pd
 import customtkinter as ctk
 from tkinter import messagebox
 from tkinter import ttk
 from tkinter.filedialog import asksaveasfilename
-from plotly.subplots import make_subplots
-import plotly.graph_objects as go
-import plotly.express as px
-import plotly.io as pio
 import webbrowser
 
-def cargar_datos_seleccionados(carpeta_seleccionada):
-    try:
-        # Leer los archivos .txt
-        corr_file = os.path.join(carpeta_seleccionada, "Corr.txt")
-        registro_laser_file = os.path.join(carpeta_seleccionada, "registro_laser.txt") #Reemplazar si se quiere leer otro archivo
-        velocidad_file = os.path.join(carpeta_seleccionada, "Velocidad.txt")
-
-        # Cargar archivos con delimitadores y manejo de errores
-        corr_df = pd.read_csv(corr_file, sep=r'\s+', engine='python',on_bad_lines='skip')
-        registro_laser_df = pd.read_csv(registro_laser_file, sep=r'\s+', engine='python',on_bad_lines='skip')
-        velocidad_df = pd.read_csv(velocidad_file, sep=r'\s+', engine='python',on_bad_lines='skip')
-
-        # Convertir columnas relevantes a valores numéricos
-        for df , numeric_cols in zip([corr_df, registro_laser_df, velocidad_df], [["Corriente"], ["Temperatura(°C)","Distancia(mm)"], ["Milliseconds"]]):
-            for col in numeric_cols:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)  # Reemplazar NaN con 0
-
-        # Combinar columnas de fecha y hora en cada archivo
-        corr_df['datetime'] = pd.to_datetime(corr_df['Fecha'] + ' ' + corr_df['Hora'])
-        registro_laser_df['datetime'] = pd.to_datetime(registro_laser_df['Fecha'] + ' ' + registro_laser_df['Hora'])
-        velocidad_df['datetime'] = pd.to_datetime(velocidad_df['Date'] + ' ' + velocidad_df['Time'])
-
-        # Renombrar columna "Pulse" de Velocidad.txt a "Velocidad del carro"
-        velocidad_df.rename(columns={"Milliseconds": "Velocidad (ms)"}, inplace=True)
-
-        # Eliminar duplicados en la columna datetime
-        corr_df = corr_df.drop_duplicates(subset='datetime')
-        registro_laser_df = registro_laser_df.drop_duplicates(subset='datetime')
-        velocidad_df = velocidad_df.drop_duplicates(subset='datetime')
-
-        # Unir los DataFrames en base a la columna 'datetime'
-        merged_df = pd.merge(corr_df, registro_laser_df, on='datetime', how='outer')
-        merged_df = pd.merge(merged_df, velocidad_df, on='datetime', how='outer')
-
-        # Reemplazar valores faltantes con 0
-        merged_df.fillna(0, inplace=True)
-
-        # Filtrar filas donde todas las variables sean 0 (excepto datetime)
-        columnas_a_verificar = ['Corriente', 'Temperatura(ºC)', 
-                                'Distancia(mm)', 'Madera','Velocidad (ms)']
-        merged_df = merged_df[~(merged_df[columnas_a_verificar] == 0).all(axis=1)]
-
-        # Separar la columna datetime en fecha y hora
-        merged_df['fecha'] = merged_df['datetime'].dt.date
-        merged_df['hora'] = merged_df['datetime'].dt.time
-
-        #ordenar los datos según la hora
-        merged_df.sort_values(by='hora', inplace=True)
-
-        # Reordenar columnas para mayor claridad
-        columnas_ordenadas = ['fecha', 'hora', 'Corriente', 'Velocidad (ms)', 'Temperatura(ºC)', 
-                              'Distancia(mm)', 'Madera']
-        merged_df = merged_df[columnas_ordenadas]
-
-        return merged_df
-    except Exception as e:
-        messagebox.showerror("Error", f"No se pudieron cargar los datos: {e}")
-        return pd.DataFrame()
+# matplotlib es opcional: con él los gráficos se dibujan dentro de la ventana;
+# sin él se escriben como HTML y se abren en el navegador
+try:
+    import matplotlib.dates as mdates
+    from matplotlib.collections import PolyCollection
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+    from matplotlib.figure import Figure
+except ImportError:
+    Figure = None
+
+# Toda la lógica de carga y análisis vive en el paquete aserradero; este archivo
+# es solo la interfaz gráfica. plotly se importa al graficar por primera vez
+from aserradero import (ARCHIVO_DIAGNOSTICO, COLOR_ANOMALIA, COLUMNAS_EXPORTACION, DIRECTORIO_INFORMES, JORNADAS,
+                        PUNTOS_GRAFICO, RESOLUCIONES, VARIABLES_TABLA, ConsultaTiempo, SeguidorEnVivo, Tarea,
+                        TareaCancelada, actualizar_historial, actualizar_indice, anomalias_por_tabla, archivar_carpeta,
+                        buscar_carpetas, cargar_lote, cargar_sesion, cargar_ultima_sesion, cargar_ventana,
+                        carpetas_con_fecha, carpetas_en_rango, con_fecha_hora, configuracion_diagnostico,
+                        configurar_diagnostico, consultar_tablas, detalles_tabla, detectar_anomalias, ejecucion,
+                        escribir_grafico, etapa, exportar_sesion, exportar_tablas, extender_reduccion, fecha_carpeta,
+                        figura_series, filas_diagnostico, hora_a_ns, informes_carpetas, informes_sesion, reducir_serie,
+                        reducir_tramo, resumen_anomalias, resumen_carpeta, resumen_historial, resumen_informe_carga,
+                        resumen_memoria, serie_historial, tablas_sesion, ultimas_ejecuciones)
+
+# Sesión cargada actualmente (datos combinados de la carpeta seleccionada)
+datos_completos_global = None
+
+# Carpetas que se ofrecen sin búsqueda (las modificadas más recientemente) y como máximo al buscar
+CARPETAS_RECIENTES = 7
+CARPETAS_BUSQUEDA = 50
+
+# Opciones de la interfaz para la agregación en la grilla común
+AGREGACIONES_MENU = {"Promedio": "mean", "Máximo": "max", "Último": "last"}
+
+# Partición de la exportación de datos filtrados y tipos de archivo que se ofrecen
+PARTICIONES_MENU = {"Un archivo": None, "Un archivo por tabla": "tabla", "Un archivo por jornada": "jornada"}
+TIPOS_EXPORTACION = [("Texto separado por tabulaciones", "*.txt"), ("CSV comprimido", "*.csv.gz"), ("CSV", "*.csv"),
+                     ("Parquet", "*.parquet"), ("Feather", "*.feather")]
+
+# Archivos HTML de cada gráfico (sin matplotlib)
+ARCHIVOS_GRAFICO = {"completo": "temp_plot_completo.html", "filtrado": "temp_plot_filtrado.html",
+                    "tabla": "temp_plot_all_variables.html", "historial": "temp_plot_historial.html"}
+
+# Tendencias del historial: por tabla (columna de las estadísticas) o por minuto (señal)
+TENDENCIAS_HISTORIAL = {
+    "Duración de corte por tabla": ("tabla", "duracion"),
+    "Corriente máxima por tabla": ("tabla", "Corriente_Max"),
+    "Corriente integrada por tabla": ("tabla", "Corriente_Integrada"),
+    "Temperatura máxima por tabla": ("tabla", "Temperatura_Max"),
+    "Corriente por minuto": ("senal", "Corriente"),
+    "Corriente máxima por minuto": ("senal", "Corriente_Max"),
+    "Temperatura por minuto": ("senal", "Temperatura"),
+    "Distancia por minuto": ("senal", "Distancia"),
+}
+
+class TablaVirtual:
+    # Treeview que solo crea los ítems de las filas visibles y los rellena desde
+    # el DataFrame al desplazarse; cambiar los datos no reinserta nada
+
+    def __init__(self, padre, columnas, alto_fila=20):
+        self.datos = pd.DataFrame(columns=columnas)
+        self.inicio = 0
+        self.visibles = 1
+        self.alto_fila = alto_fila
+        self.eventos = None
+
+        marco = ttk.Frame(padre)
+        marco.pack(fill="both", expand=True)
+
+        self.tree = ttk.Treeview(marco, columns=list(columnas), show="headings")
+        for col in columnas:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, anchor="center")
+
+        self.scrollbar_y = ttk.Scrollbar(marco, orient="vertical", command=self._desplazar)
+        self.scrollbar_y.pack(side="right", fill="y")
+
+        scrollbar_x = ttk.Scrollbar(marco, orient="horizontal", command=self.tree.xview)
+        scrollbar_x.pack(side="bottom", fill="x")
+        self.tree.configure(xscrollcommand=scrollbar_x.set)
+
+        self.tree.pack(expand=True, fill="both")
+        self.tree.tag_configure("anomalia", background=COLOR_ANOMALIA)
+
+        # Paginación y contador de filas
+        pie = ttk.Frame(padre)
+        pie.pack(fill="x")
+        ttk.Button(pie, text="◀ Anterior", command=lambda: self._desplazar("scroll", -1, "pages")).pack(side="left", padx=5)
+        ttk.Button(pie, text="Siguiente ▶", command=lambda: self._desplazar("scroll", 1, "pages")).pack(side="left", padx=5)
+        self.estado = ttk.Label(pie, text="")
+        self.estado.pack(side="left", padx=10)
+
+        self.tree.bind("<Configure>", self._redimensionar)
+        self.tree.bind("<MouseWheel>", lambda e: self._desplazar("scroll", -1 if e.delta > 0 else 1, "units"))
+        self.tree.bind("<Button-4>", lambda e: self._desplazar("scroll", -1, "units"))
+        self.tree.bind("<Button-5>", lambda e: self._desplazar("scroll", 1, "units"))
+
+    def mostrar(self, datos, conservar_posicion=False):
+        self.datos = datos
+        if conservar_posicion:
+            self.inicio = min(self.inicio, max(0, len(datos) - self.visibles))
+        else:
+            self.inicio = 0
+        self._refrescar()
+
+    def marcar(self, eventos):
+        # Resaltar las filas que caen dentro de una anomalía. Los eventos pueden
+        # solaparse (corriente y temperatura): se guarda el mayor fin hasta cada inicio
+        if eventos is None or eventos.empty:
+            self.eventos = None
+        else:
+            fines = np.maximum.accumulate(eventos["fin"].to_numpy(dtype="datetime64[ns]"))
+            self.eventos = (eventos["inicio"].to_numpy(dtype="datetime64[ns]"), fines)
+        self._refrescar()
+
+    def _filas_marcadas(self, indice):
+        if self.eventos is None:
+            return np.zeros(len(indice), dtype=bool)
+        inicios, fines = self.eventos
+        tiempos = indice.to_numpy(dtype="datetime64[ns]")
+        posicion = np.searchsorted(inicios, tiempos, side="right") - 1
+        return (posicion >= 0) & (tiempos <= fines[np.maximum(posicion, 0)])
+
+    def _redimensionar(self, evento):
+        # Restar el alto aproximado de la fila de encabezados
+        visibles = max(1, (evento.height - self.alto_fila) // self.alto_fila)
+        if visibles != self.visibles:
+            self.visibles = visibles
+            self._refrescar()
+
+    def _desplazar(self, accion, cantidad, unidad=None):
+        total = len(self.datos)
+        if accion == "moveto":
+            inicio = int(float(cantidad) * total)
+        else:
+            paso = self.visibles if unidad == "pages" else 3
+            inicio = self.inicio + int(cantidad) * paso
+        self.inicio = min(max(0, inicio), max(0, total - self.visibles))
+        self._refrescar()
+        return "break"
+
+    def _refrescar(self):
+        total = len(self.datos)
+        fin = min(self.inicio + self.visibles, total)
+        with etapa("tabla", fin - self.inicio):
+            # Solo las filas visibles: fecha y hora salen del índice y los float32 se
+            # escriben con su representación corta (15.97 y no 15.970000267)
+            bloque = con_fecha_hora(self.datos.iloc[self.inicio:fin])
+            valores = [bloque[col].to_numpy() for col in bloque.columns]
+            filas = zip(*[columna.astype(str) if columna.dtype.kind == "f" else columna for columna in valores])
+            marcadas = self._filas_marcadas(bloque.index)
+
+            # Reutilizar los ítems existentes y crear o borrar solo la diferencia
+            items = self.tree.get_children()
+            for i, fila in enumerate(filas):
+                etiquetas = ("anomalia",) if marcadas[i] else ()
+                if i < len(items):
+                    self.tree.item(items[i], values=list(fila), tags=etiquetas)
+                else:
+                    self.tree.insert("", "end", values=list(fila), tags=etiquetas)
+            if len(items) > fin - self.inicio:
+                self.tree.delete(*items[fin - self.inicio:])
+
+        if total:
+            self.scrollbar_y.set(self.inicio / total, fin / total)
+            paginas = -(-total // self.visibles)
+            pagina = self.inicio // self.visibles + 1
+            self.estado.configure(text=f"Filas {self.inicio + 1}–{fin} de {total}   ·   Página {pagina} de {paginas}")
+        else:
+            self.scrollbar_y.set(0, 1)
+            self.estado.configure(text="Sin filas")
+
+
+def _medir_tarea(nombre, funcion, *args, **kwargs):
+    # Cada tarea en segundo plano queda en el diagnóstico con el tiempo de sus etapas
+    with ejecucion(nombre):
+        return funcion(*args, **kwargs)
+
+
+class GraficoIntegrado:
+    # Un único gráfico de matplotlib dentro de la ventana. Cambiar de variable, de
+    # filtro o de tabla solo reemplaza los datos de las líneas existentes; al hacer
+    # zoom se vuelve a reducir el tramo visible desde la serie completa y en vivo
+    # se reduce solo lo que llegó
+
+    def __init__(self, padre):
+        self.figura = Figure(figsize=(10, 4), dpi=100, layout="constrained")
+        self.lienzo = FigureCanvasTkAgg(self.figura, master=padre)
+        self.barra = NavigationToolbar2Tk(self.lienzo, padre, pack_toolbar=False)
+        self.barra.pack(side="bottom", fill="x")
+        self.lienzo.get_tk_widget().pack(side="top", fill="both", expand=True)
+        self.ejes = []
+        self.lineas = []
+        self.marcas = []
+        self.series = []
+        self.reducidas = []
+        self.titulo = ""
+        self.puntos = PUNTOS_GRAFICO
+        self.zoom = None
+        self._ajustando = False
+        self._pendiente = False
+
+    def mostrar(self, series, titulo="", puntos=PUNTOS_GRAFICO, conservar_zoom=False, eventos=None):
+        with ejecucion("Gráfico integrado", sum(len(serie) for serie in series)):
+            self.series = series
+            self.titulo = titulo
+            self.puntos = puntos
+            if len(self.ejes) != len(series):
+                self._crear_ejes(len(series))
+            if not conservar_zoom:
+                self.zoom = None
+            self.reducidas = [self._tramo(serie) for serie in series]
+            for ejes, linea, marcas, serie, reducida in zip(self.ejes, self.lineas, self.marcas, series, self.reducidas):
+                linea.set_data(*self._coordenadas(reducida))
+                marcas.set_verts(self._franjas(serie, eventos))
+                ejes.set_ylabel(serie.name)
+            self.figura.suptitle(titulo)
+            self._ajustar_limites()
+            if not conservar_zoom:
+                self.barra.update()  # La vista inicial del botón "Inicio" pasa a ser la nueva
+            self.lienzo.draw_idle()
+
+    def extender(self, series, desde, eventos=None):
+        # Modo en vivo: las series son las mismas de antes con datos nuevos a
+        # partir del instante `desde`. Sin zoom se agrega lo nuevo, reducido, a
+        # las líneas actuales; con zoom se reduce de nuevo el tramo visible
+        if self.zoom is not None or [serie.name for serie in series] != [serie.name for serie in self.reducidas]:
+            self.mostrar(series, self.titulo, self.puntos, conservar_zoom=True, eventos=eventos)
+            return
+        with ejecucion("Gráfico en vivo"):
+            self.series = series
+            self.reducidas = [extender_reduccion(reducida, serie, desde, self.puntos)
+                              for reducida, serie in zip(self.reducidas, series)]
+            for linea, marcas, serie, reducida in zip(self.lineas, self.marcas, series, self.reducidas):
+                linea.set_data(*self._coordenadas(reducida))
+                marcas.set_verts(self._franjas(serie, eventos))
+            self._ajustar_limites()
+            self.lienzo.draw_idle()
+
+    def _ajustar_limites(self):
+        # Los límites que ajusta el programa no cuentan como zoom del usuario
+        self._ajustando = True
+        try:
+            for ejes in self.ejes:
+                ejes.relim()
+                ejes.autoscale_view()
+            if self.zoom is not None:
+                self.ejes[0].set_xlim(*self.zoom)
+        finally:
+            self._ajustando = False
+
+    def _crear_ejes(self, cantidad):
+        self.figura.clear()
+        self.ejes = list(self.figura.subplots(cantidad, 1, sharex=True, squeeze=False)[:, 0])
+        self.lineas = [ejes.plot([], [], linewidth=0.8)[0] for ejes in self.ejes]
+        # Franjas de alto completo (x en fechas, y en fracción del eje) que no
+        # cuentan para el autoescalado
+        self.marcas = []
+        for ejes in self.ejes:
+            marcas = PolyCollection([], facecolors=COLOR_ANOMALIA, edgecolors="none", zorder=0,
+                                    transform=ejes.get_xaxis_transform())
+            ejes.add_collection(marcas, autolim=False)
+            self.marcas.append(marcas)
+        for ejes in self.ejes:
+            ejes.xaxis_date()
+            ejes.grid(True, alpha=0.3)
+            ejes.callbacks.connect("xlim_changed", self._al_cambiar_limites)
+
+    def _franjas(self, serie, eventos):
+        # Una franja por anomalía de esta variable dentro del rango de la serie;
+        # las más cortas se ensanchan a un segundo, centradas, para que se vean
+        if eventos is None or eventos.empty or serie.empty:
+            return []
+        eventos = eventos[(eventos["variable"] == serie.name) & (eventos["fin"] >= serie.index[0])
+                          & (eventos["inicio"] <= serie.index[-1])]
+        inicios = mdates.date2num(eventos["inicio"].to_numpy())
+        fines = mdates.date2num(eventos["fin"].to_numpy())
+        margen = np.maximum(1 / 86400 - (fines - inicios), 0) / 2
+        inicios, fines = inicios - margen, fines + margen
+        return [[(x0, 0), (x0, 1), (x1, 1), (x1, 0)] for x0, x1 in zip(inicios, fines)]
+
+    def _tramo(self, serie):
+        desde = hasta = None
+        if self.zoom is not None:
+            desde, hasta = (pd.Timestamp(mdates.num2date(limite)).tz_convert(None) for limite in self.zoom)
+        return reducir_tramo(serie, desde, hasta, self.puntos)
+
+    def _coordenadas(self, reducida):
+        return mdates.date2num(reducida.index.to_numpy()), reducida.to_numpy()
+
+    def _al_cambiar_limites(self, ejes):
+        # Desplazar o hacer zoom genera muchos eventos seguidos: se reduce una vez
+        # cuando Tk queda libre
+        if self._ajustando or self._pendiente:
+            return
+        self._pendiente = True
+        self.lienzo.get_tk_widget().after_idle(self._reducir_visible)
+
+    def _reducir_visible(self):
+        self._pendiente = False
+        if not self.ejes:
+            return
+        desde, hasta = self.ejes[0].get_xlim()
+        self.zoom = (desde, hasta)
+        # Si se ve toda la serie no hay zoom: así en vivo el gráfico sigue creciendo
+        indice = self.series[0].index if self.series and len(self.series[0]) else None
+        if indice is None or (desde <= mdates.date2num(indice[0]) and hasta >= mdates.date2num(indice[-1])):
+            self.zoom = None
+        with ejecucion("Zoom del gráfico"):
+            self.reducidas = [self._tramo(serie) for serie in self.series]
+            for linea, reducida in zip(self.lineas, self.reducidas):
+                linea.set_data(*self._coordenadas(reducida))
+            self.lienzo.draw_idle()
+
+
+class EjecutorTareas:
+    # Ejecuta las tareas en un pool de hilos y entrega los resultados en el hilo
+    # de Tk mediante ventana.after(), para que la interfaz nunca se bloquee
+
+    def __init__(self, ventana, al_progreso=None, max_trabajadores=2, intervalo_ms=100):
+        self.ventana = ventana
+        self.al_progreso = al_progreso
+        self.intervalo_ms = intervalo_ms
+        self.pool = ThreadPoolExecutor(max_workers=max_trabajadores, thread_name_prefix="daser")
+        self.pendientes = []
+        self._revisando = False
+
+    def enviar(self, funcion, *args, nombre="Procesando", al_terminar=None, al_error=None, **kwargs):
+        tarea = Tarea(nombre)
+        tarea.futuro = self.pool.submit(_medir_tarea, nombre, funcion, *args, progreso=tarea.progreso, **kwargs)
+        self.pendientes.append((tarea, al_terminar, al_error))
+        if not self._revisando:
+            self._revisando = True
+            self.ventana.after(self.intervalo_ms, self._revisar)
+        return tarea
+
+    def _revisar(self):
+        actuales, self.pendientes = self.pendientes, []
+        siguen = []
+        for tarea, al_terminar, al_error in actuales:
+            if not tarea.futuro.done():
+                siguen.append((tarea, al_terminar, al_error))
+                continue
+            if tarea.futuro.cancelled():
+                continue
+            error = tarea.futuro.exception()
+            if isinstance(error, TareaCancelada):
+                continue
+            if error is not None:
+                if al_error is not None:
+                    al_error(error)
+                else:
+                    messagebox.showerror("Error", f"{tarea.nombre}: {error}")
+            elif al_terminar is not None:
+                al_terminar(tarea.futuro.result())
+
+        # Las tareas creadas desde los callbacks quedan al final de la lista
+        self.pendientes = siguen + self.pendientes
+        if self.al_progreso is not None:
+            self.al_progreso(self.pendientes[-1][0] if self.pendientes else None)
+        if self.pendientes:
+            self.ventana.after(self.intervalo_ms, self._revisar)
+        else:
+            self._revisando = False
+
+    def cancelar_todas(self):
+        for tarea, _, _ in self.pendientes:
+            tarea.cancelar()
+
+    def cerrar(self):
+        self.cancelar_todas()
+        self.pool.shutdown(wait=False, cancel_futures=True)
 
 def crear_interfaz():
     ventana = ctk.CTk()
     ventana.title("Selector de Carpetas y Visualización de Datos")
     ventana.geometry("1200x800")
 
+    # Barra de estado con el progreso de las tareas en segundo plano
+    estado_frame = ctk.CTkFrame(ventana)
+    estado_frame.pack(side="bottom", fill="x")
+    estado_label = ctk.CTkLabel(estado_frame, text="Listo")
+    estado_label.pack(side="left", padx=10)
+    barra_progreso = ctk.CTkProgressBar(estado_frame, width=300)
+    barra_progreso.set(0)
+    barra_progreso.pack(side="left", padx=10)
+
+    def mostrar_progreso(tarea):
+        if tarea is None:
+            estado_label.configure(text="Listo")
+            barra_progreso.set(0)
+        else:
+            fraccion, mensaje = tarea.estado
+            estado_label.configure(text=mensaje)
+            barra_progreso.set(fraccion)
+
+    ejecutor = EjecutorTareas(ventana, al_progreso=mostrar_progreso)
+    ctk.CTkButton(estado_frame, text="Cancelar", width=100, command=ejecutor.cancelar_todas).pack(side="left", padx=10)
+
+    def cerrar_ventana():
+        detener_en_vivo()
+        ejecutor.cerrar()
+        ventana.destroy()
+
+    ventana.protocol("WM_DELETE_WINDOW", cerrar_ventana)
+
     tabview = ctk.CTkTabview(ventana, width=1200, height=800)
     tabview.pack(expand=True, fill="both")
 
@@ -82,20 +429,41 @@ def crear_interfaz():
     visualizar_tab = tabview.add("Visualizar Datos")
     graficos_tab = tabview.add("Visualizar Gráficos")
     parametros_tab = tabview.add("Visualizar parámetros por tabla")
+    historial_tab = tabview.add("Historial")
+    diagnostico_tab = tabview.add("Diagnóstico")
+
+    # Índice de las carpetas de la ruta base (nombre -> fechas, filas y archivos)
+    indice_carpetas = {"ruta_base": None, "carpetas": {}}
 
     def cargar_carpetas():
         ruta_base = ruta_base_var.get()
         if not os.path.isdir(ruta_base):
             messagebox.showerror("Error", "La ruta base ingresada no es válida.")
             return
-        try:
-            carpetas = sorted([f for f in os.listdir(ruta_base) if os.path.isdir(os.path.join(ruta_base, f))],
-                              key=lambda x: os.path.getmtime(os.path.join(ruta_base, x)),
-                              reverse=True)[:7]
-            selectdown.configure(values=carpetas)
-            messagebox.showinfo("Éxito", "Carpetas cargadas correctamente.")
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudieron cargar las carpetas: {e}")
+
+        # La primera vez cuenta las líneas de cada archivo; después solo revisa
+        # las carpetas que cambiaron, así que suele ser inmediato
+        def carpetas_indexadas(carpetas):
+            indice_carpetas.update(ruta_base=ruta_base, carpetas=carpetas)
+            filtrar_carpetas()
+            messagebox.showinfo("Éxito", f"Carpetas cargadas correctamente ({len(carpetas)} en total).")
+
+        ejecutor.enviar(actualizar_indice, ruta_base, nombre="Indexando carpetas", al_terminar=carpetas_indexadas,
+                        al_error=lambda e: messagebox.showerror("Error", f"No se pudieron cargar las carpetas: {e}"))
+
+    def filtrar_carpetas(*_):
+        # Búsqueda sobre el índice en memoria, en cada tecla
+        texto = buscar_var.get()
+        encontradas = buscar_carpetas(indice_carpetas["carpetas"], texto)
+        nombres = [carpeta["nombre"] for carpeta in encontradas[:CARPETAS_BUSQUEDA if texto else CARPETAS_RECIENTES]]
+        selectdown.configure(values=nombres)
+        if texto and nombres:
+            carpeta_seleccionada_var.set(nombres[0])
+        buscar_estado.configure(text=f"{len(encontradas)} carpetas coinciden" if texto else "")
+
+    def mostrar_carpeta_seleccionada(*_):
+        carpeta = indice_carpetas["carpetas"].get(carpeta_seleccionada_var.get())
+        carpeta_info.configure(text=resumen_carpeta(carpeta) if carpeta else "")
 
 
 
@@ -117,9 +485,16 @@ def crear_interfaz():
     selectdown = ctk.CTkOptionMenu(seleccionar_tab, variable=carpeta_seleccionada_var)
     selectdown.pack(pady=10)
 
+    carpeta_info = ctk.CTkLabel(seleccionar_tab, text="")
+    carpeta_info.pack()
+    carpeta_seleccionada_var.trace_add("write", mostrar_carpeta_seleccionada)
+
     buscar_var = ctk.StringVar()
     buscar_entry = ctk.CTkEntry(seleccionar_tab, textvariable=buscar_var, placeholder_text="Buscar carpeta por nombre")
     buscar_entry.pack(pady=10)
+    buscar_estado = ctk.CTkLabel(seleccionar_tab, text="")
+    buscar_estado.pack()
+    buscar_var.trace_add("write", filtrar_carpetas)
 
 
     def cargar_datos():
@@ -131,30 +506,342 @@ def crear_interfaz():
         if not os.path.isdir(carpeta_seleccionada):
             messagebox.showwarning("Advertencia", "Por favor selecciona una carpeta válida.")
             return
-        datos = cargar_datos_seleccionados(carpeta_seleccionada)
-        if not datos.empty:
+        exportar_txt = exportar_txt_var.get()
+
+        # La carga se hace en segundo plano; se puede seguir usando la sesión actual
+        ejecutor.enviar(cargar_sesion, carpeta_seleccionada, RESOLUCIONES[resolucion_var.get()],
+                        AGREGACIONES_MENU[agregacion_var.get()],
+                        nombre=f"Cargando {carpeta_seleccionada_var.get()}",
+                        al_terminar=lambda datos: sesion_cargada(datos, ruta_base, exportar_txt,
+                                                                 [carpeta_seleccionada]),
+                        al_error=lambda e: messagebox.showerror("Error", f"No se pudieron cargar los datos: {e}"))
+
+    def carpetas_rango():
+        ruta_base = ruta_base_var.get()
+        if not os.path.isdir(ruta_base):
+            messagebox.showerror("Error", "La ruta base ingresada no es válida.")
+            return None, []
+        try:
+            desde = datetime.strptime(desde_var.get(), "%d-%m-%Y").date()
+            hasta = datetime.strptime(hasta_var.get() or desde_var.get(), "%d-%m-%Y").date()
+        except ValueError:
+            messagebox.showerror("Error", "Formato de fecha inválido. Use DD-MM-YYYY.")
+            return None, []
+        carpetas = carpetas_en_rango(ruta_base, desde, hasta)
+        if not carpetas:
+            messagebox.showwarning("Advertencia", "No hay carpetas en el rango de fechas indicado.")
+        return ruta_base, carpetas
+
+    def cargar_rango():
+        ruta_base, carpetas = carpetas_rango()
+        if not carpetas:
+            return
+        exportar_txt = exportar_txt_var.get()
+
+        ejecutor.enviar(cargar_lote, carpetas, RESOLUCIONES[resolucion_var.get()],
+                        AGREGACIONES_MENU[agregacion_var.get()],
+                        nombre=f"Cargando {len(carpetas)} carpetas",
+                        al_terminar=lambda datos: sesion_cargada(datos, ruta_base, exportar_txt, carpetas),
+                        al_error=lambda e: messagebox.showerror("Error", f"No se pudieron cargar los datos: {e}"))
+
+    def informes_generados(resultado):
+        informes, errores = resultado
+        if errores:
+            detalle = "\n".join(f"{nombre}: {error}" for nombre, error in errores.items())
+            messagebox.showwarning("Advertencia", f"No se pudieron generar algunos informes:\n{detalle}")
+        if not informes:
+            messagebox.showinfo("Información", "No se detectaron tablas para los informes.")
+            return
+        messagebox.showinfo("Éxito", f"{len(informes)} informes guardados en {os.path.dirname(informes[0])}")
+        webbrowser.open(informes[0])
+
+    def informes_rango():
+        # Un informe por jornada de todas las carpetas del rango, en varios procesos
+        ruta_base, carpetas = carpetas_rango()
+        if not carpetas:
+            return
+        try:
+            duracion_minima = float(duracion_minima_var.get() or 0)
+            tolerancia_hueco = float(tolerancia_hueco_var.get() or 0)
+        except ValueError:
+            messagebox.showerror("Error", "La duración mínima y la tolerancia deben ser números (segundos).")
+            return
+        ejecutor.enviar(informes_carpetas, carpetas, os.path.join(ruta_base, DIRECTORIO_INFORMES), duracion_minima,
+                        tolerancia_hueco, nombre=f"Informes de {len(carpetas)} carpetas", al_terminar=informes_generados,
+                        al_error=lambda e: messagebox.showerror("Error", f"No se pudieron generar los informes: {e}"))
+
+    def sesion_cargada(datos, ruta_base, exportar_txt, carpetas):
+        global datos_completos_global
+        errores = datos.attrs.get("errores", {})
+        if errores:
+            detalle = "\n".join(f"{carpeta}: {error}" for carpeta, error in errores.items())
+            messagebox.showwarning("Advertencia", f"No se pudieron cargar algunas carpetas:\n{detalle}")
+        if datos.empty:
+            messagebox.showwarning("Advertencia", "No se encontraron datos.")
+            return
+        problemas = resumen_informe_carga(datos.attrs.get("informe_carga", []))
+        if problemas:
+            messagebox.showwarning("Advertencia", f"Se omitieron registros con problemas:\n{problemas}")
+        datos_completos_global = datos
+        if exportar_txt:
             guardar_txt(datos, ruta_base)  # Guardar el archivo txt en la ruta base
+        with ejecucion("Mostrar datos", len(datos)):
             mostrar_datos(datos)
-            tabview.set("Visualizar Datos")
+        actualizar_grafico("completo")
+        actualizar_grafico("filtrado")
+        tabview.set("Visualizar Datos")
+        calcular_anomalias(datos)
+        if guardar_historial_var.get() and carpetas:
+            registrar_historial(ruta_base, carpetas)
+
+    def registrar_historial(ruta_base, carpetas):
+        # En segundo plano; las carpetas sin cambios desde la última vez se saltan
+        def registradas(resultado):
+            _, errores = resultado
+            if errores:
+                detalle = "\n".join(f"{carpeta}: {error}" for carpeta, error in errores.items())
+                messagebox.showwarning("Advertencia", f"No se pudieron agregar al historial:\n{detalle}")
+
+        ejecutor.enviar(actualizar_historial, ruta_base, carpetas, nombre="Actualizando historial",
+                        al_terminar=registradas,
+                        al_error=lambda e: messagebox.showerror("Error", f"No se pudo actualizar el historial: {e}"))
 
     def guardar_txt(datos, ruta_base):
         archivo_txt = os.path.join(ruta_base, "datos_exportados.txt")
-        try:
-            datos.to_csv(archivo_txt, index=False, sep='\t')
-            messagebox.showinfo("Éxito", f"Datos guardados en {archivo_txt}")
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudieron guardar los datos: {e}")
+
+        def escribir(progreso):
+            return exportar_sesion(datos, archivo_txt, progreso=progreso)
+
+        ejecutor.enviar(escribir, nombre="Guardando datos_exportados.txt",
+                        al_terminar=lambda archivo: messagebox.showinfo("Éxito", f"Datos guardados en {archivo}"),
+                        al_error=lambda e: messagebox.showerror("Error", f"No se pudieron guardar los datos: {e}"))
 
     etiqueta_cargar_datos = ctk.CTkLabel(seleccionar_tab, text="3.- Presione el botón para cargar los datos:", font=("Arial", 18))
     etiqueta_cargar_datos.pack(pady=10)
 
+    # Resolución de la serie combinada y agregación de cada intervalo
+    alineacion_frame = ctk.CTkFrame(seleccionar_tab)
+    alineacion_frame.pack(pady=5)
+
+    ctk.CTkLabel(alineacion_frame, text="Resolución:").pack(side="left", padx=5)
+    resolucion_var = ctk.StringVar(value="Todas las muestras")
+    resolucion_menu = ctk.CTkOptionMenu(alineacion_frame, values=list(RESOLUCIONES), variable=resolucion_var)
+    resolucion_menu.pack(side="left", padx=5)
+
+    ctk.CTkLabel(alineacion_frame, text="Agregación:").pack(side="left", padx=5)
+    agregacion_var = ctk.StringVar(value="Promedio")
+    agregacion_menu = ctk.CTkOptionMenu(alineacion_frame, values=list(AGREGACIONES_MENU), variable=agregacion_var)
+    agregacion_menu.pack(side="left", padx=5)
+
+    exportar_txt_var = ctk.BooleanVar(value=False)
+    exportar_txt_check = ctk.CTkCheckBox(seleccionar_tab, text="Exportar también a datos_exportados.txt", variable=exportar_txt_var)
+    exportar_txt_check.pack(pady=5)
+
+    guardar_historial_var = ctk.BooleanVar(value=True)
+    ctk.CTkCheckBox(seleccionar_tab, text="Agregar al historial (pestaña Historial)", variable=guardar_historial_var).pack(pady=5)
+
     cargar_button = ctk.CTkButton(seleccionar_tab, text="Cargar Datos", command=cargar_datos)
     cargar_button.pack(pady=20)
 
+    # Carga de todas las carpetas de un rango de fechas, en paralelo
+    rango_frame = ctk.CTkFrame(seleccionar_tab)
+    rango_frame.pack(pady=10)
+    ctk.CTkLabel(rango_frame, text="O cargue un rango de fechas (DD-MM-YYYY):").pack(side="left", padx=5)
+    desde_var = ctk.StringVar()
+    hasta_var = ctk.StringVar()
+    ctk.CTkEntry(rango_frame, textvariable=desde_var, width=110, placeholder_text="Desde").pack(side="left", padx=5)
+    ctk.CTkEntry(rango_frame, textvariable=hasta_var, width=110, placeholder_text="Hasta").pack(side="left", padx=5)
+    ctk.CTkButton(rango_frame, text="Cargar Rango", command=cargar_rango).pack(side="left", padx=5)
+    ctk.CTkButton(rango_frame, text="Informes del Rango", command=informes_rango).pack(side="left", padx=5)
+
+    def instante_intervalo(texto, carpeta):
+        # "DD-MM-YYYY HH:MM" o solo "HH:MM", del último día con datos de la carpeta
+        texto = texto.strip()
+        if " " in texto:
+            return datetime.strptime(texto, "%d-%m-%Y %H:%M")
+        hora = datetime.strptime(texto, "%H:%M").time()
+        entrada = indice_carpetas["carpetas"].get(os.path.basename(carpeta))
+        if entrada and entrada["hasta"]:
+            dia = datetime.fromisoformat(entrada["hasta"]).date()
+        else:
+            dia = fecha_carpeta(os.path.basename(carpeta)) or datetime.now().date()
+        return datetime.combine(dia, hora)
+
+    def cargar_intervalo():
+        # En una carpeta archivada solo se descomprimen los bloques del intervalo;
+        # el intervalo no se agrega al historial (no es la carpeta completa)
+        ruta_base = ruta_base_var.get()
+        carpeta_seleccionada = os.path.join(ruta_base, carpeta_seleccionada_var.get())
+        if not os.path.isdir(carpeta_seleccionada):
+            messagebox.showwarning("Advertencia", "Por favor selecciona una carpeta válida.")
+            return
+        try:
+            desde = instante_intervalo(intervalo_desde_var.get(), carpeta_seleccionada)
+            hasta = instante_intervalo(intervalo_hasta_var.get(), carpeta_seleccionada)
+        except ValueError:
+            messagebox.showerror("Error", "Formato de hora inválido. Use HH:MM o DD-MM-YYYY HH:MM.")
+            return
+        exportar_txt = exportar_txt_var.get()
+
+        ejecutor.enviar(cargar_ventana, carpeta_seleccionada, desde, hasta, RESOLUCIONES[resolucion_var.get()],
+                        AGREGACIONES_MENU[agregacion_var.get()],
+                        nombre=f"Cargando {desde:%H:%M}-{hasta:%H:%M} de {carpeta_seleccionada_var.get()}",
+                        al_terminar=lambda datos: sesion_cargada(datos, ruta_base, exportar_txt, []),
+                        al_error=lambda e: messagebox.showerror("Error", f"No se pudieron cargar los datos: {e}"))
+
+    def archivar_seleccionada():
+        ruta_base = ruta_base_var.get()
+        carpeta_seleccionada = os.path.join(ruta_base, carpeta_seleccionada_var.get())
+        if not os.path.isdir(carpeta_seleccionada):
+            messagebox.showwarning("Advertencia", "Por favor selecciona una carpeta válida.")
+            return
+        if not messagebox.askyesno("Archivar carpeta", "Los .txt de la carpeta se reemplazarán por archivos .txt.gz "
+                                   "comprimidos. Se pueden seguir cargando normalmente. ¿Continuar?"):
+            return
+
+        def archivada(tamanos):
+            if tamanos is None:
+                messagebox.showinfo("Archivar carpeta", "La carpeta ya estaba archivada.")
+                return
+            messagebox.showinfo("Éxito", f"Carpeta archivada: {tamanos['original'] / 2**20:.1f} MB -> "
+                                         f"{tamanos['comprimido'] / 2**20:.1f} MB")
+            # El índice de carpetas tiene que ver los nuevos archivos
+            ejecutor.enviar(actualizar_indice, ruta_base, nombre="Indexando carpetas",
+                            al_terminar=lambda carpetas: (indice_carpetas.update(ruta_base=ruta_base, carpetas=carpetas),
+                                                          mostrar_carpeta_seleccionada()))
+
+        ejecutor.enviar(archivar_carpeta, carpeta_seleccionada, nombre=f"Archivando {carpeta_seleccionada_var.get()}",
+                        al_terminar=archivada,
+                        al_error=lambda e: messagebox.showerror("Error", f"No se pudo archivar la carpeta: {e}"))
+
+    # Carga de un intervalo de la carpeta seleccionada y archivado de carpetas antiguas
+    intervalo_frame = ctk.CTkFrame(seleccionar_tab)
+    intervalo_frame.pack(pady=10)
+    ctk.CTkLabel(intervalo_frame, text="O cargue solo un intervalo (HH:MM):").pack(side="left", padx=5)
+    intervalo_desde_var = ctk.StringVar()
+    intervalo_hasta_var = ctk.StringVar()
+    ctk.CTkEntry(intervalo_frame, textvariable=intervalo_desde_var, width=110, placeholder_text="Desde").pack(side="left", padx=5)
+    ctk.CTkEntry(intervalo_frame, textvariable=intervalo_hasta_var, width=110, placeholder_text="Hasta").pack(side="left", padx=5)
+    ctk.CTkButton(intervalo_frame, text="Cargar Intervalo", command=cargar_intervalo).pack(side="left", padx=5)
+    ctk.CTkButton(intervalo_frame, text="Archivar Carpeta", command=archivar_seleccionada).pack(side="left", padx=5)
+
+    # Modo en vivo: leer solo las líneas nuevas de la carpeta cada cierto tiempo
+    # `datos` son los últimos datos del seguidor que se mostraron
+    vivo = {"seguidor": None, "tarea": None, "temporizador": None, "datos": None}
+
+    def iniciar_en_vivo():
+        ruta_base = ruta_base_var.get()
+        carpeta_seleccionada = os.path.join(ruta_base, carpeta_seleccionada_var.get())
+        if not os.path.isdir(carpeta_seleccionada):
+            messagebox.showwarning("Advertencia", "Por favor selecciona una carpeta válida.")
+            return
+        try:
+            intervalo = float(intervalo_vivo_var.get())
+            duracion_minima = float(duracion_minima_var.get() or 0)
+            tolerancia_hueco = float(tolerancia_hueco_var.get() or 0)
+        except ValueError:
+            messagebox.showerror("Error", "El intervalo y los umbrales de tablas deben ser números (segundos).")
+            return
+        detener_en_vivo()
+        vivo["seguidor"] = SeguidorEnVivo(carpeta_seleccionada, RESOLUCIONES[resolucion_var.get()],
+                                          AGREGACIONES_MENU[agregacion_var.get()], duracion_minima, tolerancia_hueco)
+        vivo["intervalo_ms"] = max(int(intervalo * 1000), 500)
+        vivo_button.configure(text="Detener En Vivo", command=detener_en_vivo)
+        actualizar_en_vivo()
+
+    def detener_en_vivo():
+        if vivo["temporizador"] is not None:
+            ventana.after_cancel(vivo["temporizador"])
+        if vivo["tarea"] is not None:
+            vivo["tarea"].cancelar()
+        vivo.update(seguidor=None, tarea=None, temporizador=None, datos=None)
+        vivo_button.configure(text="Seguir En Vivo", command=iniciar_en_vivo)
+
+    def actualizar_en_vivo():
+        seguidor = vivo["seguidor"]
+        if seguidor is None:
+            return
+        # No lanzar una nueva lectura mientras la anterior sigue en curso
+        if vivo["tarea"] is None:
+            vivo["tarea"] = ejecutor.enviar(seguidor.actualizar, nombre="Leyendo datos en vivo",
+                                            al_terminar=lambda nuevas: en_vivo_actualizado(seguidor, nuevas),
+                                            al_error=en_vivo_error)
+        vivo["temporizador"] = ventana.after(vivo["intervalo_ms"], actualizar_en_vivo)
+
+    def en_vivo_actualizado(seguidor, nuevas):
+        global datos_completos_global
+        vivo["tarea"] = None
+        if seguidor is not vivo["seguidor"] or not nuevas:
+            return
+        # Si ya se mostraban los datos de este seguidor, lo anterior a
+        # seguidor.cambios_desde sigue igual: la vista y el gráfico procesan solo lo demás
+        desde = seguidor.cambios_desde if datos_completos_global is vivo["datos"] else None
+        datos_completos_global = vivo["datos"] = seguidor.datos
+        # El seguidor solo recalcula las anomalías de las tablas nuevas o abiertas
+        anomalias.update(datos=seguidor.datos, eventos=seguidor.anomalias)
+        if "refrescar" in vista_datos:
+            vista_datos["refrescar"](seguidor.datos, desde)
+            vista_datos["marcar"](seguidor.anomalias)
+        else:
+            mostrar_datos(seguidor.datos)
+        actualizar_grafico("completo", conservar_zoom=True, desde=desde)
+
+    def en_vivo_error(error):
+        detener_en_vivo()
+        messagebox.showerror("Error", f"Se detuvo el modo en vivo: {error}")
+
+    vivo_frame = ctk.CTkFrame(seleccionar_tab)
+    vivo_frame.pack(pady=10)
+    ctk.CTkLabel(vivo_frame, text="Actualizar cada (s):").pack(side="left", padx=5)
+    intervalo_vivo_var = ctk.StringVar(value="5")
+    ctk.CTkEntry(vivo_frame, textvariable=intervalo_vivo_var, width=60).pack(side="left", padx=5)
+    vivo_button = ctk.CTkButton(vivo_frame, text="Seguir En Vivo", command=iniciar_en_vivo)
+    vivo_button.pack(side="left", padx=5)
+
+    # Función para refrescar la pestaña "Visualizar Datos" sin reconstruirla
+    vista_datos = {}
+
+    # Sobrecargas y sobretemperaturas de la sesión cargada (`datos` identifica la sesión)
+    anomalias = {"datos": None, "eventos": None}
+
+    def eventos_anomalias():
+        return anomalias["eventos"] if anomalias["datos"] is datos_completos_global else None
+
+    def calcular_anomalias(datos):
+        # En segundo plano al cargar una sesión, con los umbrales de tablas actuales
+        try:
+            duracion_minima = float(duracion_minima_var.get() or 0)
+            tolerancia_hueco = float(tolerancia_hueco_var.get() or 0)
+        except ValueError:
+            duracion_minima = tolerancia_hueco = 0.0
+
+        def calcular(progreso):
+            return detectar_anomalias(datos, tablas_sesion(datos, duracion_minima, tolerancia_hueco))
+
+        ejecutor.enviar(calcular, nombre="Buscando anomalías", al_terminar=lambda eventos: mostrar_anomalias(datos, eventos),
+                        al_error=lambda e: messagebox.showerror("Error", f"No se pudieron buscar anomalías: {e}"))
+
+    def mostrar_anomalias(datos, eventos):
+        anomalias.update(datos=datos, eventos=eventos)
+        if datos is not datos_completos_global:
+            return  # Se cargó otra sesión mientras tanto
+        if "marcar" in vista_datos:
+            vista_datos["marcar"](eventos)
+        for tipo in ("completo", "filtrado", "tabla"):
+            actualizar_grafico(tipo, conservar_zoom=True)
+
+    def obtener_datos_completos():
+        # Datos de la sesión en memoria o, si no hay, la última sesión guardada en caché
+        global datos_completos_global
+        if datos_completos_global is None:
+            datos_completos_global = cargar_ultima_sesion(ruta_base_var.get())
+        return datos_completos_global
+
     # Mostrar datos en la pestaña "Visualizar Datos"
     def mostrar_datos(datos):
         global datos_filtrados_global
         datos_filtrados_global = datos
+        vista_datos.clear()
         for widget in visualizar_tab.winfo_children():
             widget.destroy()
 
@@ -182,66 +869,69 @@ def crear_interfaz():
         madera_menu.pack(side="left", padx=5)
 
 
-        aplicar_filtro_button = ctk.CTkButton(filtro_frame, text="Aplicar Filtro", command=lambda: aplicar_filtros(datos))
+        aplicar_filtro_button = ctk.CTkButton(filtro_frame, text="Aplicar Filtro", command=lambda: aplicar_filtros())
         aplicar_filtro_button.pack(side="left", padx=5)
 
         #Botón de reiniciar filtros
         reiniciar_filtro_button = ctk.CTkButton(filtro_frame, text="Reiniciar Filtros", command=lambda: reiniciar_filtros(datos))
         reiniciar_filtro_button.pack(side="left", padx=5)
 
-        frame = ttk.Frame(visualizar_tab)
-        frame.pack(fill="both", expand=True)
-
-        tree = ttk.Treeview(frame, columns=list(datos.columns), show="headings")
-        for col in datos.columns:
-            tree.heading(col, text=col)
-            tree.column(col, anchor="center")
-        for _, row in datos.iterrows():
-            tree.insert("", "end", values=list(row))
+        # Memoria que ocupa la sesión cargada
+        memoria_frame = ctk.CTkFrame(visualizar_tab)
+        memoria_frame.pack(fill="x")
+        memoria_label = ctk.CTkLabel(memoria_frame, text=f"Memoria de la sesión: {resumen_memoria(datos).splitlines()[0]}")
+        memoria_label.pack(side="left", padx=10)
+        ctk.CTkButton(memoria_frame, text="Detalle de memoria", width=140,
+                      command=lambda: messagebox.showinfo("Memoria de la sesión", resumen_memoria(datos))).pack(side="left", padx=5)
 
-        scrollbar_y = ttk.Scrollbar(frame, orient="vertical", command=tree.yview)
-        scrollbar_y.pack(side="right", fill="y")
-        tree.configure(yscrollcommand=scrollbar_y.set)
+        # Tabla virtual: solo se materializan las filas visibles
+        tabla = TablaVirtual(visualizar_tab, COLUMNAS_EXPORTACION)
+        tabla.mostrar(datos)
+        tabla.marcar(eventos_anomalias())
+        vista_datos["marcar"] = tabla.marcar
 
-        scrollbar_x = ttk.Scrollbar(frame, orient="horizontal", command=tree.xview)
-        scrollbar_x.pack(side="bottom", fill="x")
-        tree.configure(xscrollcommand=scrollbar_x.set)
-
-        tree.pack(expand=True, fill="both")
+        # Índice de tiempo y de Madera para resolver los filtros sin recorrer la sesión
+        consulta = ConsultaTiempo(datos)
 
-        def aplicar_filtros(datos_filtrados):
+        def aplicar_filtros(conservar_posicion=False, desde=None):
             global datos_filtrados_global
 
-            if jornada_var.get() != "Todas":
-                if jornada_var.get() == "Mañana":
-                    datos_filtrados = datos_filtrados[datos_filtrados['hora'].between(pd.Timestamp("06:00:00").time(), pd.Timestamp("12:00:00").time())]
-                elif jornada_var.get() == "Tarde":
-                    datos_filtrados = datos_filtrados[datos_filtrados['hora'].between(pd.Timestamp("12:00:00").time(), pd.Timestamp("18:00:00").time())]
-                elif jornada_var.get() == "Noche":
-                    datos_filtrados = datos_filtrados[(datos_filtrados['hora'] >= pd.Timestamp("18:00:00").time()) | (datos_filtrados['hora'] < pd.Timestamp("06:00:00").time())]
-
+            hora_inicio = hora_fin = None
             if hora_inicio_var.get() and hora_fin_var.get():
                 try:
-                    hora_inicio = pd.to_datetime(hora_inicio_var.get(), format='%H:%M:%S').time()
-                    hora_fin = pd.to_datetime(hora_fin_var.get(), format='%H:%M:%S').time()
-                    datos_filtrados = datos_filtrados[
-                        (datos_filtrados['hora'] >= hora_inicio) &
-                        (datos_filtrados['hora'] <= hora_fin)
-                    ]
+                    hora_inicio = hora_a_ns(hora_inicio_var.get())
+                    hora_fin = hora_a_ns(hora_fin_var.get())
                 except ValueError:
+                    hora_inicio = hora_fin = None
                     messagebox.showerror("Error", "Formato de hora inválido. Use HH:MM:SS.")
 
+            madera_valor = None
             if madera_var.get() != "Seleccionar":
-                try:
-                    madera_valor = 1 if madera_var.get() == "Madera 1" else 0
-                    datos_filtrados = datos_filtrados[datos_filtrados['Madera'] == madera_valor]
-                except ValueError:
-                    messagebox.showerror("Error", "Valor no válido para filtrar.")
+                madera_valor = 1 if madera_var.get() == "Madera 1" else 0
+
+            with ejecucion("Filtrar", len(datos)):
+                datos_filtrados = consulta.filtrar(jornada_var.get(), hora_inicio, hora_fin, madera_valor)
+                actualizar_tabla(datos_filtrados, conservar_posicion)
+            datos_filtrados_global = datos_filtrados
+            actualizar_grafico("filtrado", conservar_zoom=conservar_posicion, desde=desde)
+
+        def refrescar(datos_nuevos, desde=None):
+            # Modo en vivo: reemplazar los datos manteniendo los filtros activos. Con
+            # `desde`, los datos nuevos solo cambiaron a partir de ese instante y se
+            # indexa solo esa parte (los filtros tampoco cambian lo anterior)
+            nonlocal datos, consulta
+            datos = datos_nuevos
+            if desde is None:
+                consulta = ConsultaTiempo(datos)
+            else:
+                consulta.extender(datos, datos.index.searchsorted(desde))
+            memoria_label.configure(text=f"Memoria de la sesión: {resumen_memoria(datos).splitlines()[0]}")
+            aplicar_filtros(conservar_posicion=True, desde=desde)
 
-            actualizar_tabla(datos_filtrados)
-            datos_filtrados_global = datos_filtrados.copy()
+        vista_datos["refrescar"] = refrescar
 
         def reiniciar_filtros(datos_originales):
+            global datos_filtrados_global
             jornada_var.set("Todas")
             hora_inicio_var.set("")
             hora_fin_var.set("")
@@ -249,29 +939,55 @@ def crear_interfaz():
 
             #Restaurar la tabla con los datos originales
             actualizar_tabla(datos_originales)
-            datos_filtrados_global = datos_originales.copy()
+            datos_filtrados_global = datos_originales
+            actualizar_grafico("filtrado")
 
-        def actualizar_tabla(datos_actualizados):
-            for row in tree.get_children():
-                tree.delete(row)
-            for _, row in datos_actualizados.iterrows():
-                tree.insert("", "end", values=list(row))
+        def actualizar_tabla(datos_actualizados, conservar_posicion=False):
+            tabla.mostrar(datos_actualizados, conservar_posicion)
 
         def exportar_datos_filtrados():
             global datos_filtrados_global
             if datos_filtrados_global.empty:
                 messagebox.showerror("Error", "No hay datos para exportar.")
                 return
+            ruta_base = ruta_base_var.get()
+            # La extensión elegida define el formato; por tabla o por jornada se
+            # agrega el nombre de cada una al archivo elegido
+            archivo = asksaveasfilename(initialdir=ruta_base or None, initialfile="datos_filtrados.txt",
+                                        defaultextension=".txt", filetypes=TIPOS_EXPORTACION)
+            if not archivo:
+                return
+            particion = PARTICIONES_MENU[particion_var.get()]
+            datos_exportar = datos_filtrados_global
+            datos_sesion = datos_completos_global
             try:
-                ruta_base = ruta_base_var.get()
-                archivo_txt = os.path.join(ruta_base, "datos_filtrados.txt")
-                datos_filtrados_global.to_csv(archivo_txt, index=False, sep='\t')
-                messagebox.showinfo("Éxito", f"Datos exportados en {archivo_txt}")
-            except Exception as e:
-                messagebox.showerror("Error", f"No se pudieron exportar los datos: {e}")
+                duracion_minima = float(duracion_minima_var.get() or 0)
+                tolerancia_hueco = float(tolerancia_hueco_var.get() or 0)
+            except ValueError:
+                duracion_minima = tolerancia_hueco = 0.0
+
+            def escribir(progreso):
+                # Las tablas se numeran sobre la sesión completa, igual que en Parámetros
+                tablas = tablas_sesion(datos_sesion, duracion_minima, tolerancia_hueco) if particion == "tabla" else None
+                return exportar_sesion(datos_exportar, archivo, particion, tablas, progreso=progreso)
+
+            def exportados(resultado):
+                if particion is None:
+                    messagebox.showinfo("Éxito", f"Datos exportados en {resultado}")
+                elif resultado:
+                    messagebox.showinfo("Éxito", f"Datos exportados en {len(resultado)} archivos en {os.path.dirname(resultado[0])}")
+                else:
+                    messagebox.showwarning("Advertencia", "Ninguna fila filtrada pertenece a una tabla.")
+
+            ejecutor.enviar(escribir, nombre="Exportando datos filtrados", al_terminar=exportados,
+                            al_error=lambda e: messagebox.showerror("Error", f"No se pudieron exportar los datos: {e}"))
 
-        exportar_button = ctk.CTkButton(visualizar_tab, text="Exportar Datos Filtrados", command=exportar_datos_filtrados)
-        exportar_button.pack(pady=10)
+        exportar_frame = ctk.CTkFrame(visualizar_tab)
+        exportar_frame.pack(pady=10)
+        particion_var = ctk.StringVar(value="Un archivo")
+        ctk.CTkOptionMenu(exportar_frame, values=list(PARTICIONES_MENU), variable=particion_var).pack(side="left", padx=5)
+        exportar_button = ctk.CTkButton(exportar_frame, text="Exportar Datos Filtrados", command=exportar_datos_filtrados)
+        exportar_button.pack(side="left", padx=5)
 
 
         def filtrar_madera(datos,valor):
@@ -282,7 +998,7 @@ def crear_interfaz():
                 valor = int(valor)
                 datos_filtrados = datos[datos['Madera'] == valor]
                 actualizar_tabla(datos_filtrados)
-                datos_filtrados_global = datos_filtrados.copy()
+                datos_filtrados_global = datos_filtrados
             except Exception as e:
                 messagebox.showerror("Error", f"No se pudo filtrar: {e}")
 
@@ -291,22 +1007,28 @@ def crear_interfaz():
             for widget in graficos_tab.winfo_children():
                 widget.destroy()
 
+    # Controles de ambos datasets lado a lado; el gráfico integrado ocupa el resto
+    controles_grafico_frame = ctk.CTkFrame(graficos_tab)
+    controles_grafico_frame.pack(fill="x")
+    completo_frame = ctk.CTkFrame(controles_grafico_frame)
+    completo_frame.pack(side="left", expand=True, padx=10, pady=5)
+    filtrado_frame = ctk.CTkFrame(controles_grafico_frame)
+    filtrado_frame.pack(side="left", expand=True, padx=10, pady=5)
+
     # Sección 1: Dataset completo
-    ctk.CTkLabel(graficos_tab, text="Visualizar graficos del Dataset completo:", font=("Arial", 16)).pack(pady=10)
+    ctk.CTkLabel(completo_frame, text="Visualizar graficos del Dataset completo:", font=("Arial", 16)).pack(pady=10)
     
     # Variables para dataset completo
     dataset_completo_var = ctk.StringVar()
     opciones_completo = []
 
     def cargar_variables_completo():
-        ruta_base = ruta_base_var.get()
-        archivo_txt = os.path.join(ruta_base, "datos_exportados.txt")
-        if not os.path.isfile(archivo_txt):
+        datos_completos = obtener_datos_completos()
+        if datos_completos is None:
             messagebox.showerror("Error", "No se ha cargado el dataset completo.")
             return
         try:
-            datos_completos = pd.read_csv(archivo_txt, sep='\t')
-            opciones = [col for col in datos_completos.columns[2:] if col != "Madera"]   # Excluye 'fecha' y 'hora'
+            opciones = [col for col in datos_completos.columns if col != "Madera"]
             dataset_completo_var.set("")
             completo_menu.configure(values=opciones)
             completo_menu.pack(pady=5)
@@ -317,36 +1039,32 @@ def crear_interfaz():
             return None
 
     def graficar_completo():
-        ruta_base = ruta_base_var.get()
-        archivo_txt = os.path.join(ruta_base, "datos_exportados.txt")
-        if not os.path.isfile(archivo_txt):
+        datos_completos = obtener_datos_completos()
+        if datos_completos is None:
             messagebox.showerror("Error", "No se ha cargado el dataset completo.")
             return
-        try:
-            datos_completos = pd.read_csv(archivo_txt, sep='\t')
-            variable = dataset_completo_var.get()
-            if variable not in datos_completos.columns:
-                messagebox.showerror("Error", "Variable no válida para graficar.")
-                return
-            fig = px.line(datos_completos, x='hora', y=variable, title=f"Gráfico de {variable} (Dataset completo)")
-            fig.update_layout(xaxis_title="Hora", yaxis_title=variable)
-            temp_html = "temp_plot_completo.html"
-            pio.write_html(fig, file=temp_html, auto_open=False)
-            webbrowser.open(temp_html)
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo graficar: {e}")
+        variable = dataset_completo_var.get()
+        if variable not in datos_completos.columns:
+            messagebox.showerror("Error", "Variable no válida para graficar.")
+            return
+        puntos = obtener_puntos_grafico()
+        if puntos is None:
+            return
+        # En modo en vivo el gráfico se redibuja con cada actualización
+        grafico_vista.update(tipo="completo", variable=variable, puntos=puntos)
+        mostrar_grafico()
 
-    cargar_completo_button = ctk.CTkButton(graficos_tab, text="Cargar Variables", command=cargar_variables_completo)
+    cargar_completo_button = ctk.CTkButton(completo_frame, text="Cargar Variables", command=cargar_variables_completo)
     cargar_completo_button.pack(pady=5)
 
-    completo_menu = ctk.CTkOptionMenu(graficos_tab, variable=dataset_completo_var, values=opciones_completo)
+    completo_menu = ctk.CTkOptionMenu(completo_frame, variable=dataset_completo_var, values=opciones_completo)
     completo_menu.pack(pady=5)
 
-    graficar_completo_button = ctk.CTkButton(graficos_tab, text="Seleccionar y Graficar", command=graficar_completo)
+    graficar_completo_button = ctk.CTkButton(completo_frame, text="Seleccionar y Graficar", command=graficar_completo)
     graficar_completo_button.pack(pady=10)
 
     # Sección 2: Dataset filtrado
-    ctk.CTkLabel(graficos_tab, text="Visualizar graficos del Dataset filtrado:", font=("Arial", 16)).pack(pady=10)
+    ctk.CTkLabel(filtrado_frame, text="Visualizar graficos del Dataset filtrado:", font=("Arial", 16)).pack(pady=10)
     
     # Variables para dataset filtrado
     dataset_filtrado_var = ctk.StringVar()
@@ -358,7 +1076,7 @@ def crear_interfaz():
             messagebox.showerror("Error", "No se ha cargado el dataset filtrado.")
             return
         try:
-            opciones = [col for col in datos_filtrados_global.columns[2:] if col != "Madera"]  # Excluye 'fecha' y 'hora'
+            opciones = [col for col in datos_filtrados_global.columns if col != "Madera"]
             dataset_filtrado_var.set("")
             filtrado_menu.configure(values=opciones)
             filtrado_menu.pack(pady=5)
@@ -371,85 +1089,180 @@ def crear_interfaz():
         if 'datos_filtrados_global' not in globals() or datos_filtrados_global.empty:
             messagebox.showerror("Error", "No se ha cargado el dataset filtrado.")
             return
-        try:
-            variable = dataset_filtrado_var.get()
-            if variable not in datos_filtrados_global.columns:
-                messagebox.showerror("Error", "Variable no válida para graficar.")
-                return
-            fig = px.line(datos_filtrados_global, x='hora', y=variable, title=f"Gráfico de {variable}")
-            fig.update_layout(xaxis_title="Hora", yaxis_title=variable)
-            temp_html = "temp_plot_filtrado.html"
-            pio.write_html(fig, file=temp_html, auto_open=False)
-            webbrowser.open(temp_html)
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo graficar: {e}")
+        variable = dataset_filtrado_var.get()
+        if variable not in datos_filtrados_global.columns:
+            messagebox.showerror("Error", "Variable no válida para graficar.")
+            return
+        puntos = obtener_puntos_grafico()
+        if puntos is None:
+            return
+        # Al cambiar los filtros el gráfico se redibuja con los datos nuevos
+        grafico_vista.update(tipo="filtrado", variable=variable, puntos=puntos)
+        mostrar_grafico()
 
-    cargar_filtrado_button = ctk.CTkButton(graficos_tab, text="Cargar Variables", command=cargar_variables_filtrado)
+    cargar_filtrado_button = ctk.CTkButton(filtrado_frame, text="Cargar Variables", command=cargar_variables_filtrado)
     cargar_filtrado_button.pack(pady=5)
 
-    filtrado_menu = ctk.CTkOptionMenu(graficos_tab, variable=dataset_filtrado_var, values=opciones_filtrado)
+    filtrado_menu = ctk.CTkOptionMenu(filtrado_frame, variable=dataset_filtrado_var, values=opciones_filtrado)
     filtrado_menu.pack(pady=5)
 
-    graficar_filtrado_button = ctk.CTkButton(graficos_tab, text="Seleccionar y Graficar", command=graficar_filtrado)
+    graficar_filtrado_button = ctk.CTkButton(filtrado_frame, text="Seleccionar y Graficar", command=graficar_filtrado)
     graficar_filtrado_button.pack(pady=10)
 
-    def detectar_tablas(datos):
-        tablas = []
-        en_tabla = False
-        tabla_actual = {}
-        for i, row in datos.iterrows():
-            if row["Madera"] == 1:
-                if not en_tabla:
-                    en_tabla = True
-                    tabla_actual = {"inicio": row["hora"], "fin": row["hora"], "Corriente_Total": row["Corriente"],
-                                    "Corriente_Max": row["Corriente"], "Corriente_Min": row["Corriente"],"Temperatura_Max": row["Temperatura(ºC)"],
-                                    "Temperatura_Min": row["Temperatura(ºC)"],"Registro": 1
-                }
-                else:
-                    tabla_actual["fin"] = row["hora"]
-                    tabla_actual["Corriente_Total"] += row["Corriente"]
-                    tabla_actual["Corriente_Max"] = max(tabla_actual["Corriente_Max"], row["Corriente"])
-                    tabla_actual["Corriente_Min"] = min(tabla_actual["Corriente_Min"], row["Corriente"])
-                    tabla_actual["Temperatura_Max"] = max(tabla_actual["Temperatura_Max"], row["Temperatura(ºC)"])
-                    tabla_actual["Temperatura_Min"] = min(tabla_actual["Temperatura_Min"], row["Temperatura(ºC)"])
-                    tabla_actual["Registro"] += 1
+    # Cantidad de puntos por serie en los gráficos (0 = todos)
+    puntos_frame = ctk.CTkFrame(controles_grafico_frame)
+    puntos_frame.pack(side="left", padx=10, pady=10)
+    ctk.CTkLabel(puntos_frame, text="Puntos por serie (0 = todos):").pack(side="left", padx=5)
+    puntos_grafico_var = ctk.StringVar(value=str(PUNTOS_GRAFICO))
+    ctk.CTkEntry(puntos_frame, textvariable=puntos_grafico_var, width=80).pack(side="left", padx=5)
+
+    def obtener_puntos_grafico():
+        try:
+            puntos = int(puntos_grafico_var.get() or 0)
+        except ValueError:
+            messagebox.showerror("Error", "La cantidad de puntos debe ser un número entero.")
+            return None
+        return max(puntos, 0)
+
+    # Lo que muestra el gráfico, para redibujarlo cuando cambian los filtros, la
+    # tabla seleccionada o llegan datos en vivo (`reducidas`: las series del HTML en vivo)
+    grafico_vista = {"tipo": None, "variable": None, "tabla": None, "serie": None, "puntos": PUNTOS_GRAFICO,
+                     "reducidas": None}
+    grafico_frame = ctk.CTkFrame(graficos_tab)
+    grafico_frame.pack(fill="both", expand=True, padx=10, pady=10)
+    grafico_integrado = GraficoIntegrado(grafico_frame) if Figure is not None else None
+
+    def series_grafico():
+        tipo, variable = grafico_vista["tipo"], grafico_vista["variable"]
+        if tipo == "completo":
+            return [obtener_datos_completos()[variable]], f"Gráfico de {variable} (Dataset completo)"
+        if tipo == "filtrado":
+            return [datos_filtrados_global[variable]], f"Gráfico de {variable}"
+        if tipo == "historial":
+            return [grafico_vista["serie"]], f"Historial: {variable}"
+        inicio, fin = grafico_vista["tabla"]
+        datos_tabla = obtener_datos_completos().loc[inicio:fin]
+        return ([datos_tabla[variable] for variable in VARIABLES_TABLA if variable in datos_tabla.columns],
+                f"Gráficas de Variables desde {inicio} hasta {fin}")
+
+    def mostrar_grafico(conservar_zoom=False, abrir=True, desde=None):
+        # `desde`: en vivo, las series solo cambiaron a partir de ese instante
+        series, titulo = series_grafico()
+        puntos = grafico_vista["puntos"]
+        eventos = eventos_anomalias() if grafico_vista["tipo"] != "historial" else None
+        if grafico_integrado is not None:
+            if desde is None:
+                grafico_integrado.mostrar(series, titulo, puntos, conservar_zoom, eventos)
             else:
-                if en_tabla:
-                    en_tabla = False
-                    tablas.append(tabla_actual)
-        return tablas
-    
+                grafico_integrado.extender(series, desde, eventos)
+            return
+
+        # Sin matplotlib: HTML en el navegador. En modo en vivo la página se recarga
+        # sola para mostrar el archivo actualizado; las series se reducen a medida
+        # que llegan datos y se escriben sin el archivo completo para el zoom
+        refresco = None
+        if vivo["seguidor"] is not None and grafico_vista["tipo"] == "completo":
+            refresco = vivo["intervalo_ms"] // 1000
+            anteriores = grafico_vista.get("reducidas")
+            if desde is None or anteriores is None or len(anteriores) != len(series):
+                series = [reducir_serie(serie, puntos) for serie in series]
+            else:
+                series = [extender_reduccion(reducida, serie, desde, puntos)
+                          for reducida, serie in zip(anteriores, series)]
+            grafico_vista["reducidas"] = series
+            puntos = 0
+        archivo = ARCHIVOS_GRAFICO[grafico_vista["tipo"]]
+
+        def generar(progreso):
+            fig = figura_series(series, titulo, puntos, eventos)
+            progreso(0.5, "Escribiendo gráfico")
+            return escribir_grafico(fig, archivo, series, puntos, refresco)
+
+        ejecutor.enviar(generar, nombre="Graficando", al_terminar=webbrowser.open if abrir else None,
+                        al_error=lambda e: messagebox.showerror("Error", f"No se pudo graficar: {e}"))
+
+    def actualizar_grafico(tipo, conservar_zoom=False, desde=None):
+        # Redibujar si el gráfico muestra lo que cambió. Sin matplotlib solo se
+        # reescribe el HTML en modo en vivo, que es cuando la página se recarga
+        if grafico_vista["tipo"] != tipo:
+            return
+        if grafico_integrado is not None or (tipo == "completo" and vivo["seguidor"] is not None):
+            mostrar_grafico(conservar_zoom, abrir=False, desde=desde)
 
     def mostrar_tablas(parametros_tab, ruta_base):
-        archivo_exportado = os.path.join(ruta_base, "datos_exportados.txt")
-        if not os.path.isfile(archivo_exportado):
+        datos = obtener_datos_completos()
+        if datos is None:
             messagebox.showerror("Error", "No se ha cargado el dataset completo.")
             return
-        try:
-            datos = pd.read_csv(archivo_exportado, sep='\t')
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudieron cargar los datos: {e}")
-            return
         
         if datos.empty:
             messagebox.showerror("Error", "No se han cargado los datos.")
             return
         
 
-        #Detectar tablas basadas en Madera
-        tablas = detectar_tablas(datos)
+        try:
+            duracion_minima = float(duracion_minima_var.get() or 0)
+            tolerancia_hueco = float(tolerancia_hueco_var.get() or 0)
+        except ValueError:
+            messagebox.showerror("Error", "La duración mínima y la tolerancia deben ser números (segundos).")
+            return
+
+        #Detectar tablas basadas en Madera; en modo en vivo ya están calculadas
+        seguidor = vivo["seguidor"]
+        if (seguidor is not None and datos is seguidor.datos and seguidor.duracion_minima == duracion_minima
+                and seguidor.tolerancia_hueco == tolerancia_hueco):
+            tablas = seguidor.tablas
+            eventos = seguidor.anomalias
+        else:
+            tablas = tablas_sesion(datos, duracion_minima, tolerancia_hueco)
+            with ejecucion("Anomalías", len(datos)):
+                eventos = detectar_anomalias(datos, tablas)
+        # Con otros umbrales cambian las tablas y, con ellas, las anomalías resaltadas
+        mostrar_anomalias(datos, eventos)
+        conteo_anomalias = anomalias_por_tabla(eventos, len(tablas))
 
         #Limpiar la pestaña antes de mostrar nuevas tablas
         for widget in parametros_tab.winfo_children():
                 widget.destroy()
 
-        if not tablas:
+        # Umbrales de detección, se pueden cambiar y recalcular
+        umbrales_frame = ctk.CTkFrame(parametros_tab)
+        umbrales_frame.pack(pady=10)
+        ctk.CTkLabel(umbrales_frame, text="Duración mínima (s):").pack(side="left", padx=5)
+        ctk.CTkEntry(umbrales_frame, textvariable=duracion_minima_var, width=60).pack(side="left", padx=5)
+        ctk.CTkLabel(umbrales_frame, text="Tolerancia de huecos (s):").pack(side="left", padx=5)
+        ctk.CTkEntry(umbrales_frame, textvariable=tolerancia_hueco_var, width=60).pack(side="left", padx=5)
+        ctk.CTkButton(umbrales_frame, text="Recalcular", command=lambda: mostrar_tablas(parametros_tab, ruta_base)).pack(side="left", padx=5)
+
+        def guardar_tablas():
+            archivo_txt = os.path.join(ruta_base, "tablas_detectadas.txt")
+
+            def escribir(progreso):
+                return exportar_tablas(tablas, archivo_txt)
+
+            ejecutor.enviar(escribir, nombre="Exportando tablas",
+                            al_terminar=lambda archivo: messagebox.showinfo("Éxito", f"Tablas exportadas en {archivo}"),
+                            al_error=lambda e: messagebox.showerror("Error", f"No se pudieron exportar las tablas: {e}"))
+
+        ctk.CTkButton(umbrales_frame, text="Exportar Tablas", command=guardar_tablas).pack(side="left", padx=5)
+
+        def generar_informes():
+            ejecutor.enviar(informes_sesion, datos, os.path.join(ruta_base, DIRECTORIO_INFORMES), tablas, eventos,
+                            nombre="Generando informes", al_terminar=informes_generados,
+                            al_error=lambda e: messagebox.showerror("Error", f"No se pudieron generar los informes: {e}"))
+
+        ctk.CTkButton(umbrales_frame, text="Informes por Jornada", command=generar_informes).pack(side="left", padx=5)
+
+        if tablas.empty:
             messagebox.showinfo("Información", "No se detectaron tablas.")
             return
         #Mostrar tablas detectadas
         ctk.CTkLabel(parametros_tab, text="Tablas detectadas:", font=("Arial", 18)).pack(pady=10)
+        ctk.CTkLabel(parametros_tab, text=resumen_anomalias(eventos), justify="left").pack(pady=5)
         tabla_var = ctk.StringVar(value="Seleccione una tabla")
-        opciones_tablas = [f"Tabla {i+1}" for i in range(len(tablas))]
+        # Las tablas con sobrecargas o sobretemperatura muestran cuántas tuvieron
+        totales = conteo_anomalias.sum(axis=1).to_numpy()
+        opciones_tablas = [f"Tabla {i+1}" + (f" ({totales[i]} anomalías)" if totales[i] else "") for i in range(len(tablas))]
         tabla_menu = ctk.CTkOptionMenu(parametros_tab, variable=tabla_var, values=opciones_tablas)
         tabla_menu.pack(pady=10)
 
@@ -469,38 +1282,21 @@ def crear_interfaz():
 
 
             indice = int(seleccion.split(" ")[1]) - 1
-            tabla = tablas[indice]
+            tabla = tablas.iloc[indice]
 
-            #Calcular duración de corte
-            hora_inicio = pd.Timestamp(tabla["inicio"])
-            hora_fin = pd.Timestamp(tabla["fin"])
-            duracion_corte = (hora_fin - hora_inicio).total_seconds() #Duración en segundos
-
-            #Calcular velocidad (en m/s)
-            distancia_mm = datos["Distancia(mm)"].sum() #Suma distancia total
-            distancia_m = distancia_mm / 1000 #Convertir a metros
-            velocidad = distancia_m / duracion_corte if duracion_corte > 0 else 0
+            # Si el gráfico muestra una tabla, pasa a mostrar la seleccionada
+            if grafico_vista["tipo"] == "tabla":
+                grafico_vista["tabla"] = (tabla["inicio"], tabla["fin"])
+                actualizar_grafico("tabla")
 
             #marco de detalles
-            detalle_frame = ctk.CTkFrame(parametros_tab, width=800, height=400, corner_radius=15, fg_color="#FFFFFF",border_color="#000000", border_width=2)
+            detalle_frame = ctk.CTkFrame(parametros_tab, width=800, height=620, corner_radius=15, fg_color="#FFFFFF",border_color="#000000", border_width=2)
             detalle_frame.pack(pady=30)
             detalle_frame.pack_propagate(False)
 
             ctk.CTkLabel(detalle_frame, text=f"Detalles de {seleccion}:", font=("Arial", 16,"bold"),text_color="black").pack(pady=10)
             
-            detalles = [
-                f"Hora de inicio: {tabla['inicio']}",
-                f"Hora de fin: {tabla['fin']}",
-                f"Duración de corte: {duracion_corte:.2f} segundos",
-                f"Corriente total: {tabla['Corriente_Total']:.2f} A",
-                f"Corriente máxima: {tabla['Corriente_Max']:.2f} A",
-                f"Corriente mínima: {tabla['Corriente_Min']:.2f} A",
-                f"Temperatura máxima: {tabla['Temperatura_Max']:.2f} °C",
-                f"Temperatura mínima: {tabla['Temperatura_Min']:.2f} °C",
-                f"Velocidad: {velocidad:.2f} m/s"
-            ]
-
-            for detalle in detalles:
+            for detalle in detalles_tabla(tabla, conteo_anomalias.iloc[indice]):
                 ctk.CTkLabel(detalle_frame, text=detalle, font=("Arial", 14),text_color="black",anchor="w").pack(anchor="w", padx=10,pady=5)
             
             datos_frame = ctk.CTkFrame(detalle_frame, width=580, height=240, fg_color="#FFFFFF")
@@ -509,52 +1305,16 @@ def crear_interfaz():
             
 
             def visualizar_graficas():
-                variables = ["Corriente", "Velocidad (ms)", "Temperatura(ºC)", "Distancia(mm)"]
-                hora_inicio = pd.Timestamp(tabla["inicio"]).time()
-                hora_fin = pd.Timestamp(tabla["fin"]).time()
-
-                ruta_base = ruta_base_var.get()
-                archivo_txt = os.path.join(ruta_base, "datos_exportados.txt")
-                if not os.path.isfile(archivo_txt):
-                    messagebox.showerror("Error", "No se ha cargado el dataset completo.")
+                if datos.loc[tabla["inicio"]:tabla["fin"]].empty:
+                    messagebox.showerror("Error", "No hay datos para graficar.")
                     return
-                try:
-                    datos_completos = pd.read_csv(archivo_txt, sep='\t')
-                    datos_filtrados = datos_completos[
-                        (pd.to_datetime(datos_completos['hora'], format='%H:%M:%S').dt.time >= hora_inicio) &
-                        (pd.to_datetime(datos_completos['hora'], format='%H:%M:%S').dt.time <= hora_fin)
-                    ]
-                    if datos_filtrados.empty:
-                        messagebox.showerror("Error", "No hay datos para graficar.")
-                        return
-
-                    #Crear subplots
-                    fig = make_subplots(rows= len(variables), cols=1,shared_xaxes= True, vertical_spacing= 0.02, subplot_titles=[f"Gráfico de {var}" for var in variables])
-
-                    for i, variable in enumerate(variables, start=1):
-                        if variable in datos_filtrados.columns:
-                            fig.add_trace(
-                                go.Scatter(
-                                    x=datos_filtrados['hora'],
-                                    y=datos_filtrados[variable],
-                                    mode='lines',
-                                    name=variable
-                                ),
-                                row=i, col=1
-                            )
-                            fig.update_yaxes(title_text=variable,row=i, col=1)
-
-                    fig.update_layout(
-                        height=300 * len(variables),
-                        title_text= f"Gráficas de Variables desde {tabla['inicio']} hasta {tabla['fin']}",
-                        showlegend=False,
-                    )
-
-                    temp_html = "temp_plot_all_variables.html"
-                    pio.write_html(fig, temp_html, auto_open=False)
-                    webbrowser.open(temp_html)
-                except Exception as e:
-                    messagebox.showerror("Error",f"No se pudo graficar: {e}") 
+                puntos = obtener_puntos_grafico()
+                if puntos is None:
+                    return
+                grafico_vista.update(tipo="tabla", tabla=(tabla["inicio"], tabla["fin"]), puntos=puntos)
+                mostrar_grafico()
+                if grafico_integrado is not None:
+                    tabview.set("Visualizar Gráficos")
 
 
             ctk.CTkButton(parametros_tab,text="Visualizar gráficas",command=visualizar_graficas,width=200,corner_radius=10).pack(pady=10)
@@ -580,10 +1340,175 @@ def crear_interfaz():
             if isinstance(widget, ctk.CTkButton) and widget.cget("text") == "Cargar parámetros de tablas":
                 widget.destroy()
 
+    # Umbrales para la detección de tablas (en segundos)
+    duracion_minima_var = ctk.StringVar(value="0")
+    tolerancia_hueco_var = ctk.StringVar(value="0")
+
     # boton
     ctk.CTkButton(parametros_tab, text="Cargar parámetros de tablas", 
     command=lambda: cargar_parametros_inicial(parametros_tab, ruta_base_var.get())).pack(pady=20)
 
+    # Historial: resumen por día y jornada de todas las carpetas registradas
+    def rango_historial():
+        # (desde, hasta) como fechas o None si alguna no es válida; vacías = todo
+        try:
+            desde = datetime.strptime(historial_desde_var.get(), "%d-%m-%Y").date() if historial_desde_var.get() else None
+            hasta = datetime.strptime(historial_hasta_var.get(), "%d-%m-%Y").date() if historial_hasta_var.get() else desde
+        except ValueError:
+            messagebox.showerror("Error", "Formato de fecha inválido. Use DD-MM-YYYY.")
+            return None
+        return desde, hasta
+
+    def consultar_historial():
+        ruta_base = ruta_base_var.get()
+        rango = rango_historial()
+        if rango is None:
+            return
+        if not os.path.isdir(ruta_base):
+            messagebox.showerror("Error", "La ruta base ingresada no es válida.")
+            return
+        resumen = resumen_historial(ruta_base, *rango, historial_jornada_var.get())
+        arbol_historial.delete(*arbol_historial.get_children())
+        for fila in resumen.itertuples(index=False):
+            # Los promedios con dos decimales; la deriva falta si no hubo temperatura
+            valores = [("" if pd.isna(valor) else f"{valor:.2f}") if isinstance(valor, float) else valor for valor in fila]
+            arbol_historial.insert("", "end", values=valores)
+        historial_estado.configure(text=f"{int(resumen['tablas'].sum()) if len(resumen) else 0} tablas en "
+                                        f"{resumen['fecha'].nunique()} días")
+
+    def registrar_todo_historial():
+        ruta_base = ruta_base_var.get()
+        if not os.path.isdir(ruta_base):
+            messagebox.showerror("Error", "La ruta base ingresada no es válida.")
+            return
+        registrar_historial(ruta_base, carpetas_con_fecha(ruta_base))
+
+    def graficar_tendencia():
+        ruta_base = ruta_base_var.get()
+        rango = rango_historial()
+        if rango is None or not os.path.isdir(ruta_base):
+            return
+        puntos = obtener_puntos_grafico()
+        if puntos is None:
+            return
+        nombre = historial_tendencia_var.get()
+        origen, columna = TENDENCIAS_HISTORIAL[nombre]
+        if origen == "tabla":
+            serie = consultar_tablas(ruta_base, *rango, historial_jornada_var.get()).set_index("inicio")[columna]
+        else:
+            serie = serie_historial(ruta_base, columna, *rango, historial_jornada_var.get())
+        if serie.empty:
+            messagebox.showinfo("Información", "No hay datos en el historial para ese rango.")
+            return
+        grafico_vista.update(tipo="historial", variable=nombre, serie=serie.rename(nombre), puntos=puntos)
+        mostrar_grafico()
+        if grafico_integrado is not None:
+            tabview.set("Visualizar Gráficos")
+
+    historial_frame = ctk.CTkFrame(historial_tab)
+    historial_frame.pack(pady=10)
+    historial_desde_var = ctk.StringVar()
+    historial_hasta_var = ctk.StringVar()
+    ctk.CTkLabel(historial_frame, text="Fechas (DD-MM-YYYY, vacías = todo):").pack(side="left", padx=5)
+    ctk.CTkEntry(historial_frame, textvariable=historial_desde_var, width=110, placeholder_text="Desde").pack(side="left", padx=5)
+    ctk.CTkEntry(historial_frame, textvariable=historial_hasta_var, width=110, placeholder_text="Hasta").pack(side="left", padx=5)
+    historial_jornada_var = ctk.StringVar(value="Todas")
+    ctk.CTkOptionMenu(historial_frame, values=["Todas", *JORNADAS], variable=historial_jornada_var).pack(side="left", padx=5)
+    ctk.CTkButton(historial_frame, text="Consultar", width=100, command=consultar_historial).pack(side="left", padx=5)
+    ctk.CTkButton(historial_frame, text="Registrar todas las carpetas", command=registrar_todo_historial).pack(side="left", padx=5)
+
+    columnas_historial = {"fecha": "Fecha", "jornada": "Jornada", "tablas": "Tablas", "duracion_media": "Duración media (s)",
+                          "tiempo_corte": "Tiempo de corte (s)", "corriente_pico": "Corriente pico (A)",
+                          "corriente_pico_media": "Pico medio (A)", "corriente_integrada_media": "Integrada media (A·s)",
+                          "temperatura_min": "Temp. mín (°C)", "temperatura_max": "Temp. máx (°C)",
+                          "deriva_temperatura": "Deriva temp. (°C)"}
+    arbol_historial = ttk.Treeview(historial_tab, columns=list(columnas_historial), show="headings", height=18)
+    for columna, titulo in columnas_historial.items():
+        arbol_historial.heading(columna, text=titulo)
+        arbol_historial.column(columna, width=105, anchor="center")
+    arbol_historial.pack(fill="both", expand=True, padx=10, pady=5)
+    historial_estado = ctk.CTkLabel(historial_tab, text="")
+    historial_estado.pack(anchor="w", padx=10)
+
+    tendencia_frame = ctk.CTkFrame(historial_tab)
+    tendencia_frame.pack(pady=10)
+    historial_tendencia_var = ctk.StringVar(value=next(iter(TENDENCIAS_HISTORIAL)))
+    ctk.CTkOptionMenu(tendencia_frame, values=list(TENDENCIAS_HISTORIAL), variable=historial_tendencia_var,
+                      width=260).pack(side="left", padx=5)
+    ctk.CTkButton(tendencia_frame, text="Graficar tendencia", command=graficar_tendencia).pack(side="left", padx=5)
+
+    # Diagnóstico: tiempo, filas y memoria de cada etapa de las últimas operaciones.
+    # Todas se agregan como líneas JSON al registro de diagnóstico
+    configurar_diagnostico(os.path.abspath(ARCHIVO_DIAGNOSTICO))
+    ejecuciones_diagnostico = {}
+
+    def configurar_medicion():
+        configurar_diagnostico(configuracion_diagnostico()["archivo"], memoria_diagnostico_var.get(),
+                               perfil_diagnostico_var.get())
+
+    def actualizar_diagnostico():
+        ejecuciones_diagnostico.clear()
+        for registro in ultimas_ejecuciones():
+            etiqueta = f"{registro['fecha'][11:]}  {registro['nombre']}  ({registro['segundos']:.3f} s)"
+            ejecuciones_diagnostico[etiqueta] = registro
+        etiquetas = list(ejecuciones_diagnostico) or ["Sin ejecuciones"]
+        ejecucion_menu.configure(values=etiquetas)
+        ejecucion_var.set(etiquetas[0])
+        mostrar_diagnostico()
+
+    def mostrar_diagnostico():
+        arbol_diagnostico.delete(*arbol_diagnostico.get_children())
+        perfil_texto.delete("1.0", "end")
+        registro = ejecuciones_diagnostico.get(ejecucion_var.get())
+        if registro is None:
+            return
+        padres = {-1: ""}
+        for nivel, medida, fraccion in filas_diagnostico(registro):
+            padres[nivel] = arbol_diagnostico.insert(
+                padres[nivel - 1], "end", text=medida["nombre"], open=True,
+                values=(f"{medida['segundos']:.4f}", f"{fraccion:.0%}", medida.get("filas", ""),
+                        f"{medida['pico_mb']:.1f}" if "pico_mb" in medida else ""))
+        if registro.get("error"):
+            perfil_texto.insert("end", f"Terminó con error: {registro['error']}\n\n")
+        perfil = registro.get("perfil")
+        if perfil:
+            perfil_texto.insert("end", f"{'acumulado (s)':>14}{'propio (s)':>12}{'llamadas':>10}  función\n")
+            for funcion in perfil["funciones"]:
+                perfil_texto.insert("end", f"{funcion['acumulado']:>14.4f}{funcion['propio']:>12.4f}"
+                                           f"{funcion['llamadas']:>10}  {funcion['funcion']}\n")
+            if "archivo" in perfil:
+                perfil_texto.insert("end", f"\nPerfil completo en {perfil['archivo']}\n")
+
+    diagnostico_frame = ctk.CTkFrame(diagnostico_tab)
+    diagnostico_frame.pack(pady=10, fill="x")
+    ejecucion_var = ctk.StringVar(value="Sin ejecuciones")
+    ejecucion_menu = ctk.CTkOptionMenu(diagnostico_frame, variable=ejecucion_var, values=["Sin ejecuciones"],
+                                       width=360, command=lambda _: mostrar_diagnostico())
+    ejecucion_menu.pack(side="left", padx=5)
+    ctk.CTkButton(diagnostico_frame, text="Actualizar", width=100, command=actualizar_diagnostico).pack(side="left", padx=5)
+    memoria_diagnostico_var = ctk.BooleanVar(value=False)
+    ctk.CTkCheckBox(diagnostico_frame, text="Medir memoria (tracemalloc)", variable=memoria_diagnostico_var,
+                    command=configurar_medicion).pack(side="left", padx=10)
+    perfil_diagnostico_var = ctk.BooleanVar(value=False)
+    ctk.CTkCheckBox(diagnostico_frame, text="Perfil (cProfile)", variable=perfil_diagnostico_var,
+                    command=configurar_medicion).pack(side="left", padx=10)
+    ctk.CTkLabel(diagnostico_tab, text=f"Registro: {configuracion_diagnostico()['archivo']}").pack(anchor="w", padx=10)
+
+    arbol_diagnostico = ttk.Treeview(diagnostico_tab, columns=("segundos", "porcentaje", "filas", "memoria"),
+                                     show="tree headings", height=16)
+    arbol_diagnostico.heading("#0", text="Etapa")
+    arbol_diagnostico.column("#0", width=320)
+    for columna, titulo in (("segundos", "Segundos"), ("porcentaje", "% del total"), ("filas", "Filas"),
+                            ("memoria", "Pico de memoria (MB)")):
+        arbol_diagnostico.heading(columna, text=titulo)
+        arbol_diagnostico.column(columna, width=140, anchor="e")
+    arbol_diagnostico.pack(fill="both", expand=True, padx=10, pady=5)
+    perfil_texto = ctk.CTkTextbox(diagnostico_tab, height=180, font=("Courier", 12))
+    perfil_texto.pack(fill="x", padx=10, pady=5)
+
+    # Al abrir la pestaña se muestra la última operación
+    tabview.configure(command=lambda: actualizar_diagnostico() if tabview.get() == "Diagnóstico" else None)
+
     ventana.mainloop()
 
 if __name__ == "__main__":
@@ -0,0 +1,54 @@
+# Procesamiento de los registros del aserradero sin interfaz gráfica: cargar,
+# alinear, segmentar en tablas, filtrar, resumir y exportar. No importa
+# customtkinter ni plotly, así puede usarse en un servidor o en benchmarks
+from .anomalias import (VARIABLES_ANOMALIAS, VENTANA_ANOMALIAS, actualizar_anomalias, anomalias_por_tabla,
+                        detectar_anomalias, resumen_anomalias)
+from .archivado import (BLOQUE_ARCHIVADO, INDICE_ARCHIVADO, archivar_carpeta, cargar_ventana, leer_indice_archivado,
+                        resumen_archivado)
+from .cache import DIRECTORIO_CACHE, VERSION_CACHE, cargar_sesion, cargar_ultima_sesion
+from .carga import (AGREGACIONES, ARCHIVOS_REGISTRO, COLUMNAS_EXPORTACION, COLUMNAS_MEDIDAS, MOTOR_LECTURA,
+                    RESOLUCIONES, TIPOS_MEDIDAS, TOLERANCIA_ALINEACION, alinear_series, cargar_datos_seleccionados,
+                    con_fecha_hora, informe_memoria, leer_archivo_registro, leer_archivos_carpeta,
+                    resumen_informe_carga, resumen_memoria, rutas_registro, sesion_vacia)
+from .carro import (COLUMNA_AVANCE, PAUSA_CARRO, agregar_avance, avance_carro, ciclos_carro, pulsos_carro,
+                    resumen_ciclos)
+from .consultas import JORNADAS, ConsultaTiempo, hora_a_ns
+from .exportacion import EXTENSIONES_EXPORTACION, FILAS_BLOQUE, PARTICIONES, exportar_sesion, exportar_tablas
+from .historial import (ARCHIVO_HISTORIAL, SENALES_HISTORIAL, actualizar_historial, carpetas_con_fecha,
+                        consultar_tablas, registrar_sesion, resumen_historial, ruta_historial, serie_historial)
+from .indice import (ARCHIVO_INDICE, actualizar_indice, buscar_carpetas, indexar_carpeta, leer_indice,
+                     resumen_carpeta)
+from .instrumentacion import (ARCHIVO_DIAGNOSTICO, configuracion_diagnostico, configurar_diagnostico, ejecucion, etapa,
+                              filas_diagnostico, leer_diagnostico, resumen_diagnostico, ultima_ejecucion,
+                              ultimas_ejecuciones)
+from .graficos import (COLOR_ANOMALIA, PUNTOS_GRAFICO, escribir_grafico, extender_reduccion, figura_series,
+                       indices_minmax, reducir_serie, reducir_tramo)
+from .informes import (DIRECTORIO_INFORMES, PUNTOS_INFORME, escribir_plotly, informes_carpetas, informes_sesion,
+                       ruta_informe)
+from .lote import cargar_lote, carpetas_en_rango, fecha_carpeta
+from .progreso import Tarea, TareaCancelada
+from .tablas import VARIABLES_TABLA, detalles_tabla, detectar_tablas, resumen_sesion, tablas_sesion
+from .vivo import SeguidorEnVivo
+
+__all__ = [
+    "AGREGACIONES", "ARCHIVOS_REGISTRO", "ARCHIVO_DIAGNOSTICO", "ARCHIVO_HISTORIAL", "ARCHIVO_INDICE",
+    "BLOQUE_ARCHIVADO", "COLOR_ANOMALIA", "COLUMNAS_EXPORTACION", "COLUMNAS_MEDIDAS", "COLUMNA_AVANCE",
+    "DIRECTORIO_CACHE", "DIRECTORIO_INFORMES", "EXTENSIONES_EXPORTACION", "FILAS_BLOQUE", "INDICE_ARCHIVADO",
+    "JORNADAS", "MOTOR_LECTURA", "PARTICIONES", "PAUSA_CARRO", "PUNTOS_GRAFICO", "PUNTOS_INFORME", "RESOLUCIONES",
+    "SENALES_HISTORIAL", "TIPOS_MEDIDAS", "TOLERANCIA_ALINEACION", "VARIABLES_ANOMALIAS", "VARIABLES_TABLA",
+    "VENTANA_ANOMALIAS", "VERSION_CACHE",
+    "ConsultaTiempo", "SeguidorEnVivo", "Tarea", "TareaCancelada",
+    "actualizar_anomalias", "actualizar_historial", "actualizar_indice", "agregar_avance", "alinear_series",
+    "anomalias_por_tabla", "archivar_carpeta", "avance_carro", "buscar_carpetas", "cargar_datos_seleccionados",
+    "cargar_lote", "cargar_sesion", "cargar_ultima_sesion", "cargar_ventana", "carpetas_con_fecha",
+    "carpetas_en_rango", "ciclos_carro", "con_fecha_hora", "configuracion_diagnostico", "configurar_diagnostico",
+    "consultar_tablas", "detalles_tabla", "detectar_anomalias", "detectar_tablas", "ejecucion", "escribir_grafico",
+    "escribir_plotly", "etapa", "exportar_sesion", "exportar_tablas", "extender_reduccion", "fecha_carpeta",
+    "figura_series", "filas_diagnostico", "hora_a_ns", "indexar_carpeta", "indices_minmax", "informe_memoria",
+    "informes_carpetas", "informes_sesion", "leer_archivo_registro", "leer_archivos_carpeta", "leer_diagnostico",
+    "leer_indice", "leer_indice_archivado", "pulsos_carro", "reducir_serie", "reducir_tramo", "registrar_sesion",
+    "resumen_anomalias", "resumen_archivado", "resumen_carpeta", "resumen_ciclos", "resumen_diagnostico",
+    "resumen_historial", "resumen_informe_carga", "resumen_memoria", "resumen_sesion", "ruta_historial",
+    "ruta_informe", "rutas_registro", "serie_historial", "sesion_vacia", "tablas_sesion", "ultima_ejecucion",
+    "ultimas_ejecuciones",
+]
@@ -0,0 +1,6 @@
+# python -m aserradero ...: la línea de comandos de cli.py
+import sys
+
+from .cli import main
+
+sys.exit(main())
@@ -0,0 +1,151 @@
+# Sobrecargas de la sierra y sobretemperatura: dentro de cada tabla, cada
+# muestra se compara con las de los segundos anteriores de la misma tabla
+import numpy as np
+import pandas as pd
+
+from .instrumentacion import etapa
+from .tablas import detectar_tablas
+
+# Variables vigiladas. evento: nombre del evento; z: desvíos sobre la media de
+# la ventana a partir de los cuales una muestra es anómala; desvio_minimo: piso
+# del desvío (una señal casi constante no dispara eventos por ruido); limite:
+# valor absoluto que siempre es anómalo (None = solo z); cero_faltante: los
+# ceros son lecturas que faltan, como la temperatura rellenada con 0
+VARIABLES_ANOMALIAS = {
+    "Corriente": {"evento": "Sobrecarga", "z": 4.0, "desvio_minimo": 0.5, "limite": None, "cero_faltante": False},
+    "Temperatura(ºC)": {"evento": "Sobretemperatura", "z": 4.0, "desvio_minimo": 0.2, "limite": None,
+                        "cero_faltante": True},
+}
+# Segundos anteriores de la misma tabla con los que se compara cada muestra
+VENTANA_ANOMALIAS = 5.0
+# Muestras previas necesarias para calcular z (al empezar cada tabla solo cuenta el límite)
+MUESTRAS_MINIMAS = 20
+# Muestras anómalas separadas por menos de estos segundos forman un solo evento
+UNION_ANOMALIAS = 1.0
+
+COLUMNAS_ANOMALIAS = {"inicio": "datetime64[ns]", "fin": "datetime64[ns]", "duracion": "float64", "tabla": "int64",
+                      "variable": "object", "evento": "object", "muestras": "int64", "valor_max": "float64",
+                      "z_max": "float64"}
+
+
+def _anomalias_vacias():
+    return pd.DataFrame({col: pd.Series(dtype=tipo) for col, tipo in COLUMNAS_ANOMALIAS.items()})
+
+
+def _filas_tablas(datos, tablas):
+    # Posición en `datos` de cada fila que está dentro de una tabla, número de
+    # esa tabla y primera fila (en la selección) de su tabla. Solo se recorren
+    # las filas de las tablas, no la sesión completa
+    indice = datos.index
+    desde = indice.searchsorted(tablas["inicio"].to_numpy(), side="left")
+    hasta = indice.searchsorted(tablas["fin"].to_numpy(), side="right")
+    largos = hasta - desde
+    comienzos = np.r_[0, np.cumsum(largos)[:-1]]
+    total = int(largos.sum())
+    posiciones = np.repeat(desde - comienzos, largos) + np.arange(total)
+    numeros = np.repeat(np.arange(len(tablas)), largos)
+    primeras = np.repeat(comienzos, largos)
+    return posiciones, numeros, primeras
+
+
+def _muestras_anomalas(valores, tiempos, primeras, opciones, ventana_ns):
+    # z de cada muestra respecto de la ventana anterior dentro de su tabla, con
+    # sumas acumuladas: O(n) sin importar el largo de la ventana
+    validos = ~np.isnan(valores)
+    centro = np.nanmean(valores) if validos.any() else 0.0
+    centrados = np.where(validos, valores - centro, 0.0)
+    cantidad = np.r_[0, np.cumsum(validos)]
+    suma = np.r_[0.0, np.cumsum(centrados)]
+    cuadrados = np.r_[0.0, np.cumsum(centrados * centrados)]
+
+    fila = np.arange(len(valores))
+    inicio = np.maximum(np.searchsorted(tiempos, tiempos - ventana_ns, side="left"), primeras)
+    n = cantidad[fila] - cantidad[inicio]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        media = (suma[fila] - suma[inicio]) / n
+        varianza = np.maximum((cuadrados[fila] - cuadrados[inicio]) / n - media * media, 0.0)
+        z = (centrados - media) / np.maximum(np.sqrt(varianza), opciones["desvio_minimo"])
+    z = np.where(validos & (n >= MUESTRAS_MINIMAS), z, np.nan)
+
+    anomalas = z >= opciones["z"]
+    if opciones["limite"] is not None:
+        anomalas |= validos & (valores >= opciones["limite"])
+    return anomalas, z
+
+
+def detectar_anomalias(datos, tablas=None, variables=None, ventana=VENTANA_ANOMALIAS, union=UNION_ANOMALIAS,
+                       primera_tabla=0):
+    # Un evento por cada tramo de muestras anómalas de una variable en una tabla.
+    # `tabla` es la posición en `tablas` (0 = la primera). Con `primera_tabla`
+    # solo se analizan las tablas desde esa posición, para el modo en vivo
+    if tablas is None:
+        tablas = detectar_tablas(datos)
+    variables = VARIABLES_ANOMALIAS if variables is None else variables
+    tablas = tablas.iloc[primera_tabla:]
+    if tablas.empty or datos.empty:
+        return _anomalias_vacias()
+
+    with etapa("anomalias", len(datos)) as medida:
+        posiciones, numeros, primeras = _filas_tablas(datos, tablas)
+        medida.filas = len(posiciones)
+        tiempos = datos.index.to_numpy(dtype="datetime64[ns]").view(np.int64)[posiciones]
+        union_ns = int(union * 1e9)
+        eventos = []
+        for variable, opciones in variables.items():
+            if variable not in datos.columns:
+                continue
+            valores = datos[variable].to_numpy(dtype=np.float64)[posiciones]
+            if opciones.get("cero_faltante"):
+                valores[valores == 0] = np.nan
+            anomalas, z = _muestras_anomalas(valores, tiempos, primeras, opciones, int(ventana * 1e9))
+            filas = np.flatnonzero(anomalas)
+            if not len(filas):
+                continue
+
+            # Cortar donde cambia la tabla o el hueco entre muestras anómalas supera `union`
+            corte = (np.diff(numeros[filas]) != 0) | (np.diff(tiempos[filas]) > union_ns)
+            comienzos = filas[np.r_[True, corte]]
+            finales = filas[np.r_[corte, True]]
+            grupo = np.cumsum(np.r_[True, corte]) - 1
+            eventos.append(pd.DataFrame({
+                "inicio": tiempos[comienzos].view("datetime64[ns]"),
+                "fin": tiempos[finales].view("datetime64[ns]"),
+                "duracion": (tiempos[finales] - tiempos[comienzos]) / 1e9,
+                "tabla": numeros[comienzos] + primera_tabla,
+                "variable": variable,
+                "evento": opciones["evento"],
+                "muestras": np.bincount(grupo),
+                "valor_max": np.maximum.reduceat(valores[filas], np.flatnonzero(np.r_[True, corte])),
+                "z_max": np.fmax.reduceat(z[filas], np.flatnonzero(np.r_[True, corte])),
+            }))
+    if not eventos:
+        return _anomalias_vacias()
+    return (pd.concat(eventos, ignore_index=True).sort_values(["inicio", "variable"], kind="stable")
+            .reset_index(drop=True).astype(COLUMNAS_ANOMALIAS))
+
+
+def actualizar_anomalias(anteriores, datos, tablas, primera_tabla, **opciones):
+    # Conserva los eventos de las tablas anteriores a `primera_tabla`, que ya no
+    # cambian, y recalcula solo las tablas desde ahí
+    conservados = anteriores[anteriores["tabla"] < primera_tabla]
+    nuevos = detectar_anomalias(datos, tablas, primera_tabla=primera_tabla, **opciones)
+    if conservados.empty:
+        return nuevos
+    return pd.concat([conservados, nuevos], ignore_index=True) if len(nuevos) else conservados
+
+
+def anomalias_por_tabla(anomalias, cantidad_tablas):
+    # Eventos de cada tabla por tipo, con una fila por tabla (0 si no tuvo)
+    conteo = pd.crosstab(anomalias["tabla"], anomalias["evento"]) if len(anomalias) else pd.DataFrame()
+    eventos = [opciones["evento"] for opciones in VARIABLES_ANOMALIAS.values()]
+    return conteo.reindex(index=range(cantidad_tablas), columns=eventos, fill_value=0)
+
+
+def resumen_anomalias(anomalias):
+    if anomalias.empty:
+        return "Sin anomalías detectadas."
+    lineas = [f"Anomalías detectadas: {len(anomalias)}"]
+    for evento, grupo in anomalias.groupby("evento", sort=False):
+        lineas.append(f"  {evento}: {len(grupo)} en {grupo['tabla'].nunique()} tablas, "
+                      f"máximo {grupo['valor_max'].max():.2f} (z {grupo['z_max'].max():.1f})")
+    return "\n".join(lineas)
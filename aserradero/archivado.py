@@ -0,0 +1,190 @@
+# Archivo comprimido de carpetas antiguas: cada .txt pasa a un .txt.gz formado
+# por bloques gzip independientes (zcat y pandas lo siguen leyendo entero) y
+# la carpeta guarda un índice con el rango de tiempo de cada bloque, así una
+# ventana de minutos se lee descomprimiendo solo los bloques que la cubren
+import gzip
+import hashlib
+import io
+import json
+import os
+import time
+
+import pandas as pd
+
+from .cache import cargar_sesion
+from .carro import CONTEXTO_AVANCE
+from .carga import (ARCHIVOS_REGISTRO, TOLERANCIA_ALINEACION, _preparar_sesion, alinear_series,
+                    leer_archivo_registro, rutas_registro, sesion_vacia)
+from .instrumentacion import etapa
+from .progreso import _sin_progreso
+
+INDICE_ARCHIVADO = "indice_archivado.json"
+# Versión del formato del índice; una carpeta con otra versión se lee entera
+VERSION_ARCHIVADO = 1
+# Bytes de texto por bloque: unos minutos de Corr.txt, lo mínimo que se descomprime
+BLOQUE_ARCHIVADO = 256 * 2**10
+NIVEL_COMPRESION = 6
+# Solo se archivan carpetas cuyos archivos no cambiaron en estas horas (la del
+# día puede seguir recibiendo líneas)
+HORAS_SIN_CAMBIOS = 24
+
+
+def ruta_indice_archivado(carpeta):
+    return os.path.join(carpeta, INDICE_ARCHIVADO)
+
+
+def leer_indice_archivado(carpeta):
+    # None si la carpeta no está archivada
+    try:
+        with open(ruta_indice_archivado(carpeta), encoding="utf-8") as archivo:
+            indice = json.load(archivo)
+    except (OSError, ValueError):
+        return None
+    return indice if indice.get("version") == VERSION_ARCHIVADO else None
+
+
+def _bloques_texto(archivo, tamano):
+    # Bloques de líneas completas de unos `tamano` bytes
+    resto = b""
+    while leido := archivo.read(tamano):
+        texto = resto + leido
+        corte = texto.rfind(b"\n") + 1
+        if corte:
+            yield texto[:corte]
+        resto = texto[corte:]
+    if resto:
+        yield resto
+
+
+def _comprimir_archivo(ruta, tipo, destino, tamano_bloque):
+    # La cabecera va en su propio bloque para que el .gz descomprimido sea
+    # idéntico al original; cada bloque guarda [posición, largo, líneas,
+    # primer instante, último instante] (instantes en ns desde 1970)
+    original = hashlib.sha1()
+    bloques = []
+    with open(ruta, "rb") as entrada, open(destino, "wb") as salida:
+        cabecera = entrada.readline()
+        original.update(cabecera)
+        salida.write(gzip.compress(cabecera, NIVEL_COMPRESION, mtime=0))
+        for texto in _bloques_texto(entrada, tamano_bloque):
+            original.update(texto)
+            tiempos = leer_archivo_registro(io.BytesIO(cabecera + texto), tipo)[0]["datetime"]
+            miembro = gzip.compress(texto, NIVEL_COMPRESION, mtime=0)
+            bloques.append([salida.tell(), len(miembro), texto.count(b"\n") + (not texto.endswith(b"\n")),
+                            tiempos.min().value if len(tiempos) else None,
+                            tiempos.max().value if len(tiempos) else None])
+            salida.write(miembro)
+
+    # Antes de borrar nada, el .gz completo tiene que reproducir el original
+    comprobado = hashlib.sha1()
+    with gzip.open(destino, "rb") as comprimido:
+        while leido := comprimido.read(2**20):
+            comprobado.update(leido)
+    if comprobado.digest() != original.digest():
+        raise OSError(f"La verificación de {os.path.basename(ruta)} comprimido falló.")
+    # latin-1 conserva los bytes de la cabecera tal cual, sea cual sea su codificación
+    return {"archivo": os.path.basename(ruta) + ".gz", "original": os.path.basename(ruta),
+            "tamano_original": os.path.getsize(ruta), "cabecera": cabecera.decode("latin-1"), "bloques": bloques}
+
+
+def archivar_carpeta(carpeta, tamano_bloque=BLOQUE_ARCHIVADO, progreso=_sin_progreso):
+    # Comprime los tres archivos y borra los .txt. Devuelve los bytes antes y
+    # después, o None si la carpeta ya estaba archivada
+    if leer_indice_archivado(carpeta) is not None:
+        return None
+    rutas = rutas_registro(carpeta)
+    faltan = [ARCHIVOS_REGISTRO[tipo]["archivo"] for tipo, ruta in rutas.items()
+              if ruta.endswith(".gz") or not os.path.isfile(ruta)]
+    if faltan:
+        raise ValueError(f"No se puede archivar {os.path.basename(carpeta)}: faltan {', '.join(faltan)}.")
+    if any(time.time() - os.path.getmtime(ruta) < HORAS_SIN_CAMBIOS * 3600 for ruta in rutas.values()):
+        raise ValueError(f"No se puede archivar {os.path.basename(carpeta)}: "
+                         f"sus archivos cambiaron en las últimas {HORAS_SIN_CAMBIOS} horas.")
+
+    indice = {"version": VERSION_ARCHIVADO, "bloque": tamano_bloque, "archivos": {}}
+    temporales = []
+    try:
+        for i, (tipo, ruta) in enumerate(rutas.items()):
+            progreso(i / len(rutas), f"Comprimiendo {os.path.basename(ruta)}")
+            temporales.append(ruta + ".gz.tmp")
+            with etapa(os.path.basename(ruta)):
+                indice["archivos"][tipo] = _comprimir_archivo(ruta, tipo, temporales[-1], tamano_bloque)
+    except BaseException:
+        for temporal in temporales:
+            if os.path.isfile(temporal):
+                os.remove(temporal)
+        raise
+
+    # Primero los .gz y el índice y recién después se borran los .txt: si algo
+    # se interrumpe, los originales siguen ahí y se leen con prioridad
+    for temporal in temporales:
+        os.replace(temporal, temporal[:-len(".tmp")])
+    with open(ruta_indice_archivado(carpeta) + ".tmp", "w", encoding="utf-8") as archivo:
+        json.dump(indice, archivo)
+    os.replace(ruta_indice_archivado(carpeta) + ".tmp", ruta_indice_archivado(carpeta))
+    for ruta in rutas.values():
+        os.remove(ruta)
+    progreso(1.0, "Carpeta archivada")
+    return {"original": sum(entrada["tamano_original"] for entrada in indice["archivos"].values()),
+            "comprimido": sum(os.path.getsize(ruta + ".gz") for ruta in rutas.values())}
+
+
+def _leer_bloques(carpeta, tipo, entrada, desde_ns, hasta_ns):
+    # Descomprime solo los bloques cuyo rango de tiempo toca la ventana
+    partes = []
+    with open(os.path.join(carpeta, entrada["archivo"]), "rb") as archivo:
+        for posicion, largo, _, primero, ultimo in entrada["bloques"]:
+            if primero is not None and primero <= hasta_ns and ultimo >= desde_ns:
+                archivo.seek(posicion)
+                partes.append(gzip.decompress(archivo.read(largo)))
+    datos, informe = leer_archivo_registro(io.BytesIO(entrada["cabecera"].encode("latin-1") + b"".join(partes)), tipo)
+    # Sin bloques en la ventana la columna sale vacía con otra resolución
+    datos["datetime"] = datos["datetime"].astype("datetime64[ns]")
+    tiempos = datos["datetime"].to_numpy().view("int64")
+    informe["bloques"] = len(partes)
+    return datos[(tiempos >= desde_ns) & (tiempos <= hasta_ns)].reset_index(drop=True), informe
+
+
+def cargar_ventana(carpeta, desde, hasta, grilla=None, agregacion="mean", progreso=_sin_progreso):
+    # Sesión entre dos instantes. En una carpeta archivada se leen solo los
+    # bloques necesarios (con un margen para alinear los bordes y calcular el
+    # avance del carro igual que al cargar la carpeta entera); si no, se
+    # recorta la sesión completa
+    desde, hasta = pd.Timestamp(desde), pd.Timestamp(hasta)
+    indice = leer_indice_archivado(carpeta)
+    if indice is None:
+        datos = cargar_sesion(carpeta, grilla, agregacion, progreso).loc[desde:hasta]
+        # Las tablas guardadas junto a la caché son de la carpeta entera: las de
+        # la ventana se detectan sobre ella (como en cargar_lote)
+        datos.attrs.pop("ruta_cache", None)
+        return datos
+
+    margen = pd.Timedelta(TOLERANCIA_ALINEACION) + pd.Timedelta(seconds=CONTEXTO_AVANCE + 1)
+    desde_ns, hasta_ns = (desde - margen).value, (hasta + margen).value
+    archivos = {}
+    informe = []
+    for i, (tipo, entrada) in enumerate(indice["archivos"].items()):
+        progreso(0.7 * i / len(indice["archivos"]), f"Leyendo {entrada['original']}")
+        with etapa(entrada["original"]) as medida:
+            archivos[tipo], informe_archivo = _leer_bloques(carpeta, tipo, entrada, desde_ns, hasta_ns)
+            medida.filas = len(archivos[tipo])
+        informe.append(informe_archivo)
+    if all(df.empty for df in archivos.values()):
+        return sesion_vacia()
+
+    progreso(0.7, "Alineando sensores")
+    datos = _preparar_sesion(alinear_series(archivos, grilla, agregacion)).loc[desde:hasta]
+    datos.attrs["informe_carga"] = informe
+    return datos
+
+
+def resumen_archivado(carpeta):
+    # Texto con el tamaño antes y después de archivar, o vacío si no está archivada
+    indice = leer_indice_archivado(carpeta)
+    if indice is None:
+        return ""
+    original = sum(entrada["tamano_original"] for entrada in indice["archivos"].values())
+    comprimido = sum(os.path.getsize(os.path.join(carpeta, entrada["archivo"])) for entrada in indice["archivos"].values())
+    bloques = sum(len(entrada["bloques"]) for entrada in indice["archivos"].values())
+    return (f"Archivada: {original / 2**20:.1f} MB -> {comprimido / 2**20:.1f} MB "
+            f"({comprimido / original:.0%}) en {bloques} bloques")
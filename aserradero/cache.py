@@ -0,0 +1,119 @@
+# Caché de sesiones ya procesadas en formato Feather
+import hashlib
+import os
+
+from .carga import ARCHIVOS_REGISTRO, cargar_datos_seleccionados, feather, pa, rutas_registro
+from .instrumentacion import etapa
+from .progreso import _sin_progreso
+from .tablas import tablas_sesion
+
+# Carpeta (dentro de la ruta base) donde se guardan las sesiones ya procesadas
+DIRECTORIO_CACHE = ".cache_daser"
+
+# Versión del formato de la caché; cambiarla invalida las sesiones guardadas
+VERSION_CACHE = 4
+
+
+def clave_cache(carpeta, configuracion=""):
+    # La clave depende de la carpeta, de la configuración de alineación y de la
+    # fecha de modificación y tamaño de sus tres archivos, así cualquier cambio
+    # en los .txt invalida la caché
+    huella = hashlib.sha1(f"{os.path.abspath(carpeta)}|{configuracion}|{VERSION_CACHE}".encode("utf-8"))
+    rutas = rutas_registro(carpeta)
+    for tipo, formato in ARCHIVOS_REGISTRO.items():
+        info = os.stat(rutas[tipo])
+        huella.update(f"|{formato['archivo']}:{info.st_mtime_ns}:{info.st_size}".encode("utf-8"))
+    return huella.hexdigest()[:16]
+
+
+def ruta_cache_sesion(carpeta, configuracion=""):
+    # "<carpeta>-<configuración>-<clave>.feather": la parte de la configuración no
+    # cambia con los .txt, así al guardar se reconocen las versiones anteriores
+    # de esta misma configuración sin tocar las de otras grillas o agregaciones
+    carpeta = os.path.abspath(carpeta)
+    directorio = os.path.join(os.path.dirname(carpeta), DIRECTORIO_CACHE)
+    parte = hashlib.sha1(f"{configuracion}|{VERSION_CACHE}".encode("utf-8")).hexdigest()[:8]
+    return os.path.join(directorio, f"{os.path.basename(carpeta)}-{parte}-{clave_cache(carpeta, configuracion)}.feather")
+
+
+def guardar_cache_sesion(datos, ruta_cache):
+    directorio = os.path.dirname(ruta_cache)
+    os.makedirs(directorio, exist_ok=True)
+
+    # Sin compresión para poder abrir el archivo con memory-map
+    temporal = ruta_cache + ".tmp"
+    tabla = pa.Table.from_pandas(datos, preserve_index=True)
+    feather.write_feather(tabla, temporal, compression="uncompressed")
+    os.replace(temporal, ruta_cache)
+
+    # Eliminar versiones anteriores de la misma carpeta y configuración, con sus
+    # estadísticas por tabla (ver ruta_tablas_sesion); las de esta versión quedan
+    actual = os.path.splitext(os.path.basename(ruta_cache))[0]
+    prefijo = actual.rsplit("-", 1)[0] + "-"
+    for nombre in os.listdir(directorio):
+        if nombre.startswith(prefijo) and nombre.endswith(".feather") and not nombre.startswith(actual + "."):
+            os.remove(os.path.join(directorio, nombre))
+
+
+def leer_cache_sesion(ruta_cache):
+    tabla = feather.read_table(ruta_cache, memory_map=True)
+    return tabla.to_pandas(split_blocks=True)
+
+
+def registrar_ultima_sesion(ruta_cache):
+    # Recordar la última sesión cargada para poder reabrirla sin volver a procesarla
+    ruta = os.path.join(os.path.dirname(ruta_cache), "ultima_sesion.txt")
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        archivo.write(os.path.basename(ruta_cache))
+
+
+def cargar_ultima_sesion(ruta_base):
+    if feather is None:
+        return None
+    directorio = os.path.join(ruta_base, DIRECTORIO_CACHE)
+    try:
+        with open(os.path.join(directorio, "ultima_sesion.txt"), encoding="utf-8") as archivo:
+            ruta_cache = os.path.join(directorio, archivo.read().strip())
+        datos = leer_cache_sesion(ruta_cache)
+        datos.attrs["ruta_cache"] = ruta_cache
+        return datos
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+
+def cargar_sesion(carpeta_seleccionada, grilla=None, agregacion="mean", progreso=_sin_progreso):
+    # Sin pyarrow no hay caché: se procesan los .txt cada vez
+    if feather is None:
+        return cargar_datos_seleccionados(carpeta_seleccionada, grilla, agregacion, progreso)
+
+    try:
+        ruta_cache = ruta_cache_sesion(carpeta_seleccionada, f"{grilla}|{agregacion}")
+    except OSError:
+        ruta_cache = None
+
+    if ruta_cache and os.path.isfile(ruta_cache):
+        progreso(0.0, "Abriendo sesión guardada")
+        try:
+            with etapa("cache lectura") as medida:
+                datos = leer_cache_sesion(ruta_cache)
+                medida.filas = len(datos)
+            registrar_ultima_sesion(ruta_cache)
+            datos.attrs["ruta_cache"] = ruta_cache
+            tablas_sesion(datos)
+            return datos
+        except (OSError, pa.ArrowInvalid):
+            pass  # Caché dañada: se vuelve a generar
+
+    datos = cargar_datos_seleccionados(carpeta_seleccionada, grilla, agregacion, progreso)
+    if ruta_cache and not datos.empty:
+        progreso(0.95, "Guardando sesión")
+        try:
+            with etapa("cache escritura", len(datos)):
+                guardar_cache_sesion(datos, ruta_cache)
+            registrar_ultima_sesion(ruta_cache)
+            datos.attrs["ruta_cache"] = ruta_cache
+        except (OSError, pa.ArrowException):
+            pass  # La caché es opcional, los datos ya están en memoria
+    # Las estadísticas de las tablas se calculan una vez al cargar y quedan guardadas junto a la sesión
+    tablas_sesion(datos)
+    return datos
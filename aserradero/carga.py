@@ -0,0 +1,310 @@
+# Lectura de los tres archivos de registro y alineación en una sesión
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from .carro import COLUMNA_AVANCE, agregar_avance
+from .instrumentacion import etapa
+from .progreso import _sin_progreso
+
+# pyarrow es opcional: se usa para leer los .txt y para la caché de sesiones
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+    feather = None
+
+# Motor de lectura: pyarrow si está instalado, si no el motor C de pandas
+MOTOR_LECTURA = "pyarrow" if pa is not None else "c"
+
+
+# Descripción de cada archivo de registro: nombre, columnas de fecha y hora,
+# columnas numéricas (con su nombre final) y formato fijo de la fecha.
+# "%Y/%m/%d" acepta tanto "2025/01/10" (Corr y láser) como "2025/1/10" (Velocidad)
+ARCHIVOS_REGISTRO = {
+    "corriente": {
+        "archivo": "Corr.txt",
+        "fecha": "Fecha",
+        "hora": "Hora",
+        "valores": {"Corriente": "Corriente"},
+        "formato_fecha": "%Y/%m/%d",
+    },
+    "laser": {
+        "archivo": "registro_laser.txt",  # Reemplazar si se quiere leer otro archivo
+        "fecha": "Fecha",
+        "hora": "Hora",
+        "valores": {"Temperatura(ºC)": "Temperatura(ºC)", "Distancia(mm)": "Distancia(mm)", "Madera": "Madera"},
+        "formato_fecha": "%Y/%m/%d",
+    },
+    "velocidad": {
+        "archivo": "Velocidad.txt",
+        "fecha": "Date",
+        "hora": "Time",
+        "valores": {"Milliseconds": "Velocidad (ms)"},
+        "formato_fecha": "%Y/%m/%d",
+    },
+}
+
+
+def _parsear_datetime(fechas, horas, formato_fecha):
+    # Las fechas y horas se repiten mucho (varias lecturas por segundo), así que
+    # se convierten solo los valores únicos y luego se expanden con sus códigos
+    codigos_fecha, unicas_fecha = pd.factorize(fechas)
+    codigos_hora, unicas_hora = pd.factorize(horas)
+    dias = pd.to_datetime(pd.Index(unicas_fecha), format=formato_fecha, errors="coerce").values
+    offsets = pd.to_timedelta(pd.Index(unicas_hora), errors="coerce").values
+    resultado = dias[codigos_fecha] + offsets[codigos_hora]
+    # factorize marca los valores nulos con -1
+    resultado[(codigos_fecha < 0) | (codigos_hora < 0)] = np.datetime64("NaT")
+    return resultado
+
+
+def leer_archivo_registro(ruta, tipo, motor=None):
+    formato = ARCHIVOS_REGISTRO[tipo]
+    motor = motor or MOTOR_LECTURA
+    columnas_texto = {formato["fecha"]: str, formato["hora"]: str}
+
+    # Contar las líneas mal formadas en lugar de omitirlas en silencio
+    lineas_malas = 0
+    with etapa("lectura") as medida:
+        if motor == "pyarrow":
+            def saltar_linea(_linea):
+                nonlocal lineas_malas
+                lineas_malas += 1
+                return "skip"
+
+            df = pd.read_csv(ruta, sep=" ", engine="pyarrow", dtype=columnas_texto, on_bad_lines=saltar_linea)
+        else:
+            with warnings.catch_warnings(record=True) as avisos:
+                warnings.simplefilter("always", pd.errors.ParserWarning)
+                df = pd.read_csv(ruta, sep=r"\s+", engine="c", dtype=columnas_texto, on_bad_lines="warn")
+            lineas_malas = sum(str(aviso.message).count("Skipping line") for aviso in avisos)
+        medida.filas = len(df)
+
+    with etapa("fechas", len(df)):
+        datos = pd.DataFrame({"datetime": _parsear_datetime(df[formato["fecha"]], df[formato["hora"]],
+                                                            formato["formato_fecha"])})
+
+    # Convertir columnas numéricas; los valores no numéricos (p. ej. "Stopped") quedan en 0
+    valores_invalidos = 0
+    with etapa("conversion numerica", len(df)):
+        for columna, nombre in formato["valores"].items():
+            if columna not in df.columns:
+                datos[nombre] = 0.0
+                continue
+            valores = pd.to_numeric(df[columna], errors="coerce")
+            valores_invalidos += int((valores.isna() & df[columna].notna()).sum())
+            datos[nombre] = valores.fillna(0).to_numpy()
+
+    # Descartar filas sin fecha u hora válida
+    fechas_invalidas = int(datos["datetime"].isna().sum())
+    if fechas_invalidas:
+        datos = datos[datos["datetime"].notna()].reset_index(drop=True)
+
+    informe = {
+        "archivo": os.path.basename(ruta) if isinstance(ruta, str) else formato["archivo"],
+        "filas": len(datos),
+        "lineas_malas": lineas_malas,
+        "valores_invalidos": valores_invalidos,
+        "fechas_invalidas": fechas_invalidas,
+    }
+    return datos, informe
+
+
+def rutas_registro(carpeta):
+    # Ruta de cada archivo de registro sin distinguir mayúsculas (hay carpetas
+    # con corr.txt y velocidad.txt); en una carpeta archivada, el .txt.gz (pandas
+    # lo descomprime al leerlo); si falta, la ruta con el nombre esperado
+    with os.scandir(carpeta) as entradas:
+        nombres = {entrada.name.lower(): entrada.name for entrada in entradas if entrada.is_file()}
+    rutas = {}
+    for tipo, formato in ARCHIVOS_REGISTRO.items():
+        clave = formato["archivo"].lower()
+        rutas[tipo] = os.path.join(carpeta, nombres.get(clave, nombres.get(clave + ".gz", formato["archivo"])))
+    return rutas
+
+
+def leer_archivos_carpeta(carpeta, motor=None, progreso=_sin_progreso):
+    datos = {}
+    informe = []
+    rutas = rutas_registro(carpeta)
+    for i, (tipo, formato) in enumerate(ARCHIVOS_REGISTRO.items()):
+        progreso(i / len(ARCHIVOS_REGISTRO), f"Leyendo {formato['archivo']}")
+        ruta = rutas[tipo]
+        with etapa(formato["archivo"]) as medida:
+            datos[tipo], informe_archivo = leer_archivo_registro(ruta, tipo, motor)
+            medida.filas = len(datos[tipo])
+        informe.append(informe_archivo)
+    return datos, informe
+
+
+def resumen_informe_carga(informe):
+    # Texto con los problemas encontrados al leer los archivos, vacío si no hubo
+    lineas = []
+    for archivo in informe:
+        problemas = []
+        if archivo["lineas_malas"]:
+            problemas.append(f"{archivo['lineas_malas']} líneas mal formadas")
+        if archivo["valores_invalidos"]:
+            problemas.append(f"{archivo['valores_invalidos']} valores no numéricos")
+        if archivo["fechas_invalidas"]:
+            problemas.append(f"{archivo['fechas_invalidas']} fechas inválidas")
+        # Solo en vivo: líneas con una hora anterior a lo que todavía se podía corregir
+        if archivo.get("filas_atrasadas"):
+            problemas.append(f"{archivo['filas_atrasadas']} filas atrasadas descartadas")
+        if problemas:
+            lineas.append(f"{archivo['archivo']}: " + ", ".join(problemas))
+    return "\n".join(lineas)
+
+
+# Funciones de agregación disponibles para cada intervalo de la grilla común
+AGREGACIONES = ("mean", "max", "last")
+
+# Antigüedad máxima del último valor de un sensor para asociarlo a otra muestra
+TOLERANCIA_ALINEACION = "2s"
+
+# Grillas comunes disponibles para alinear los sensores (None = todas las muestras)
+RESOLUCIONES = {"Todas las muestras": None, "100 ms": "100ms", "1 s": "1s"}
+
+# Columnas de los tres sensores una vez combinadas, más el avance del carro
+# derivado del contador de Velocidad.txt
+COLUMNAS_MEDIDAS = ['Corriente', COLUMNA_AVANCE, 'Velocidad (ms)', 'Temperatura(ºC)', 'Distancia(mm)', 'Madera']
+
+# Tipos con los que se guarda la sesión en memoria. float32 alcanza para los
+# sensores; el contador de Velocidad.txt sigue en float64 porque supera los
+# 2^24 ms (unas 4,6 horas) y float32 perdería milisegundos
+TIPOS_MEDIDAS = {'Corriente': 'float32', COLUMNA_AVANCE: 'float32', 'Velocidad (ms)': 'float64',
+                 'Temperatura(ºC)': 'float32', 'Distancia(mm)': 'float32', 'Madera': 'uint8'}
+
+# Columnas que se muestran y exportan; fecha y hora se derivan del índice
+COLUMNAS_EXPORTACION = ['fecha', 'hora'] + COLUMNAS_MEDIDAS
+
+
+def _sintetizar_subsegundos(datos):
+    # Los registros solo tienen resolución de segundos: las muestras que comparten
+    # el mismo segundo se reparten uniformemente dentro de él según su orden
+    datos = datos.sort_values("datetime", kind="stable", ignore_index=True)
+    tiempos = datos["datetime"].to_numpy(dtype="datetime64[ns]")
+    # También vacía: merge_asof exige la misma unidad en todos los sensores
+    datos["datetime"] = tiempos
+    n = len(tiempos)
+    if n == 0:
+        return datos
+    inicios = np.flatnonzero(np.r_[True, tiempos[1:] != tiempos[:-1]])
+    tamanos = np.diff(np.r_[inicios, n])
+    posicion = np.arange(n) - np.repeat(inicios, tamanos)
+    offsets = posicion * 1_000_000_000 // np.repeat(tamanos, tamanos)
+    datos["datetime"] = tiempos + offsets.astype("timedelta64[ns]")
+    return datos
+
+
+def _agregacion_columna(columna, agregacion):
+    if isinstance(agregacion, dict):
+        funcion = agregacion.get(columna, "max" if columna == "Madera" else "mean")
+    else:
+        # Madera es una marca 0/1: basta con que haya madera en parte del intervalo
+        funcion = "max" if columna == "Madera" else agregacion
+    if funcion not in AGREGACIONES:
+        raise ValueError(f"Agregación no válida para {columna}: {funcion}")
+    return funcion
+
+
+def alinear_series(archivos, grilla=None, agregacion="mean", tolerancia=TOLERANCIA_ALINEACION):
+    with etapa("subsegundos", sum(len(df) for df in archivos.values())):
+        series = [_sintetizar_subsegundos(df) for df in archivos.values()]
+    with etapa("alineacion") as medida:
+        combinado = _combinar_series(series, grilla, agregacion, tolerancia)
+        medida.filas = len(combinado)
+    return combinado
+
+
+def _combinar_series(series, grilla, agregacion, tolerancia):
+    tolerancia = pd.Timedelta(tolerancia)
+
+    if grilla is None:
+        # Conservar todas las muestras: cada una recibe el último valor conocido
+        # de los demás sensores (dentro de la tolerancia)
+        tiempos = np.unique(np.concatenate([df["datetime"].to_numpy() for df in series]))
+        combinado = pd.DataFrame({"datetime": tiempos})
+        for df in series:
+            combinado = pd.merge_asof(combinado, df, on="datetime", direction="backward", tolerance=tolerancia)
+    else:
+        # Agrupar cada sensor en la grilla común con la agregación elegida
+        partes = []
+        for df in series:
+            cubeta = df["datetime"].dt.floor(grilla).rename("datetime")
+            funciones = {col: _agregacion_columna(col, agregacion) for col in df.columns if col != "datetime"}
+            partes.append(df.drop(columns="datetime").groupby(cubeta, sort=True).agg(funciones))
+        combinado = pd.concat(partes, axis=1, join="outer", sort=True)
+
+        # Completar huecos cortos con el último valor de cada sensor
+        limite = int(tolerancia / pd.Timedelta(grilla))
+        if limite > 0:
+            combinado = combinado.ffill(limit=limite)
+        combinado = combinado.reset_index()
+
+    # Reemplazar valores faltantes con 0
+    return combinado.fillna(0)
+
+
+def cargar_datos_seleccionados(carpeta_seleccionada, grilla=None, agregacion="mean", progreso=_sin_progreso):
+    # Leer los archivos .txt (puede llamarse desde un hilo: los errores se propagan)
+    archivos, informe = leer_archivos_carpeta(carpeta_seleccionada, progreso=lambda f, m: progreso(0.7 * f, m))
+
+    # Unir los tres sensores en una sola serie temporal
+    progreso(0.7, "Alineando sensores")
+    merged_df = alinear_series(archivos, grilla, agregacion)
+
+    progreso(0.85, "Preparando columnas")
+    with etapa("esquema") as medida:
+        merged_df = _preparar_sesion(merged_df)
+        medida.filas = len(merged_df)
+    merged_df.attrs["informe_carga"] = informe
+
+    return merged_df
+
+
+def _preparar_sesion(merged_df):
+    # Filtrar filas donde todas las variables sean 0 (excepto datetime). Un
+    # sensor que todavía no escribió (en vivo) aporta sus columnas en 0
+    sensores = [col for col in COLUMNAS_MEDIDAS if col != COLUMNA_AVANCE]
+    merged_df = merged_df.reindex(columns=["datetime", *sensores], fill_value=0)
+    merged_df = merged_df[~(merged_df[sensores] == 0).all(axis=1)]
+
+    # El instante completo queda como único índice (fecha y hora no se guardan
+    # como objetos de Python) y las medidas con tipos compactos
+    datos = agregar_avance(merged_df.set_index('datetime')[sensores])
+    return datos[COLUMNAS_MEDIDAS].astype(TIPOS_MEDIDAS)
+
+
+def sesion_vacia():
+    indice = pd.DatetimeIndex([], dtype="datetime64[ns]", name="datetime")
+    return pd.DataFrame({col: pd.Series(dtype=tipo) for col, tipo in TIPOS_MEDIDAS.items()}, index=indice)
+
+
+def con_fecha_hora(datos):
+    # Agrega fecha y hora calculadas desde el índice; solo se usa para mostrar
+    # o exportar, así no ocupan memoria mientras la sesión está cargada
+    columnas = pd.DataFrame({"fecha": datos.index.date, "hora": datos.index.time}, index=datos.index)
+    return pd.concat([columnas, datos], axis=1)
+
+
+def informe_memoria(datos):
+    # Bytes que ocupa la sesión: índice y cada columna por separado
+    uso = datos.memory_usage(index=True, deep=True)
+    return {"filas": len(datos), "indice": int(uso.iloc[0]),
+            "columnas": {col: int(uso[col]) for col in datos.columns}, "total": int(uso.sum())}
+
+
+def resumen_memoria(datos):
+    informe = informe_memoria(datos)
+    filas = max(informe["filas"], 1)
+    lineas = [f"{informe['filas']} filas, {informe['total'] / 2**20:.1f} MB "
+              f"({informe['total'] / filas:.0f} bytes por fila)",
+              f"  índice: {informe['indice'] / 2**20:.1f} MB"]
+    lineas += [f"  {col}: {bytes_columna / 2**20:.1f} MB ({datos[col].dtype})"
+               for col, bytes_columna in informe["columnas"].items()]
+    return "\n".join(lineas)
@@ -0,0 +1,148 @@
+# Avance del carro a partir del contador de Velocidad.txt: cada valor nuevo
+# del contador es un pulso y la diferencia con el pulso anterior es el tiempo
+# entre pulsos en ms (exacto aunque las filas de la sesión no lo sean)
+import numpy as np
+import pandas as pd
+
+# Columna de la sesión con el avance instantáneo del carro
+COLUMNA_AVANCE = "Avance (pulsos/s)"
+# Segundos sin pulsos a partir de los cuales el carro se considera detenido
+# (con el carro detenido Velocidad.txt escribe "Stopped" cada 2 s)
+PAUSA_CARRO = 2.0
+# Segundos anteriores que bastan para calcular el avance de una fila: el
+# último pulso y el anterior están a menos de PAUSA_CARRO cada uno
+CONTEXTO_AVANCE = 3 * PAUSA_CARRO
+
+COLUMNAS_CICLOS = {"inicio": "datetime64[ns]", "fin": "datetime64[ns]", "duracion": "float64", "pulsos": "int64",
+                   "avance_medio": "float64", "avance_max": "float64", "tabla": "int64", "tipo": "object",
+                   "avance_corte": "float64", "avance_retorno": "float64"}
+
+
+def pulsos_carro(contador, tiempos, pausa=PAUSA_CARRO):
+    # Posición de cada pulso, intervalo en ms desde el pulso anterior y si ese
+    # intervalo es válido: no hay un reinicio del contador (baja), un "Stopped"
+    # o hueco (0) entre ambos, ni más de `pausa` segundos entre ellos
+    contador = np.asarray(contador, dtype=np.float64)
+    tiempos = np.asarray(tiempos).view(np.int64)
+    anterior = np.r_[0.0, contador[:-1]]
+    posiciones = np.flatnonzero((contador > 0) & (contador != anterior))
+    if not len(posiciones):
+        return posiciones, np.empty(0), np.empty(0, dtype=bool)
+    ceros = np.cumsum(contador == 0)
+    intervalos = np.r_[np.nan, np.diff(contador[posiciones])]
+    pausa_ns = int(pausa * 1e9)
+    validos = np.r_[False, (intervalos[1:] > 0) & (intervalos[1:] <= pausa * 1000)
+                    & (np.diff(tiempos[posiciones]) <= pausa_ns) & (np.diff(ceros[posiciones]) == 0)]
+    return posiciones, intervalos, validos
+
+
+def avance_carro(contador, tiempos, pausa=PAUSA_CARRO):
+    # Pulsos por segundo de cada fila según el último intervalo entre pulsos;
+    # 0 si el carro está detenido, tras un reinicio o si el último pulso tiene
+    # más de `pausa` segundos. Una sola pasada vectorizada sobre toda la sesión
+    contador = np.asarray(contador, dtype=np.float64)
+    tiempos = np.asarray(tiempos).view(np.int64)
+    posiciones, intervalos, validos = pulsos_carro(contador, tiempos, pausa)
+    avance = np.zeros(len(contador), dtype=np.float32)
+    if not len(posiciones):
+        return avance
+    with np.errstate(divide="ignore", invalid="ignore"):
+        por_pulso = np.where(validos, 1000.0 / intervalos, 0.0)
+
+    # Número de pulso vigente en cada fila (-1 antes del primero)
+    marcas = np.zeros(len(contador), dtype=bool)
+    marcas[posiciones] = True
+    vigente = np.cumsum(marcas) - 1
+    fila = np.maximum(vigente, 0)
+    sigue = ((vigente >= 0) & (contador == contador[posiciones[fila]])
+             & (tiempos - tiempos[posiciones[fila]] <= int(pausa * 1e9)))
+    avance[sigue] = por_pulso[fila[sigue]]
+    return avance
+
+
+def agregar_avance(datos, pausa=PAUSA_CARRO):
+    # Agrega o recalcula COLUMNA_AVANCE en una sesión ordenada por tiempo
+    datos[COLUMNA_AVANCE] = avance_carro(datos["Velocidad (ms)"].to_numpy(),
+                                         datos.index.to_numpy(dtype="datetime64[ns]"), pausa)
+    return datos
+
+
+def _ciclos_vacios():
+    return pd.DataFrame({col: pd.Series(dtype=tipo) for col, tipo in COLUMNAS_CICLOS.items()})
+
+
+def ciclos_carro(datos, tablas, pausa=PAUSA_CARRO):
+    # Cada tramo de pulsos seguidos (sin detenerse) es un ciclo del carro. Si se
+    # superpone con una tabla es un corte (`tabla` = su posición en `tablas`) y
+    # si no, un retorno en vacío (`tabla` = -1). avance_corte es el avance medio
+    # mientras dura la tabla y avance_retorno el de después (o el de todo el
+    # ciclo si no hubo tabla)
+    tiempos = datos.index.to_numpy(dtype="datetime64[ns]").view(np.int64)
+    posiciones, intervalos, validos = pulsos_carro(datos["Velocidad (ms)"].to_numpy(), tiempos, pausa)
+    if validos.sum() == 0:
+        return _ciclos_vacios()
+
+    # Un ciclo empieza en cada pulso cuyo intervalo no es válido
+    ciclo = np.cumsum(~validos) - 1
+    tiempos_pulso = tiempos[posiciones]
+    primero = np.flatnonzero(np.r_[True, np.diff(ciclo) != 0])
+    ultimo = np.r_[primero[1:], len(posiciones)] - 1
+    conservar = ultimo > primero  # Al menos un intervalo
+    primero, ultimo = primero[conservar], ultimo[conservar]
+    inicios, fines = tiempos_pulso[primero], tiempos_pulso[ultimo]
+
+    # Ciclo (entre los conservados) de cada pulso; -1 si su ciclo se descartó
+    numero = np.full(ciclo[-1] + 1, -1)
+    numero[ciclo[primero]] = np.arange(len(primero))
+    numero = numero[ciclo]
+    pulsos_ciclo = np.bincount(numero[validos], minlength=len(primero))
+    suma = np.bincount(numero[validos], weights=intervalos[validos], minlength=len(primero))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        por_pulso = np.where(validos, 1000.0 / intervalos, 0.0)
+    maximo = np.maximum.reduceat(por_pulso, primero)
+
+    # Tabla superpuesta: la última que empieza antes del fin del ciclo, si termina después de su inicio
+    inicio_tablas = tablas["inicio"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    fin_tablas = tablas["fin"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    tabla = np.searchsorted(inicio_tablas, fines, side="right") - 1
+    corte = np.zeros(len(posiciones), dtype=bool)
+    retorno = validos & (numero >= 0)
+    if len(inicio_tablas):
+        tabla[(tabla >= 0) & (fin_tablas[np.maximum(tabla, 0)] < inicios)] = -1
+        # Intervalos que terminan dentro de la tabla de su ciclo
+        tabla_pulso = np.where(numero >= 0, tabla[np.maximum(numero, 0)], -1)
+        posicion_tabla = np.maximum(tabla_pulso, 0)
+        corte = (validos & (tabla_pulso >= 0) & (tiempos_pulso >= inicio_tablas[posicion_tabla])
+                 & (tiempos_pulso <= fin_tablas[posicion_tabla]))
+        retorno &= (tabla_pulso < 0) | (tiempos_pulso > fin_tablas[posicion_tabla])
+    else:
+        tabla[:] = -1
+    pulsos_corte = np.bincount(numero[corte], minlength=len(primero))
+    suma_corte = np.bincount(numero[corte], weights=intervalos[corte], minlength=len(primero))
+    pulsos_retorno = np.bincount(numero[retorno], minlength=len(primero))
+    suma_retorno = np.bincount(numero[retorno], weights=intervalos[retorno], minlength=len(primero))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ciclos = pd.DataFrame({
+            "inicio": inicios.view("datetime64[ns]"),
+            "fin": fines.view("datetime64[ns]"),
+            "duracion": (fines - inicios) / 1e9,
+            "pulsos": pulsos_ciclo,
+            "avance_medio": 1000.0 * pulsos_ciclo / suma,
+            "avance_max": maximo,
+            "tabla": tabla,
+            "tipo": np.where(tabla >= 0, "Corte", "Retorno"),
+            "avance_corte": np.where(pulsos_corte > 0, 1000.0 * pulsos_corte / suma_corte, np.nan),
+            "avance_retorno": np.where(pulsos_retorno > 0, 1000.0 * pulsos_retorno / suma_retorno, np.nan),
+        })
+    return ciclos.astype(COLUMNAS_CICLOS)
+
+
+def resumen_ciclos(ciclos):
+    if ciclos.empty:
+        return "Sin ciclos del carro detectados."
+    lineas = [f"Ciclos del carro: {len(ciclos)}"]
+    for tipo, grupo in ciclos.groupby("tipo", sort=False):
+        lineas.append(f"  {tipo}: {len(grupo)}, duración media {grupo['duracion'].mean():.1f} s, "
+                      f"avance medio {grupo['avance_medio'].mean():.2f} pulsos/s (máximo {grupo['avance_max'].max():.2f})")
+    return "\n".join(lineas)
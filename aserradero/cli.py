@@ -0,0 +1,263 @@
+# Línea de comandos sin interfaz gráfica, p. ej. para ejecutarla cada noche:
+#   python -m aserradero lote --ruta D:/registros --desde 01-01-2025 --hasta 31-01-2025 --salida enero.feather
+import argparse
+import os
+import sys
+from datetime import datetime
+
+from .anomalias import detectar_anomalias, resumen_anomalias
+from .archivado import archivar_carpeta, cargar_ventana
+from .carga import AGREGACIONES, RESOLUCIONES, resumen_informe_carga
+from .carro import ciclos_carro, resumen_ciclos
+from .consultas import JORNADAS
+from .exportacion import PARTICIONES, exportar_sesion, exportar_tablas
+from .historial import (actualizar_historial, carpetas_con_fecha, consultar_tablas, resumen_historial,
+                        resumen_historial_texto)
+from .indice import actualizar_indice, buscar_carpetas, resumen_carpeta
+from .informes import DIRECTORIO_INFORMES, PUNTOS_INFORME, informes_carpetas
+from .instrumentacion import configurar_diagnostico, ejecucion, etapa, resumen_diagnostico, ultima_ejecucion
+from .lote import cargar_lote, carpetas_en_rango
+from .tablas import detectar_tablas, resumen_sesion
+
+
+def _progreso_consola(fraccion, mensaje=""):
+    print(f"[{fraccion:4.0%}] {mensaje}", file=sys.stderr)
+
+
+def comando_lote(args, parser):
+    carpetas = [os.path.join(args.ruta, nombre) for nombre in args.carpetas]
+    if args.desde:
+        desde = datetime.strptime(args.desde, "%d-%m-%Y").date()
+        hasta = datetime.strptime(args.hasta, "%d-%m-%Y").date() if args.hasta else desde
+        carpetas += carpetas_en_rango(args.ruta, desde, hasta)
+    if not carpetas:
+        parser.error("No hay carpetas para cargar: indique --carpetas o --desde/--hasta.")
+
+    configurar_diagnostico(args.diagnostico, args.memoria, args.perfil)
+    try:
+        with ejecucion("lote"):
+            return _procesar_lote(args, carpetas)
+    finally:
+        if args.diagnostico or args.memoria or args.perfil:
+            print(resumen_diagnostico(ultima_ejecucion()), file=sys.stderr)
+
+
+def _procesar_lote(args, carpetas):
+    datos = cargar_lote(carpetas, args.resolucion, args.agregacion, args.procesos, progreso=_progreso_consola)
+    for carpeta, error in datos.attrs["errores"].items():
+        print(f"Error en {carpeta}: {error}", file=sys.stderr)
+    problemas = resumen_informe_carga(datos.attrs["informe_carga"])
+    if problemas:
+        print(problemas, file=sys.stderr)
+    if datos.empty:
+        return 1
+
+    with etapa("tablas", len(datos)):
+        tablas = detectar_tablas(datos)
+    anomalias = detectar_anomalias(datos, tablas)
+    with etapa("ciclos", len(datos)):
+        ciclos = ciclos_carro(datos, tablas)
+    print(f"Carpetas cargadas: {len(datos.attrs['carpetas'])}")
+    print(resumen_sesion(datos, tablas))
+    print(resumen_anomalias(anomalias))
+    print(resumen_ciclos(ciclos))
+
+    if args.salida:
+        resultado = exportar_sesion(datos, args.salida, args.particion, tablas, progreso=_progreso_consola)
+        if args.particion:
+            print(f"Datos guardados en {len(resultado)} archivos junto a {args.salida}")
+        else:
+            print(f"Datos guardados en {args.salida}")
+    if args.tablas:
+        exportar_tablas(tablas, args.tablas)
+        print(f"Tablas guardadas en {args.tablas}")
+    if args.anomalias:
+        exportar_tablas(anomalias, args.anomalias)
+        print(f"Anomalías guardadas en {args.anomalias}")
+    if args.ciclos:
+        exportar_tablas(ciclos, args.ciclos)
+        print(f"Ciclos del carro guardados en {args.ciclos}")
+    return 0
+
+
+def comando_historial(args, parser):
+    desde = datetime.strptime(args.desde, "%d-%m-%Y").date() if args.desde else None
+    hasta = datetime.strptime(args.hasta, "%d-%m-%Y").date() if args.hasta else desde
+    if not args.sin_registrar:
+        if args.carpetas:
+            carpetas = [os.path.join(args.ruta, nombre) for nombre in args.carpetas]
+        elif desde:
+            carpetas = carpetas_en_rango(args.ruta, desde, hasta)
+        else:
+            carpetas = carpetas_con_fecha(args.ruta)
+        registradas, errores = actualizar_historial(args.ruta, carpetas, progreso=_progreso_consola)
+        for carpeta, error in errores.items():
+            print(f"Error en {carpeta}: {error}", file=sys.stderr)
+        print(f"Carpetas registradas: {len(registradas)} (sin cambios: {len(carpetas) - len(registradas) - len(errores)})",
+              file=sys.stderr)
+
+    resumen = resumen_historial(args.ruta, desde, hasta, args.jornada)
+    print(resumen_historial_texto(resumen))
+    if args.salida:
+        resumen.to_csv(args.salida, index=False, sep='\t')
+        print(f"Resumen guardado en {args.salida}")
+    if args.tablas:
+        exportar_tablas(consultar_tablas(args.ruta, desde, hasta, args.jornada), args.tablas)
+        print(f"Tablas guardadas en {args.tablas}")
+    return 0
+
+
+def comando_carpetas(args, parser):
+    desde = datetime.strptime(args.desde, "%d-%m-%Y").date() if args.desde else None
+    hasta = datetime.strptime(args.hasta, "%d-%m-%Y").date() if args.hasta else desde
+    carpetas = actualizar_indice(args.ruta, progreso=_progreso_consola)
+    encontradas = buscar_carpetas(carpetas, args.buscar, desde, hasta, args.completas)
+    for carpeta in encontradas:
+        print(f"{carpeta['nombre']:<24}{resumen_carpeta(carpeta)}")
+    print(f"{len(encontradas)} de {len(carpetas)} carpetas", file=sys.stderr)
+    return 0
+
+
+def comando_archivar(args, parser):
+    carpetas = [os.path.join(args.ruta, nombre) for nombre in args.carpetas]
+    if args.desde:
+        desde = datetime.strptime(args.desde, "%d-%m-%Y").date()
+        hasta = datetime.strptime(args.hasta, "%d-%m-%Y").date() if args.hasta else desde
+        carpetas += carpetas_en_rango(args.ruta, desde, hasta)
+    if not carpetas:
+        parser.error("No hay carpetas para archivar: indique --carpetas o --desde/--hasta.")
+
+    original = comprimido = errores = 0
+    for i, carpeta in enumerate(carpetas):
+        _progreso_consola(i / len(carpetas), f"Archivando {os.path.basename(carpeta)}")
+        try:
+            tamanos = archivar_carpeta(carpeta)
+        except (OSError, ValueError) as error:
+            print(f"Error en {carpeta}: {error}", file=sys.stderr)
+            errores += 1
+            continue
+        if tamanos is None:
+            print(f"{os.path.basename(carpeta)} ya estaba archivada", file=sys.stderr)
+            continue
+        original += tamanos["original"]
+        comprimido += tamanos["comprimido"]
+    if original:
+        print(f"Archivado: {original / 2**20:.1f} MB -> {comprimido / 2**20:.1f} MB ({comprimido / original:.0%})")
+    return 1 if errores else 0
+
+
+def comando_ventana(args, parser):
+    try:
+        desde = datetime.strptime(args.desde, "%d-%m-%Y %H:%M")
+        hasta = datetime.strptime(args.hasta, "%d-%m-%Y %H:%M")
+    except ValueError:
+        parser.error("--desde y --hasta tienen el formato 'DD-MM-YYYY HH:MM'.")
+    datos = cargar_ventana(args.carpeta, desde, hasta, args.resolucion, args.agregacion, progreso=_progreso_consola)
+    if datos.empty:
+        print("No hay datos en esa ventana.", file=sys.stderr)
+        return 1
+    print(resumen_sesion(datos, detectar_tablas(datos)))
+    if args.salida:
+        exportar_sesion(datos, args.salida, progreso=_progreso_consola)
+        print(f"Datos guardados en {args.salida}")
+    return 0
+
+
+def comando_informes(args, parser):
+    carpetas = [os.path.join(args.ruta, nombre) for nombre in args.carpetas]
+    if args.desde:
+        desde = datetime.strptime(args.desde, "%d-%m-%Y").date()
+        hasta = datetime.strptime(args.hasta, "%d-%m-%Y").date() if args.hasta else desde
+        carpetas += carpetas_en_rango(args.ruta, desde, hasta)
+    if not carpetas:
+        parser.error("No hay carpetas para los informes: indique --carpetas o --desde/--hasta.")
+
+    configurar_diagnostico(args.diagnostico)
+    salida = args.salida or os.path.join(args.ruta, DIRECTORIO_INFORMES)
+    with ejecucion("informes"):
+        informes, errores = informes_carpetas(carpetas, salida, args.duracion_minima, args.tolerancia, args.puntos,
+                                              args.procesos, progreso=_progreso_consola)
+    for carpeta, error in errores.items():
+        print(f"Error en {carpeta}: {error}", file=sys.stderr)
+    if args.diagnostico:
+        print(resumen_diagnostico(ultima_ejecucion()), file=sys.stderr)
+    print(f"{len(informes)} informes guardados en {salida}")
+    return 1 if errores else 0
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(prog="python -m aserradero", description="Procesa los registros del aserradero sin interfaz gráfica.")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    lote = comandos.add_parser("lote", help="Carga varias carpetas de registros a la vez.")
+    lote.add_argument("--ruta", required=True, help="Ruta base con las carpetas 'datos DD-MM-YYYY'")
+    lote.add_argument("--desde", help="Fecha inicial DD-MM-YYYY")
+    lote.add_argument("--hasta", help="Fecha final DD-MM-YYYY (por defecto igual a --desde)")
+    lote.add_argument("--carpetas", nargs="*", default=[], help="Nombres de carpetas a cargar")
+    lote.add_argument("--resolucion", choices=[valor for valor in RESOLUCIONES.values() if valor], help="Grilla común (por defecto todas las muestras)")
+    lote.add_argument("--agregacion", choices=AGREGACIONES, default="mean")
+    lote.add_argument("--procesos", type=int, help="Número de procesos (por defecto uno por núcleo)")
+    lote.add_argument("--salida", help="Archivo de salida (.feather, .parquet, .csv, .csv.gz o texto separado por tabulaciones)")
+    lote.add_argument("--particion", choices=PARTICIONES, help="Un archivo de salida por tabla o por jornada")
+    lote.add_argument("--tablas", help="Archivo de texto con las estadísticas de cada tabla detectada")
+    lote.add_argument("--anomalias", help="Archivo de texto con las sobrecargas y sobretemperaturas detectadas")
+    lote.add_argument("--ciclos", help="Archivo de texto con los ciclos del carro (cortes y retornos)")
+    lote.add_argument("--diagnostico", help="Registro JSON donde se agrega el tiempo de cada etapa")
+    lote.add_argument("--memoria", action="store_true", help="Medir el pico de memoria de cada etapa (más lento)")
+    lote.add_argument("--perfil", action="store_true", help="Capturar la ejecución con cProfile")
+    lote.set_defaults(funcion=comando_lote)
+
+    historial = comandos.add_parser("historial", help="Registra carpetas en el historial y resume cada día y jornada.")
+    historial.add_argument("--ruta", required=True, help="Ruta base con las carpetas 'datos DD-MM-YYYY'")
+    historial.add_argument("--desde", help="Fecha inicial DD-MM-YYYY (por defecto todo el historial)")
+    historial.add_argument("--hasta", help="Fecha final DD-MM-YYYY (por defecto igual a --desde)")
+    historial.add_argument("--carpetas", nargs="*", default=[], help="Registrar solo estas carpetas")
+    historial.add_argument("--jornada", choices=list(JORNADAS), help="Resumir solo una jornada")
+    historial.add_argument("--sin-registrar", action="store_true", help="Solo consultar, sin leer carpetas nuevas")
+    historial.add_argument("--salida", help="Archivo de texto con el resumen por día y jornada")
+    historial.add_argument("--tablas", help="Archivo de texto con cada tabla del rango consultado")
+    historial.set_defaults(funcion=comando_historial)
+
+    carpetas = comandos.add_parser("carpetas", help="Indexa las carpetas de la ruta base y las busca por nombre o fecha.")
+    carpetas.add_argument("--ruta", required=True, help="Ruta base con las carpetas 'datos DD-MM-YYYY'")
+    carpetas.add_argument("--buscar", default="", help="Texto que debe contener el nombre")
+    carpetas.add_argument("--desde", help="Fecha inicial DD-MM-YYYY")
+    carpetas.add_argument("--hasta", help="Fecha final DD-MM-YYYY (por defecto igual a --desde)")
+    carpetas.add_argument("--completas", action="store_true", help="Solo carpetas con los tres archivos")
+    carpetas.set_defaults(funcion=comando_carpetas)
+
+    archivar = comandos.add_parser("archivar", help="Comprime carpetas antiguas por bloques con un índice de tiempo.")
+    archivar.add_argument("--ruta", required=True, help="Ruta base con las carpetas 'datos DD-MM-YYYY'")
+    archivar.add_argument("--desde", help="Fecha inicial DD-MM-YYYY")
+    archivar.add_argument("--hasta", help="Fecha final DD-MM-YYYY (por defecto igual a --desde)")
+    archivar.add_argument("--carpetas", nargs="*", default=[], help="Nombres de carpetas a archivar")
+    archivar.set_defaults(funcion=comando_archivar)
+
+    ventana = comandos.add_parser("ventana", help="Carga solo un intervalo de una carpeta.")
+    ventana.add_argument("--carpeta", required=True, help="Carpeta de registros")
+    ventana.add_argument("--desde", required=True, help="Inicio 'DD-MM-YYYY HH:MM'")
+    ventana.add_argument("--hasta", required=True, help="Fin 'DD-MM-YYYY HH:MM'")
+    ventana.add_argument("--resolucion", choices=[valor for valor in RESOLUCIONES.values() if valor], help="Grilla común (por defecto todas las muestras)")
+    ventana.add_argument("--agregacion", choices=AGREGACIONES, default="mean")
+    ventana.add_argument("--salida", help="Archivo de salida (.feather, .parquet, .csv, .csv.gz o texto separado por tabulaciones)")
+    ventana.set_defaults(funcion=comando_ventana)
+
+    informes = comandos.add_parser("informes", help="Genera un informe HTML por jornada con cada tabla y sus gráficos.")
+    informes.add_argument("--ruta", required=True, help="Ruta base con las carpetas 'datos DD-MM-YYYY'")
+    informes.add_argument("--desde", help="Fecha inicial DD-MM-YYYY")
+    informes.add_argument("--hasta", help="Fecha final DD-MM-YYYY (por defecto igual a --desde)")
+    informes.add_argument("--carpetas", nargs="*", default=[], help="Nombres de carpetas a incluir")
+    informes.add_argument("--salida", help=f"Directorio de los informes (por defecto {DIRECTORIO_INFORMES} dentro de --ruta)")
+    informes.add_argument("--duracion-minima", type=float, default=0.0, help="Descartar tablas más cortas (segundos)")
+    informes.add_argument("--tolerancia", type=float, default=0.0, help="Unir tablas separadas por huecos de hasta estos segundos")
+    informes.add_argument("--puntos", type=int, default=PUNTOS_INFORME, help="Puntos por variable en cada gráfico")
+    informes.add_argument("--procesos", type=int, help="Número de procesos (por defecto uno por núcleo)")
+    informes.add_argument("--diagnostico", help="Registro JSON donde se agrega el tiempo de cada etapa")
+    informes.set_defaults(funcion=comando_informes)
+    return parser
+
+
+def main(argumentos=None):
+    parser = crear_parser()
+    args = parser.parse_args(argumentos)
+    return args.funcion(args, parser)
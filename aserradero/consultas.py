@@ -0,0 +1,131 @@
+# Filtros por jornada, hora y Madera resueltos con búsqueda binaria
+from datetime import datetime
+
+import numpy as np
+
+from .instrumentacion import etapa
+
+
+# Jornadas como intervalos cerrados en nanosegundos desde la medianoche; la noche
+# cruza la medianoche y se parte en dos tramos de cada día
+HORA_NS = 3600 * 10**9
+DIA_NS = 24 * HORA_NS
+JORNADAS = {
+    "Mañana": [(6 * HORA_NS, 12 * HORA_NS)],
+    "Tarde": [(12 * HORA_NS, 18 * HORA_NS)],
+    "Noche": [(0, 6 * HORA_NS - 1), (18 * HORA_NS, DIA_NS - 1)],
+}
+
+
+def hora_a_ns(texto):
+    # "HH:MM:SS" -> nanosegundos desde la medianoche (ValueError si no es válida)
+    hora = datetime.strptime(texto.strip(), "%H:%M:%S")
+    return ((hora.hour * 60 + hora.minute) * 60 + hora.second) * 10**9
+
+
+def jornada_de(tiempos):
+    # Jornada de cada instante (ns desde 1970) y día en que empezó: la parte de
+    # la noche posterior a la medianoche cuenta para el día anterior
+    tiempos = np.asarray(tiempos, dtype=np.int64)
+    hora = tiempos % DIA_NS
+    dia = tiempos - hora
+    nombres = np.full(len(tiempos), "", dtype=object)
+    # En orden inverso para que, en los bordes compartidos, gane la primera jornada
+    for nombre, intervalos in reversed(JORNADAS.items()):
+        for inicio, fin in intervalos:
+            dentro = (hora >= inicio) & (hora <= fin)
+            nombres[dentro] = nombre
+            if inicio == 0 and len(intervalos) > 1:
+                dia[dentro] -= DIA_NS
+    return nombres, dia.astype("datetime64[ns]")
+
+
+def _intersectar_intervalos(primeros, segundos):
+    resultado = []
+    for inicio_a, fin_a in primeros:
+        for inicio_b, fin_b in segundos:
+            inicio, fin = max(inicio_a, inicio_b), min(fin_a, fin_b)
+            if inicio <= fin:
+                resultado.append((inicio, fin))
+    return sorted(resultado)
+
+
+class ConsultaTiempo:
+    # Índice de consultas sobre una sesión ordenada por tiempo. Los filtros de
+    # jornada y hora se traducen a intervalos del día y se resuelven con búsqueda
+    # binaria por cada día presente; Madera usa las posiciones precalculadas, así
+    # cada consulta cuesta O(log n + k) en lugar de recorrer toda la sesión
+
+    def __init__(self, datos):
+        if not datos.index.is_monotonic_increasing:
+            datos = datos.sort_index(kind="stable")
+        self.datos = datos
+        with etapa("indice consulta", len(datos)):
+            self.tiempos = datos.index.to_numpy(dtype="datetime64[ns]").view(np.int64)
+            self.dias = np.unique(self.tiempos - self.tiempos % DIA_NS)
+            madera = datos["Madera"].to_numpy() == 1
+            self.posiciones_madera = {1: np.flatnonzero(madera), 0: np.flatnonzero(~madera)}
+        # Posiciones de Madera con capacidad de sobra para extenderlas en vivo
+        self._reservas = dict(self.posiciones_madera)
+
+    def extender(self, datos, desde):
+        # Modo en vivo: `datos` son los anteriores con filas nuevas o reemplazadas
+        # a partir de la posición `desde` (ordenados, como los del seguidor); se
+        # indexa solo esa parte, así el costo depende de los datos nuevos
+        with etapa("indice consulta", len(datos) - desde):
+            self.datos = datos
+            self.tiempos = datos.index.to_numpy(dtype="datetime64[ns]").view(np.int64)
+            nuevos = self.tiempos[desde:]
+            self.dias = np.union1d(self.dias, nuevos - nuevos % DIA_NS)
+            madera = datos["Madera"].to_numpy()[desde:] == 1
+            for valor, nuevas in ((1, np.flatnonzero(madera)), (0, np.flatnonzero(~madera))):
+                conservadas = int(np.searchsorted(self.posiciones_madera[valor], desde))
+                fin = conservadas + len(nuevas)
+                reserva = self._reservas[valor]
+                if fin > len(reserva):
+                    reserva = np.resize(reserva, max(2 * len(reserva), fin))
+                    self._reservas[valor] = reserva
+                reserva[conservadas:fin] = nuevas + desde
+                self.posiciones_madera[valor] = reserva[:fin]
+
+    def intervalos(self, jornada="Todas", hora_inicio=None, hora_fin=None):
+        intervalos = [(0, DIA_NS - 1)]
+        if jornada in JORNADAS:
+            intervalos = JORNADAS[jornada]
+        if hora_inicio is not None and hora_fin is not None:
+            # hora_fin (HH:MM:SS) incluye todo ese segundo, también las muestras
+            # repartidas dentro de él. Un rango como 22:00:00 - 02:00:00 cruza la medianoche
+            fin = hora_fin + 10**9 - 1
+            if hora_inicio <= hora_fin:
+                horas = [(hora_inicio, fin)]
+            else:
+                horas = [(0, fin), (hora_inicio, DIA_NS - 1)]
+            intervalos = _intersectar_intervalos(intervalos, horas)
+        return intervalos
+
+    def posiciones(self, jornada="Todas", hora_inicio=None, hora_fin=None, madera=None):
+        intervalos = self.intervalos(jornada, hora_inicio, hora_fin)
+        if not intervalos:
+            return np.array([], dtype=np.int64)
+        if intervalos == [(0, DIA_NS - 1)]:
+            desde, hasta = np.array([0]), np.array([len(self.tiempos)])
+        else:
+            limites = np.array(intervalos, dtype=np.int64)
+            desde = np.searchsorted(self.tiempos, (self.dias[:, None] + limites[:, 0]).ravel(), side="left")
+            hasta = np.searchsorted(self.tiempos, (self.dias[:, None] + limites[:, 1]).ravel(), side="right")
+        if madera is None:
+            tramos = [np.arange(inicio, fin) for inicio, fin in zip(desde, hasta) if fin > inicio]
+        else:
+            base = self.posiciones_madera[madera]
+            desde, hasta = np.searchsorted(base, desde), np.searchsorted(base, hasta)
+            tramos = [base[inicio:fin] for inicio, fin in zip(desde, hasta) if fin > inicio]
+        return np.concatenate(tramos) if tramos else np.array([], dtype=np.int64)
+
+    def filtrar(self, jornada="Todas", hora_inicio=None, hora_fin=None, madera=None):
+        with etapa("filtrado") as medida:
+            posiciones = self.posiciones(jornada, hora_inicio, hora_fin, madera)
+            medida.filas = len(posiciones)
+        # Un resultado contiguo se devuelve como rebanada, que comparte memoria con la sesión
+        if len(posiciones) and posiciones[-1] - posiciones[0] == len(posiciones) - 1:
+            return self.datos.iloc[posiciones[0]:posiciones[-1] + 1]
+        return self.datos.iloc[posiciones]
@@ -0,0 +1,182 @@
+# Escritura de sesiones y tablas a disco, por bloques para que la memoria no
+# dependa del tamaño de lo exportado
+import gzip
+import os
+
+import numpy as np
+
+from .carga import con_fecha_hora, feather, pa
+from .consultas import DIA_NS, JORNADAS, jornada_de
+from .instrumentacion import etapa
+from .progreso import _sin_progreso
+from .tablas import detectar_tablas
+
+# Parquet también depende de pyarrow
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+# Filas que se convierten y escriben de una vez
+FILAS_BLOQUE = 200_000
+
+# Extensiones reconocidas; cualquier otra se escribe como texto separado por tabulaciones
+EXTENSIONES_EXPORTACION = (".txt", ".tsv", ".csv", ".txt.gz", ".tsv.gz", ".csv.gz", ".parquet", ".feather")
+
+# Formas de repartir una exportación en varios archivos
+PARTICIONES = ("tabla", "jornada")
+
+
+def _separar_extension(ruta):
+    # "datos.csv.gz" -> ("datos", ".csv.gz")
+    base, extension = os.path.splitext(ruta)
+    if extension == ".gz":
+        base, interna = os.path.splitext(base)
+        extension = interna + extension
+    return base, extension
+
+
+class _EscritorTexto:
+    # Texto con fecha y hora (como datos_exportados.txt); .gz lo comprime al escribir
+
+    def __init__(self, ruta, extension):
+        self.separador = "," if extension.startswith(".csv") else "\t"
+        if extension.endswith(".gz"):
+            self.archivo = gzip.open(ruta, "wt", encoding="utf-8", newline="", compresslevel=6)
+        else:
+            self.archivo = open(ruta, "w", encoding="utf-8", newline="")
+        self.cabecera = True
+
+    def escribir(self, bloque):
+        con_fecha_hora(bloque).to_csv(self.archivo, index=False, sep=self.separador, header=self.cabecera)
+        self.cabecera = False
+
+    def cerrar(self):
+        self.archivo.close()
+
+
+class _EscritorArrow:
+    # Parquet o Feather (IPC de Arrow) con el índice de tiempo y los tipos de la
+    # sesión; cada bloque se agrega como un grupo de filas
+
+    def __init__(self, ruta, extension):
+        self.ruta = ruta
+        self.parquet = extension == ".parquet"
+        self.escritor = None
+
+    def escribir(self, bloque):
+        tabla = pa.Table.from_pandas(bloque, preserve_index=True)
+        if self.escritor is None:
+            if self.parquet:
+                self.escritor = pq.ParquetWriter(self.ruta, tabla.schema, compression="zstd")
+            else:
+                opciones = pa.ipc.IpcWriteOptions(compression="lz4")
+                self.escritor = pa.ipc.new_file(self.ruta, tabla.schema, options=opciones)
+        self.escritor.write_table(tabla)
+
+    def cerrar(self):
+        if self.escritor is not None:
+            self.escritor.close()
+
+
+def _crear_escritor(ruta, extension):
+    # Sin pyarrow, .feather se escribe como texto igual que antes; .parquet no tiene alternativa
+    if extension == ".parquet" and pq is None:
+        raise RuntimeError("Para exportar a .parquet hace falta instalar pyarrow.")
+    if extension == ".parquet" or (extension == ".feather" and feather is not None):
+        return _EscritorArrow(ruta, extension)
+    return _EscritorTexto(ruta, extension)
+
+
+def _codigos_particion(datos, particion, tablas=None):
+    # Código de la partición de cada fila (-1 = la fila no se exporta) y nombre
+    # de cada código. jornada: "2025-01-13_Mañana"; tabla: "tabla_007",
+    # numeradas desde 1 como en la interfaz
+    tiempos = datos.index.to_numpy(dtype="datetime64[ns]").view(np.int64)
+    if particion == "jornada":
+        nombres, dias = jornada_de(tiempos)
+        indice = np.full(len(tiempos), -1, dtype=np.int64)
+        for posicion, nombre in enumerate(JORNADAS):
+            indice[nombres == nombre] = posicion
+        claves, codigos = np.unique(dias.view(np.int64) + np.maximum(indice, 0), return_inverse=True)
+        codigos = codigos.reshape(-1)
+        codigos[indice < 0] = -1
+        jornadas = list(JORNADAS)
+        etiquetas = [f"{np.datetime64(dia, 'D')}_{jornadas[posicion]}"
+                     for dia, posicion in (divmod(clave, DIA_NS) for clave in claves.tolist())]
+        return codigos, etiquetas
+    if particion == "tabla":
+        if tablas is None:
+            tablas = detectar_tablas(datos)
+        inicios = tablas["inicio"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+        fines = tablas["fin"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+        posicion = np.searchsorted(inicios, tiempos, side="right") - 1
+        if len(inicios):
+            posicion[tiempos > fines[np.maximum(posicion, 0)]] = -1
+        return posicion, [f"tabla_{numero:03d}" for numero in range(1, len(inicios) + 1)]
+    raise ValueError(f"Partición no válida: {particion}")
+
+
+def exportar_sesion(datos, ruta, particion=None, tablas=None, filas_bloque=FILAS_BLOQUE, progreso=_sin_progreso):
+    # La extensión elige el formato: .feather y .parquet conservan el índice y
+    # los tipos; .csv, .txt y .tsv (también .gz) son texto con fecha y hora.
+    # Con `particion` ("tabla" o "jornada") se escribe un archivo por cada una en
+    # una sola pasada, con el nombre de la partición agregado a `ruta`. Devuelve
+    # la ruta, o la lista de archivos escritos si hay partición
+    if particion and datos.empty:
+        # Sin filas no hay ninguna partición que escribir
+        progreso(1.0, "Exportados 0 archivos")
+        return []
+    if not datos.index.is_monotonic_increasing:
+        datos = datos.sort_index(kind="stable")
+    codigos, etiquetas = _codigos_particion(datos, particion, tablas) if particion else (None, None)
+    base, extension = _separar_extension(ruta)
+
+    # Solo la partición actual tiene un archivo abierto: con un mes por tabla
+    # serían miles y se superaría el límite de archivos abiertos del sistema
+    escritor = destino = codigo_actual = None
+    archivos = []
+    try:
+        with etapa("exportacion", len(datos)):
+            total = len(datos)
+            for inicio in range(0, max(total, 1), filas_bloque):
+                progreso(inicio / max(total, 1), f"Exportando filas {inicio + 1}-{min(inicio + filas_bloque, total)} de {total}")
+                bloque = datos.iloc[inicio:inicio + filas_bloque]
+                if codigos is None:
+                    tramos = [(0, 0, len(bloque))]
+                else:
+                    # Las filas están ordenadas: cada partición es un tramo contiguo
+                    codigos_bloque = codigos[inicio:inicio + filas_bloque]
+                    cortes = np.flatnonzero(codigos_bloque[1:] != codigos_bloque[:-1]) + 1
+                    limites = np.r_[0, cortes, len(bloque)].tolist()
+                    tramos = [(int(codigos_bloque[desde]), desde, hasta) for desde, hasta in zip(limites[:-1], limites[1:])
+                              if codigos_bloque[desde] >= 0]
+                for codigo, desde, hasta in tramos:
+                    if codigo != codigo_actual:
+                        # Una partición no vuelve a aparecer: la anterior ya está completa
+                        if escritor is not None:
+                            escritor.cerrar()
+                            os.replace(destino + ".tmp", destino)
+                            escritor = None
+                        destino = ruta if codigos is None else f"{base}_{etiquetas[codigo]}{extension}"
+                        # Se escribe a un temporal y se renombra solo si la partición terminó bien
+                        escritor = _crear_escritor(destino + ".tmp", extension)
+                        codigo_actual = codigo
+                        archivos.append(destino)
+                    escritor.escribir(bloque.iloc[desde:hasta])
+            if escritor is not None:
+                escritor.cerrar()
+                os.replace(destino + ".tmp", destino)
+                escritor = None
+    finally:
+        # Un error deja las particiones ya terminadas y borra solo la incompleta
+        if escritor is not None:
+            escritor.cerrar()
+            os.remove(destino + ".tmp")
+    progreso(1.0, f"Exportados {len(archivos)} archivos" if particion else "Exportación terminada")
+    return archivos if particion else ruta
+
+
+def exportar_tablas(tablas, ruta):
+    tablas.to_csv(ruta, index=False, sep='\t')
+    return ruta
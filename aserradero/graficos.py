@@ -0,0 +1,183 @@
+# Reducción de series para los gráficos; plotly se importa solo al escribir HTML
+import json
+import os
+
+import numpy as np
+
+from .instrumentacion import etapa
+
+
+# Puntos por serie que se escriben en el HTML; al hacer zoom se cargan los datos completos
+PUNTOS_GRAFICO = 4000
+
+# Color con que se resaltan las sobrecargas y sobretemperaturas en tablas y gráficos
+COLOR_ANOMALIA = "#FFD6D6"
+
+
+def indices_minmax(valores, puntos=PUNTOS_GRAFICO):
+    # Divide la serie en cubetas de igual tamaño y conserva el mínimo y el máximo
+    # de cada una (más la primera y la última muestra), así los picos siguen visibles
+    n = len(valores)
+    if not puntos or n <= puntos:
+        return np.arange(n)
+    tam = -(-n // max(puntos // 2, 1))
+    cubetas = -(-n // tam)
+    # Se rellena con el último valor: argmin/argmax devuelven la primera aparición,
+    # por lo que nunca eligen una posición de relleno
+    matriz = np.pad(np.asarray(valores, dtype=np.float64), (0, cubetas * tam - n), mode="edge").reshape(cubetas, tam)
+    base = np.arange(cubetas) * tam
+    return np.unique(np.concatenate([[0, n - 1], base + matriz.argmin(axis=1), base + matriz.argmax(axis=1)]))
+
+
+def reducir_serie(serie, puntos=PUNTOS_GRAFICO):
+    # Devuelve la serie (con índice de tiempo) reducida a unos `puntos` valores
+    return serie.iloc[indices_minmax(serie.to_numpy(), puntos)]
+
+
+def reducir_tramo(serie, desde=None, hasta=None, puntos=PUNTOS_GRAFICO):
+    # Como reducir_serie pero solo entre `desde` y `hasta` (búsqueda binaria en el
+    # índice ordenado), más una muestra a cada lado para que la línea llegue al borde
+    indice = serie.index
+    inicio = 0 if desde is None else max(indice.searchsorted(desde, side="left") - 1, 0)
+    fin = len(serie) if hasta is None else min(indice.searchsorted(hasta, side="right") + 1, len(serie))
+    return reducir_serie(serie.iloc[inicio:fin], puntos)
+
+
+def extender_reduccion(reducida, serie, desde, puntos=PUNTOS_GRAFICO):
+    # Modo en vivo: `reducida` viene de una versión anterior de `serie`, que solo
+    # cambió a partir del instante `desde`. Se conservan los puntos anteriores y
+    # se reduce solo lo nuevo; cuando se juntan más del doble de `puntos`, se
+    # vuelve a reducir lo ya reducido (mínimos y máximos siguen siendo los mismos)
+    import pandas as pd
+
+    conservada = reducida.iloc[:reducida.index.searchsorted(desde, side="left")]
+    nueva = reducir_serie(serie.iloc[serie.index.searchsorted(desde, side="left"):], puntos)
+    extendida = pd.concat([conservada, nueva]) if len(conservada) else nueva
+    if puntos and len(extendida) > 2 * puntos:
+        extendida = reducir_serie(extendida, puntos)
+    return extendida
+
+
+_SCRIPT_ZOOM = """
+(function() {
+    var grafico = document.getElementById('{plot_id}');
+    var originales = {x: grafico.data.map(function(t) { return t.x; }), y: grafico.data.map(function(t) { return t.y; })};
+    var completos = null, pendiente = null, cargando = false;
+    function ms(valor) {
+        if (typeof valor === 'number') return valor;
+        var texto = String(valor).replace(' ', 'T');
+        if (texto.length <= 10) texto += 'T00:00';
+        return Date.parse(texto + 'Z');
+    }
+    function rango(evento) {
+        for (var clave in evento) {
+            if (/^xaxis\\d*\\.autorange$/.test(clave)) return 'auto';
+            if (/^xaxis\\d*\\.range\\[0\\]$/.test(clave)) return [ms(evento[clave]), ms(evento[clave.replace('[0]', '[1]')])];
+            if (/^xaxis\\d*\\.range$/.test(clave)) return [ms(evento[clave][0]), ms(evento[clave][1])];
+        }
+        return null;
+    }
+    function buscar(x, valor) {
+        var bajo = 0, alto = x.length;
+        while (bajo < alto) { var medio = (bajo + alto) >> 1; if (x[medio] < valor) bajo = medio + 1; else alto = medio; }
+        return bajo;
+    }
+    function reducir(x, y, desde, hasta) {
+        var n = hasta - desde, rx = [], ry = [];
+        if (n <= {puntos}) return {x: x.slice(desde, hasta), y: y.slice(desde, hasta)};
+        var tam = Math.ceil(n / Math.max({puntos} >> 1, 1));
+        for (var inicio = desde; inicio < hasta; inicio += tam) {
+            var fin = Math.min(inicio + tam, hasta), imin = inicio, imax = inicio;
+            for (var i = inicio; i < fin; i++) { if (y[i] < y[imin]) imin = i; if (y[i] > y[imax]) imax = i; }
+            var par = imin < imax ? [imin, imax] : (imin > imax ? [imax, imin] : [imin]);
+            for (var j = 0; j < par.length; j++) { rx.push(x[par[j]]); ry.push(y[par[j]]); }
+        }
+        return {x: rx, y: ry};
+    }
+    function aplicar(r) {
+        if (r === 'auto') { Plotly.restyle(grafico, originales); return; }
+        var xs = [], ys = [];
+        completos.forEach(function(serie) {
+            var desde = Math.max(buscar(serie.x, r[0]) - 1, 0), hasta = Math.min(buscar(serie.x, r[1]) + 1, serie.x.length);
+            var tramo = reducir(serie.x, serie.y, desde, hasta);
+            xs.push(tramo.x); ys.push(tramo.y);
+        });
+        Plotly.restyle(grafico, {x: xs, y: ys});
+    }
+    grafico.on('plotly_relayout', function(evento) {
+        var r = rango(evento);
+        if (r === null) return;
+        if (completos !== null) { aplicar(r); return; }
+        if (r === 'auto') return;
+        pendiente = r;
+        if (cargando) return;
+        cargando = true;
+        var script = document.createElement('script');
+        script.src = '{archivo}';
+        script.onload = function() { completos = window.DASER_SERIES; aplicar(pendiente); };
+        document.head.appendChild(script);
+    });
+})();
+"""
+
+
+def figura_series(series, titulo="", puntos=PUNTOS_GRAFICO, eventos=None, alto=300):
+    # Un eje y por serie, apilados y con el eje de tiempo compartido; las anomalías
+    # de cada variable (ver detectar_anomalias) se dibujan como franjas de alto
+    # completo. La figura es un diccionario de plotly: armarla con graph_objects
+    # valida cada propiedad y tarda más que reducir los datos
+    import pandas as pd
+
+    separacion = 0.02
+    alto_eje = (1 - separacion * (len(series) - 1)) / max(len(series), 1)
+    trazas, ejes, franjas = [], {}, []
+    for i, serie in enumerate(series, start=1):
+        reducida = reducir_serie(serie, puntos)
+        eje = "" if i == 1 else i
+        trazas.append({"type": "scatter", "mode": "lines", "name": serie.name, "xaxis": "x", "yaxis": f"y{eje}",
+                       "x": np.datetime_as_string(reducida.index.to_numpy(dtype="datetime64[ms]")).tolist(),
+                       "y": reducida.to_numpy(dtype=np.float64).tolist()})
+        arriba = 1 - (i - 1) * (alto_eje + separacion)
+        ejes[f"yaxis{eje}"] = {"domain": [max(arriba - alto_eje, 0.0), arriba], "anchor": "x",
+                               "title": {"text": serie.name}}
+        if eventos is not None and len(eventos) and not serie.empty:
+            propios = eventos[(eventos["variable"] == serie.name) & (eventos["fin"] >= serie.index[0])
+                              & (eventos["inicio"] <= serie.index[-1])]
+            margen = (pd.Timedelta(seconds=1) - (propios["fin"] - propios["inicio"])).clip(lower=pd.Timedelta(0)) / 2
+            franjas += [dict(type="rect", xref="x", yref=f"y{eje} domain", x0=f"{inicio:%Y-%m-%d %H:%M:%S.%f}",
+                             x1=f"{fin:%Y-%m-%d %H:%M:%S.%f}", y0=0, y1=1, layer="below", fillcolor=COLOR_ANOMALIA,
+                             line_width=0)
+                        for inicio, fin in zip(propios["inicio"] - margen, propios["fin"] + margen)]
+    ultimo = "" if len(series) <= 1 else len(series)
+    layout = {"xaxis": {"type": "date", "anchor": f"y{ultimo}", "title": {"text": "Hora"}}, **ejes,
+              "shapes": franjas, "height": max(450, alto * len(series)), "title": {"text": titulo},
+              "showlegend": False}
+    return {"data": trazas, "layout": layout}
+
+
+def escribir_grafico(fig, ruta_html, series, puntos=PUNTOS_GRAFICO, refresco=None):
+    # `fig` es una figura de plotly o un diccionario como el de figura_series.
+    # `series` son las series completas de cada traza, en el mismo orden que sus datos.
+    # Si alguna se redujo, se guardan completas en un .js junto al HTML que el
+    # navegador solo carga al hacer zoom, y entonces se muestra el tramo visible
+    # con más detalle
+    script = None
+    if puntos and any(len(serie) > puntos for serie in series):
+        ruta_datos = os.path.splitext(ruta_html)[0] + "_datos.js"
+        with etapa("datos zoom", sum(len(serie) for serie in series)):
+            completos = [{"x": (serie.index.to_numpy(dtype="datetime64[ms]").astype(np.int64)).tolist(),
+                          "y": serie.to_numpy(dtype=np.float64).tolist()} for serie in series]
+            with open(ruta_datos, "w", encoding="utf-8") as archivo:
+                archivo.write("window.DASER_SERIES = " + json.dumps(completos) + ";")
+        script = (_SCRIPT_ZOOM.replace("{puntos}", str(int(puntos)))
+                  .replace("{archivo}", os.path.basename(ruta_datos)))
+    import plotly.io as pio
+
+    trazas = fig["data"] if isinstance(fig, dict) else fig.data
+    with etapa("grafico html", sum(len(traza["x"]) for traza in trazas if traza["x"] is not None)):
+        html = pio.to_html(fig, full_html=True, post_script=script, validate=not isinstance(fig, dict))
+        if refresco:
+            html = html.replace("<head>", f'<head><meta http-equiv="refresh" content="{refresco}">', 1)
+        with open(ruta_html, "w", encoding="utf-8") as archivo:
+            archivo.write(html)
+    return ruta_html
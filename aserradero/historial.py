@@ -0,0 +1,281 @@
+# Historial de varias sesiones en SQLite: resumen de cada tabla y señales por
+# minuto, indexados por fecha, jornada y tabla para comparar días sin releer los .txt
+import os
+import sqlite3
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from .cache import DIRECTORIO_CACHE, cargar_sesion, clave_cache
+from .carga import sesion_vacia
+from .consultas import jornada_de
+from .instrumentacion import etapa
+from .lote import carpetas_en_rango
+from .progreso import TareaCancelada, _sin_progreso
+from .tablas import detectar_tablas, tablas_sesion
+
+# Base de datos dentro de la carpeta de caché de la ruta base
+ARCHIVO_HISTORIAL = "historial.sqlite"
+
+# Versión del esquema; cambiarla vuelve a crear el historial desde cero
+VERSION_HISTORIAL = 1
+
+# Resolución de las señales guardadas para los gráficos de tendencia
+RESOLUCION_SENALES = "1min"
+
+# Señales por minuto: nombre en el historial -> (columna de la sesión, agregación)
+SENALES_HISTORIAL = {
+    "Corriente": ("Corriente", "mean"),
+    "Corriente_Max": ("Corriente", "max"),
+    "Avance": ("Avance (pulsos/s)", "mean"),
+    "Temperatura": ("Temperatura(ºC)", "mean"),
+    "Distancia": ("Distancia(mm)", "mean"),
+    "Madera": ("Madera", "mean"),
+}
+
+# La alineación rellena con 0 los huecos de un sensor; en estas columnas un 0 no
+# es una medida y no debe entrar en los promedios
+_CERO_ES_FALTANTE = ("Temperatura(ºC)", "Distancia(mm)")
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS sesiones (
+    carpeta TEXT PRIMARY KEY,
+    huella TEXT NOT NULL,
+    filas INTEGER NOT NULL,
+    inicio TEXT,
+    fin TEXT,
+    registrada TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tablas (
+    carpeta TEXT NOT NULL,
+    numero INTEGER NOT NULL,
+    fecha TEXT NOT NULL,
+    jornada TEXT NOT NULL,
+    inicio TEXT NOT NULL,
+    fin TEXT NOT NULL,
+    PRIMARY KEY (carpeta, numero)
+);
+CREATE INDEX IF NOT EXISTS tablas_fecha ON tablas (fecha, jornada);
+CREATE TABLE IF NOT EXISTS senales (
+    carpeta TEXT NOT NULL,
+    instante TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    jornada TEXT NOT NULL,
+    PRIMARY KEY (carpeta, instante)
+);
+CREATE INDEX IF NOT EXISTS senales_fecha ON senales (fecha, jornada, instante);
+CREATE INDEX IF NOT EXISTS senales_instante ON senales (instante);
+"""
+
+
+def ruta_historial(ruta_base):
+    return os.path.join(ruta_base, DIRECTORIO_CACHE, ARCHIVO_HISTORIAL)
+
+
+def _conectar(ruta_base):
+    ruta = ruta_historial(ruta_base)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    conexion = sqlite3.connect(ruta)
+    if conexion.execute("PRAGMA user_version").fetchone()[0] != VERSION_HISTORIAL:
+        conexion.executescript("DROP TABLE IF EXISTS sesiones; DROP TABLE IF EXISTS tablas; "
+                               "DROP TABLE IF EXISTS senales;")
+        conexion.execute(f"PRAGMA user_version = {VERSION_HISTORIAL}")
+    conexion.executescript(_ESQUEMA)
+    # Las columnas de estadísticas existen desde el principio: las consultas no
+    # fallan con un historial en el que todavía no se registró ninguna sesión
+    _declarar_columnas(conexion, _filas_tablas("", detectar_tablas(sesion_vacia())))
+    return conexion
+
+
+def _texto_instante(valores):
+    # Texto ISO con microsegundos: ordenarlo como texto es ordenarlo en el tiempo
+    return pd.DatetimeIndex(valores).strftime("%Y-%m-%d %H:%M:%S.%f").tolist()
+
+
+def _agregar_columnas(conexion, tabla, columnas):
+    # Las columnas de estadísticas se agregan al aparecer (p. ej. nuevas medidas por tabla)
+    existentes = {fila[1] for fila in conexion.execute(f"PRAGMA table_info({tabla})")}
+    for columna, tipo in columnas.items():
+        if columna not in existentes:
+            conexion.execute(f'ALTER TABLE {tabla} ADD COLUMN "{columna}" {tipo}')
+
+
+def _declarar_columnas(conexion, filas_tablas):
+    _agregar_columnas(conexion, "tablas", {columna: "INTEGER" if filas_tablas[columna].dtype.kind == "i"
+                                           else "REAL" for columna in filas_tablas.columns[6:]})
+    _agregar_columnas(conexion, "senales", dict.fromkeys(SENALES_HISTORIAL, "REAL"))
+
+
+def _insertar(conexion, tabla, marco):
+    columnas = ", ".join(f'"{columna}"' for columna in marco.columns)
+    marcadores = ", ".join("?" * len(marco.columns))
+    filas = marco.astype(object).where(marco.notna(), None).itertuples(index=False, name=None)
+    conexion.executemany(f"INSERT INTO {tabla} ({columnas}) VALUES ({marcadores})", filas)
+
+
+def _filas_tablas(carpeta, tablas):
+    nombres, dias = jornada_de(tablas["inicio"].to_numpy(dtype="datetime64[ns]").view(np.int64))
+    filas = pd.DataFrame({
+        "carpeta": carpeta,
+        "numero": np.arange(1, len(tablas) + 1),
+        "fecha": pd.DatetimeIndex(dias).strftime("%Y-%m-%d"),
+        "jornada": nombres,
+        "inicio": _texto_instante(tablas["inicio"]),
+        "fin": _texto_instante(tablas["fin"]),
+    })
+    for columna in tablas.columns.drop(["inicio", "fin"]):
+        valores = tablas[columna].to_numpy()
+        filas[columna] = valores.astype(np.int64) if valores.dtype.kind in "biu" else valores.astype(np.float64)
+    return filas
+
+
+def _filas_senales(carpeta, datos):
+    if datos.empty:
+        return pd.DataFrame(columns=["carpeta", "instante", "fecha", "jornada", *SENALES_HISTORIAL])
+    datos = datos.assign(**{columna: datos[columna].where(datos[columna] != 0) for columna in _CERO_ES_FALTANTE})
+    minutos = datos.resample(RESOLUCION_SENALES)
+    senales = pd.DataFrame({nombre: getattr(minutos[columna], agregacion)()
+                            for nombre, (columna, agregacion) in SENALES_HISTORIAL.items()})
+    senales = senales[minutos.size() > 0]
+    nombres, dias = jornada_de(senales.index.to_numpy(dtype="datetime64[ns]").view(np.int64))
+    filas = pd.DataFrame({
+        "carpeta": carpeta,
+        "instante": _texto_instante(senales.index),
+        "fecha": pd.DatetimeIndex(dias).strftime("%Y-%m-%d"),
+        "jornada": nombres,
+    })
+    for nombre in SENALES_HISTORIAL:
+        filas[nombre] = senales[nombre].to_numpy(dtype=np.float64)
+    return filas
+
+
+def registrar_sesion(ruta_base, carpeta, datos, tablas, huella=""):
+    # Reemplaza en el historial todo lo de la carpeta en una sola transacción
+    nombre = os.path.basename(os.path.normpath(carpeta))
+    with etapa("historial", len(tablas)):
+        filas_tablas = _filas_tablas(nombre, tablas)
+        filas_senales = _filas_senales(nombre, datos)
+        conexion = _conectar(ruta_base)
+        try:
+            with conexion:
+                _declarar_columnas(conexion, filas_tablas)
+                for tabla in ("sesiones", "tablas", "senales"):
+                    conexion.execute(f"DELETE FROM {tabla} WHERE carpeta = ?", (nombre,))
+                conexion.execute(
+                    "INSERT INTO sesiones VALUES (?, ?, ?, ?, ?, ?)",
+                    (nombre, huella, len(datos), *(_texto_instante(datos.index[[0, -1]]) if len(datos) else (None, None)),
+                     datetime.now().isoformat(timespec="seconds")))
+                _insertar(conexion, "tablas", filas_tablas)
+                _insertar(conexion, "senales", filas_senales)
+        finally:
+            conexion.close()
+    return len(filas_tablas)
+
+
+def actualizar_historial(ruta_base, carpetas, progreso=_sin_progreso):
+    # Registra las carpetas cuyos .txt cambiaron desde la última vez (la huella es
+    # la misma que usa la caché). Devuelve las carpetas registradas y los errores
+    registradas = []
+    errores = {}
+    conexion = _conectar(ruta_base)
+    try:
+        huellas = dict(conexion.execute("SELECT carpeta, huella FROM sesiones").fetchall())
+    finally:
+        conexion.close()
+    for i, carpeta in enumerate(carpetas):
+        nombre = os.path.basename(os.path.normpath(carpeta))
+        progreso(i / max(len(carpetas), 1), f"Historial: {nombre}")
+        try:
+            huella = clave_cache(carpeta, "historial")
+            if huellas.get(nombre) == huella:
+                continue
+            datos = cargar_sesion(carpeta)
+            registrar_sesion(ruta_base, carpeta, datos, tablas_sesion(datos), huella)
+            registradas.append(nombre)
+        except TareaCancelada:
+            raise
+        except Exception as e:
+            errores[nombre] = str(e)
+    return registradas, errores
+
+
+def carpetas_con_fecha(ruta_base):
+    # Todas las carpetas "datos DD-MM-YYYY" de la ruta base, por fecha
+    return carpetas_en_rango(ruta_base, date.min, date.max)
+
+
+def _condiciones(desde, hasta, jornada):
+    condiciones, parametros = [], []
+    if desde is not None:
+        condiciones.append("fecha >= ?")
+        parametros.append(f"{desde:%Y-%m-%d}")
+    if hasta is not None:
+        condiciones.append("fecha <= ?")
+        parametros.append(f"{hasta:%Y-%m-%d}")
+    if jornada and jornada != "Todas":
+        condiciones.append("jornada = ?")
+        parametros.append(jornada)
+    return (" WHERE " + " AND ".join(condiciones) if condiciones else ""), parametros
+
+
+def consultar_tablas(ruta_base, desde=None, hasta=None, jornada=None):
+    # Todas las tablas registradas entre dos fechas (de jornada), en orden
+    donde, parametros = _condiciones(desde, hasta, jornada)
+    conexion = _conectar(ruta_base)
+    try:
+        tablas = pd.read_sql_query(f"SELECT * FROM tablas{donde} ORDER BY inicio", conexion, params=parametros)
+    finally:
+        conexion.close()
+    for columna in ("inicio", "fin"):
+        tablas[columna] = pd.to_datetime(tablas[columna], format="%Y-%m-%d %H:%M:%S.%f")
+    return tablas
+
+
+def resumen_historial(ruta_base, desde=None, hasta=None, jornada=None):
+    # Por día y jornada: cantidad de tablas, duración media de corte, picos de
+    # corriente y temperatura. La deriva es la temperatura del último minuto de la
+    # jornada menos la del primero
+    donde, parametros = _condiciones(desde, hasta, jornada)
+    con_temperatura = donde + (" AND " if donde else " WHERE ") + "Temperatura IS NOT NULL"
+    conexion = _conectar(ruta_base)
+    try:
+        resumen = pd.read_sql_query(f"""
+            SELECT fecha, jornada, COUNT(*) AS tablas, AVG(duracion) AS duracion_media,
+                   SUM(duracion) AS tiempo_corte, MAX(Corriente_Max) AS corriente_pico,
+                   AVG(Corriente_Max) AS corriente_pico_media, AVG(Corriente_Integrada) AS corriente_integrada_media,
+                   MIN(Temperatura_Min) AS temperatura_min, MAX(Temperatura_Max) AS temperatura_max
+            FROM tablas{donde} GROUP BY fecha, jornada ORDER BY fecha, jornada""", conexion, params=parametros)
+        deriva = pd.read_sql_query(f"""
+            SELECT fecha, jornada,
+                   MAX(CASE WHEN ultimo = 1 THEN Temperatura END) - MAX(CASE WHEN primero = 1 THEN Temperatura END)
+                       AS deriva_temperatura
+            FROM (SELECT fecha, jornada, Temperatura,
+                         ROW_NUMBER() OVER (PARTITION BY fecha, jornada ORDER BY instante) AS primero,
+                         ROW_NUMBER() OVER (PARTITION BY fecha, jornada ORDER BY instante DESC) AS ultimo
+                  FROM senales{con_temperatura})
+            GROUP BY fecha, jornada""", conexion, params=parametros)
+    finally:
+        conexion.close()
+    return resumen.merge(deriva, on=["fecha", "jornada"], how="left")
+
+
+def serie_historial(ruta_base, senal, desde=None, hasta=None, jornada=None):
+    # Señal por minuto (ver SENALES_HISTORIAL) con índice de tiempo, para tendencias
+    if senal not in SENALES_HISTORIAL:
+        raise ValueError(f"Señal no válida: {senal}")
+    donde, parametros = _condiciones(desde, hasta, jornada)
+    conexion = _conectar(ruta_base)
+    try:
+        filas = conexion.execute(f'SELECT instante, "{senal}" FROM senales{donde} ORDER BY instante',
+                                 parametros).fetchall()
+    finally:
+        conexion.close()
+    instantes = pd.to_datetime([fila[0] for fila in filas], format="%Y-%m-%d %H:%M:%S.%f")
+    return pd.Series([fila[1] for fila in filas], index=instantes, name=senal, dtype=np.float64)
+
+
+def resumen_historial_texto(resumen):
+    if resumen.empty:
+        return "No hay tablas registradas en el historial para ese rango."
+    return resumen.to_string(index=False, float_format=lambda valor: f"{valor:.2f}")
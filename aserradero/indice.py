@@ -0,0 +1,210 @@
+# Índice de las carpetas de la ruta base: nombre real de cada archivo, filas y
+# rango de fechas, guardado en disco para buscar entre miles de carpetas sin
+# volver a recorrerlas. Al actualizarlo solo se revisan las carpetas cuya fecha
+# de modificación cambió y las que todavía pueden estar creciendo
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+from .archivado import leer_indice_archivado
+from .cache import DIRECTORIO_CACHE
+from .carga import ARCHIVOS_REGISTRO, rutas_registro
+from .lote import fecha_carpeta
+from .progreso import _sin_progreso
+
+ARCHIVO_INDICE = "indice_carpetas.json"
+# Versión del formato del índice; cambiarla obliga a volver a indexar
+VERSION_INDICE = 1
+# Una carpeta con archivos modificados hace menos de estas horas puede seguir
+# recibiendo líneas (agregar a un archivo no cambia la fecha de la carpeta)
+HORAS_CARPETA_ABIERTA = 24
+# Bytes que se leen por vez al contar líneas y al buscar la última
+BLOQUE_LECTURA = 2**20
+# Cada cuántas carpetas indexadas se guarda el índice, así cancelar no pierde lo hecho
+GUARDAR_CADA = 50
+# Origen de los instantes en ns del índice de las carpetas archivadas
+EPOCA = datetime(1970, 1, 1)
+
+
+def ruta_indice(ruta_base):
+    return os.path.join(ruta_base, DIRECTORIO_CACHE, ARCHIVO_INDICE)
+
+
+def _instante(linea, formato):
+    # "2025/1/13 9:5:7 ..." -> datetime, o None si la línea no empieza con fecha y hora
+    partes = linea.decode("utf-8", "replace").split()
+    if len(partes) < 2:
+        return None
+    try:
+        horas, minutos, segundos = partes[1].split(":")
+        return (datetime.strptime(partes[0], formato["formato_fecha"])
+                + timedelta(hours=int(horas), minutes=int(minutos), seconds=float(segundos)))
+    except ValueError:
+        return None
+
+
+def _resumen_archivo(ruta, formato):
+    # Filas (sin la cabecera) contando saltos de línea por bloques, y primer y
+    # último instante leyendo solo el principio y el final del archivo
+    info = os.stat(ruta)
+    lineas = 0
+    ultimo_byte = b"\n"
+    with open(ruta, "rb") as archivo:
+        cabecera = archivo.readline()
+        primeras = [archivo.readline() for _ in range(5)]
+        archivo.seek(len(cabecera))
+        while bloque := archivo.read(BLOQUE_LECTURA):
+            lineas += bloque.count(b"\n")
+            ultimo_byte = bloque[-1:]
+        if ultimo_byte != b"\n":
+            lineas += 1  # La última línea todavía no terminó de escribirse
+        archivo.seek(max(len(cabecera), info.st_size - 4096))
+        ultimas = archivo.read().splitlines()[::-1]
+
+    desde = next((instante for instante in (_instante(linea, formato) for linea in primeras) if instante), None)
+    hasta = next((instante for instante in (_instante(linea, formato) for linea in ultimas) if instante), None)
+    return {"archivo": os.path.basename(ruta), "tamano": info.st_size, "mtime_ns": info.st_mtime_ns, "filas": lineas,
+            "desde": desde.isoformat() if desde else None, "hasta": hasta.isoformat() if hasta else None}
+
+
+def _resumen_archivado(ruta, entrada):
+    # Lo mismo que _resumen_archivo pero sacado del índice de la carpeta archivada
+    info = os.stat(ruta)
+    bloques = [bloque for bloque in entrada["bloques"] if bloque[3] is not None]
+    desde = EPOCA + timedelta(microseconds=min(bloque[3] for bloque in bloques) // 1000) if bloques else None
+    hasta = EPOCA + timedelta(microseconds=max(bloque[4] for bloque in bloques) // 1000) if bloques else None
+    return {"archivo": os.path.basename(ruta), "tamano": info.st_size, "mtime_ns": info.st_mtime_ns,
+            "filas": sum(bloque[2] for bloque in entrada["bloques"]),
+            "desde": desde.isoformat() if desde else None, "hasta": hasta.isoformat() if hasta else None}
+
+
+def indexar_carpeta(carpeta, mtime_ns=None):
+    rutas = rutas_registro(carpeta)
+    archivado = leer_indice_archivado(carpeta)
+    archivos = {}
+    for tipo, formato in ARCHIVOS_REGISTRO.items():
+        if not os.path.isfile(rutas[tipo]):
+            archivos[tipo] = None
+        elif archivado is not None and rutas[tipo].endswith(".gz"):
+            archivos[tipo] = _resumen_archivado(rutas[tipo], archivado["archivos"][tipo])
+        else:
+            archivos[tipo] = _resumen_archivo(rutas[tipo], formato)
+    presentes = [archivo for archivo in archivos.values() if archivo is not None]
+    desdes = [archivo["desde"] for archivo in presentes if archivo["desde"]]
+    hastas = [archivo["hasta"] for archivo in presentes if archivo["hasta"]]
+    fecha = fecha_carpeta(os.path.basename(carpeta))
+    return {
+        "nombre": os.path.basename(carpeta),
+        "fecha": fecha.isoformat() if fecha else None,
+        "mtime_ns": os.stat(carpeta).st_mtime_ns if mtime_ns is None else mtime_ns,
+        "completa": len(presentes) == len(ARCHIVOS_REGISTRO),
+        "archivada": archivado is not None,
+        "desde": min(desdes) if desdes else None,
+        "hasta": max(hastas) if hastas else None,
+        "filas": sum(archivo["filas"] for archivo in presentes),
+        "archivos": archivos,
+    }
+
+
+def leer_indice(ruta_base):
+    # Carpetas indexadas por nombre; vacío si no hay índice o es de otra versión
+    try:
+        with open(ruta_indice(ruta_base), encoding="utf-8") as archivo:
+            contenido = json.load(archivo)
+    except (OSError, ValueError):
+        return {}
+    if contenido.get("version") != VERSION_INDICE:
+        return {}
+    return {carpeta["nombre"]: carpeta for carpeta in contenido.get("carpetas", [])}
+
+
+def guardar_indice(ruta_base, carpetas):
+    ruta = ruta_indice(ruta_base)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta + ".tmp", "w", encoding="utf-8") as archivo:
+        json.dump({"version": VERSION_INDICE, "carpetas": list(carpetas.values())}, archivo, ensure_ascii=False)
+    os.replace(ruta + ".tmp", ruta)
+
+
+def _archivos_cambiaron(carpeta, entrada):
+    # Compara tamaño y fecha de los archivos con los indexados (un scandir, sin leerlos)
+    indexados = {archivo["archivo"]: archivo for archivo in entrada["archivos"].values() if archivo}
+    with os.scandir(carpeta) as entradas:
+        actuales = {item.name: item.stat() for item in entradas if item.name in indexados}
+    return any(nombre not in actuales or actuales[nombre].st_size != archivo["tamano"]
+               or actuales[nombre].st_mtime_ns != archivo["mtime_ns"] for nombre, archivo in indexados.items())
+
+
+def _abierta(entrada, ahora_ns):
+    limite = ahora_ns - HORAS_CARPETA_ABIERTA * 3600 * 10**9
+    return any(archivo and archivo["mtime_ns"] >= limite for archivo in entrada["archivos"].values())
+
+
+def actualizar_indice(ruta_base, progreso=_sin_progreso):
+    # Indexa las carpetas nuevas o modificadas, quita las que ya no existen y
+    # devuelve el índice completo (nombre -> carpeta)
+    anterior = leer_indice(ruta_base)
+    carpetas = {}
+    pendientes = []
+    ahora_ns = time.time_ns()
+    progreso(0.0, "Buscando carpetas")
+    with os.scandir(ruta_base) as entradas:
+        for entrada in entradas:
+            if entrada.name.startswith(".") or not entrada.is_dir():
+                continue
+            mtime_ns = entrada.stat().st_mtime_ns
+            previa = anterior.get(entrada.name)
+            if (previa is None or previa["mtime_ns"] != mtime_ns
+                    or (_abierta(previa, ahora_ns) and _archivos_cambiaron(entrada.path, previa))):
+                pendientes.append((entrada.path, mtime_ns))
+            else:
+                carpetas[entrada.name] = previa
+
+    cambios = len(pendientes) or len(carpetas) != len(anterior)
+    for i, (carpeta, mtime_ns) in enumerate(pendientes):
+        progreso(i / len(pendientes), f"Indexando {os.path.basename(carpeta)} ({i + 1} de {len(pendientes)})")
+        try:
+            carpetas[os.path.basename(carpeta)] = indexar_carpeta(carpeta, mtime_ns)
+        except OSError:
+            continue  # Carpeta sin permisos o que desapareció mientras tanto
+        if (i + 1) % GUARDAR_CADA == 0:
+            guardar_indice(ruta_base, {**anterior, **carpetas})
+    if cambios:
+        guardar_indice(ruta_base, carpetas)
+    return carpetas
+
+
+def buscar_carpetas(carpetas, texto="", desde=None, hasta=None, solo_completas=False):
+    # Carpetas cuyo nombre contiene `texto` (sin distinguir mayúsculas) y cuya
+    # fecha está en el rango, de la modificada más recientemente a la más antigua
+    texto = texto.strip().casefold()
+    resultado = []
+    for carpeta in carpetas.values():
+        if texto and texto not in carpeta["nombre"].casefold():
+            continue
+        if solo_completas and not carpeta["completa"]:
+            continue
+        if desde is not None or hasta is not None:
+            if carpeta["fecha"] is None:
+                continue
+            fecha = datetime.fromisoformat(carpeta["fecha"]).date()
+            if (desde is not None and fecha < desde) or (hasta is not None and fecha > hasta):
+                continue
+        resultado.append(carpeta)
+    return sorted(resultado, key=lambda carpeta: carpeta["mtime_ns"], reverse=True)
+
+
+def resumen_carpeta(carpeta):
+    # "10-01-2025 15:17 a 13-01-2025 11:34 · 41 135 filas · Corr.txt, registro_laser.txt, velocidad.txt"
+    partes = []
+    if carpeta["desde"] and carpeta["hasta"]:
+        desde, hasta = datetime.fromisoformat(carpeta["desde"]), datetime.fromisoformat(carpeta["hasta"])
+        partes.append(f"{desde:%d-%m-%Y %H:%M} a {hasta:%d-%m-%Y %H:%M}")
+    partes.append(f"{carpeta['filas']:,} filas".replace(",", " "))
+    faltan = [formato["archivo"] for tipo, formato in ARCHIVOS_REGISTRO.items() if carpeta["archivos"][tipo] is None]
+    partes.append(", ".join(archivo["archivo"] for archivo in carpeta["archivos"].values() if archivo)
+                  + (f" (falta {', '.join(faltan)})" if faltan else ""))
+    if carpeta.get("archivada"):
+        partes.append("archivada")
+    return " · ".join(partes)
@@ -0,0 +1,264 @@
+# Informes por jornada: estadísticas y gráficos de cada tabla en un HTML por
+# jornada, generados en varios procesos. Todos los informes de un directorio
+# comparten un único plotly.js en lugar de incluirlo en cada gráfico
+import html
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from .anomalias import anomalias_por_tabla, detectar_anomalias
+from .cache import cargar_sesion
+from .consultas import jornada_de
+from .graficos import COLOR_ANOMALIA, figura_series
+from .instrumentacion import (configuracion_diagnostico, configurar_diagnostico, ejecucion, etapa,
+                              incorporar_etapas, ultima_ejecucion)
+from .progreso import TareaCancelada, _sin_progreso
+from .tablas import VARIABLES_TABLA, detalles_tabla, tablas_sesion
+
+# Carpeta de los informes dentro de la ruta base
+DIRECTORIO_INFORMES = "informes"
+# Puntos por serie en el gráfico de cada tabla (una tabla dura segundos o minutos)
+PUNTOS_INFORME = 1000
+# Tablas que procesa cada proceso al generar los informes de una sesión ya cargada
+TABLAS_POR_TAREA = 20
+# Alto en píxeles de cada variable en los gráficos de una tabla
+ALTO_VARIABLE = 160
+
+_PLANTILLA = """<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="utf-8">
+<title>{titulo}</title>
+<script src="{plotly}"></script>
+<style>
+body {{ font-family: Arial, sans-serif; margin: 20px; }}
+table {{ border-collapse: collapse; }}
+th, td {{ border: 1px solid #999; padding: 3px 8px; text-align: right; }}
+tr.anomalia {{ background: {color}; }}
+section {{ border-top: 2px solid #000; margin-top: 20px; }}
+</style>
+</head>
+<body>
+<h1>{titulo}</h1>
+<p>{resumen}</p>
+<table>
+<tr><th>Tabla</th><th>Inicio</th><th>Fin</th><th>Duración (s)</th><th>Corriente máx. (A)</th>
+<th>Corriente integrada (A·s)</th><th>Temperatura máx. (°C)</th><th>Avance medio (pulsos/s)</th><th>Anomalías</th></tr>
+{filas}
+</table>
+{secciones}
+</body>
+</html>
+"""
+
+
+def _secciones_tablas(datos, tablas, eventos, origen="", puntos=PUNTOS_INFORME):
+    # Sección HTML de cada tabla (estadísticas y gráfico), agrupadas por jornada.
+    # `tablas` conserva como índice su posición en la sesión, igual que la
+    # columna `tabla` de `eventos`. Devuelve [(día, jornada, filas, secciones)]
+    # en orden, donde `filas` son las tablas con su cantidad de anomalías
+    import plotly.io as pio
+
+    if tablas.empty:
+        return []
+    conteo = anomalias_por_tabla(eventos, tablas.index.max() + 1).loc[tablas.index]
+    nombres, dias = jornada_de(tablas["inicio"].to_numpy(dtype="datetime64[ns]").view(np.int64))
+    filas = tablas.assign(origen=origen, numero=tablas.index + 1, jornada=nombres, dia=dias,
+                          anomalias=conteo.sum(axis=1).to_numpy())
+    eventos_tabla = dict(tuple(eventos.groupby("tabla")))
+    secciones = []
+    with etapa("secciones", len(tablas)):
+        for numero, tabla in tablas.iterrows():
+            nombre = f"{origen} - Tabla {numero + 1}" if origen else f"Tabla {numero + 1}"
+            identificador = f"tabla-{tabla['inicio']:%Y%m%d%H%M%S%f}"
+            lineas = "".join(f"<li>{html.escape(linea)}</li>" for linea in detalles_tabla(tabla, conteo.loc[numero]))
+            datos_tabla = datos.loc[tabla["inicio"]:tabla["fin"]]
+            grafico = ""
+            if not datos_tabla.empty:
+                series = [datos_tabla[variable] for variable in VARIABLES_TABLA if variable in datos_tabla.columns]
+                fig = figura_series(series, "", puntos, eventos_tabla.get(numero), ALTO_VARIABLE)
+                fig["layout"]["margin"] = {"t": 20, "b": 40}
+                grafico = pio.to_html(fig, validate=False, full_html=False, include_plotlyjs=False,
+                                      div_id=f"{identificador}-grafico")
+            secciones.append(f'<section id="{identificador}"><h2>{html.escape(nombre)}</h2><ul>{lineas}</ul>'
+                             f'{grafico}</section>')
+    filas = filas.assign(seccion=secciones, identificador=[f"tabla-{inicio:%Y%m%d%H%M%S%f}" for inicio in tablas["inicio"]])
+
+    jornadas = []
+    # Las tablas están ordenadas: cada jornada es un tramo seguido
+    cambio = np.flatnonzero(np.r_[True, (dias[1:] != dias[:-1]) | (nombres[1:] != nombres[:-1])])
+    for inicio, fin in zip(cambio, np.r_[cambio[1:], len(filas)]):
+        tramo = filas.iloc[inicio:fin]
+        jornadas.append((tramo["dia"].iloc[0], tramo["jornada"].iloc[0], tramo.drop(columns="seccion"),
+                         tramo["seccion"].tolist()))
+    return jornadas
+
+
+def _informe_carpeta(carpeta, duracion_minima, tolerancia_hueco, puntos, memoria):
+    # Se ejecuta en otro proceso: lee la carpeta (o su caché) y arma sus secciones
+    configurar_diagnostico(memoria=memoria)
+    with ejecucion(os.path.basename(carpeta)):
+        datos = cargar_sesion(carpeta)
+        tablas = tablas_sesion(datos, duracion_minima, tolerancia_hueco)
+        eventos = detectar_anomalias(datos, tablas)
+        jornadas = _secciones_tablas(datos, tablas, eventos, os.path.basename(os.path.normpath(carpeta)), puntos)
+    return jornadas, ultima_ejecucion()
+
+
+def _informe_tramo(datos, tablas, eventos, puntos, memoria):
+    # Se ejecuta en otro proceso con un grupo de tablas de una sesión ya cargada
+    configurar_diagnostico(memoria=memoria)
+    with ejecucion("tablas"):
+        jornadas = _secciones_tablas(datos, tablas, eventos, puntos=puntos)
+    return jornadas, ultima_ejecucion()
+
+
+def _en_orden(funcion, tareas, nombres, procesos, progreso):
+    # Ejecuta funcion(*tarea) en varios procesos y entrega (nombre, resultado,
+    # error) en el orden de las tareas a medida que terminan, así los informes
+    # se escriben sin esperar al resto
+    procesos = min(procesos or os.cpu_count() or 1, len(tareas))
+    if procesos <= 1:
+        for i, (tarea, nombre) in enumerate(zip(tareas, nombres)):
+            progreso(i / len(tareas), f"Informes: {nombre}")
+            try:
+                resultado, registro = funcion(*tarea)
+                incorporar_etapas(registro)
+                yield nombre, resultado, None
+            except TareaCancelada:
+                raise
+            except Exception as e:
+                yield nombre, None, str(e)
+        return
+
+    pool = ProcessPoolExecutor(max_workers=procesos)
+    try:
+        futuros = {pool.submit(funcion, *tarea): i for i, tarea in enumerate(tareas)}
+        progreso(0.0, f"Generando informes en {procesos} procesos")
+        terminados = {}
+        siguiente = 0
+        for cantidad, futuro in enumerate(as_completed(futuros), start=1):
+            try:
+                resultado, registro = futuro.result()
+                incorporar_etapas(registro)
+                terminados[futuros[futuro]] = (resultado, None)
+            except Exception as e:
+                terminados[futuros[futuro]] = (None, str(e))
+            progreso(cantidad / len(tareas), f"Informes: {cantidad} de {len(tareas)}")
+            while siguiente in terminados:
+                yield (nombres[siguiente], *terminados.pop(siguiente))
+                siguiente += 1
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def escribir_plotly(directorio):
+    # plotly.js una sola vez por directorio y versión; devuelve el nombre del archivo
+    import plotly
+    from plotly.offline import get_plotlyjs
+
+    nombre = f"plotly-{plotly.__version__}.min.js"
+    ruta = os.path.join(directorio, nombre)
+    if not os.path.isfile(ruta):
+        with open(ruta + ".tmp", "w", encoding="utf-8") as archivo:
+            archivo.write(get_plotlyjs())
+        os.replace(ruta + ".tmp", ruta)
+    return nombre
+
+
+def ruta_informe(directorio, dia, jornada):
+    # Mismo nombre de jornada que las particiones de exportar_sesion
+    return os.path.join(directorio, f"informe_{np.datetime64(dia, 'D')}_{jornada}.html")
+
+
+def _resumen_jornada(filas):
+    lineas = [f"Tablas: {len(filas)}", f"Tiempo de corte: {filas['duracion'].sum():.1f} s",
+              f"Corriente integrada: {filas['Corriente_Integrada'].sum():.1f} A·s",
+              f"Corriente máxima: {filas['Corriente_Max'].max():.2f} A",
+              f"Temperatura máxima: {filas['Temperatura_Max'].max():.2f} °C"]
+    en_marcha = filas["Avance_Medio"] > 0
+    if en_marcha.any():
+        lineas.append(f"Avance medio: {filas.loc[en_marcha, 'Avance_Medio'].mean():.2f} pulsos/s")
+    lineas.append(f"Tablas con anomalías: {int((filas['anomalias'] > 0).sum())} ({int(filas['anomalias'].sum())} eventos)")
+    origenes = [origen for origen in dict.fromkeys(filas["origen"]) if origen]
+    if origenes:
+        lineas.append("Carpetas: " + ", ".join(origenes))
+    return lineas
+
+
+def _escribir_informe(directorio, plotly, dia, jornada, partes):
+    filas = pd.concat([parte[0] for parte in partes], ignore_index=True)
+    titulo = f"Jornada {jornada} del {pd.Timestamp(dia):%d-%m-%Y}"
+    tabla_html = []
+    for fila in filas.itertuples(index=False):
+        nombre = f"{fila.origen} - {fila.numero}" if fila.origen else str(fila.numero)
+        clase = ' class="anomalia"' if fila.anomalias else ""
+        tabla_html.append(
+            f'<tr{clase}><td><a href="#{fila.identificador}">'
+            f'{html.escape(nombre)}</a></td><td>{fila.inicio:%H:%M:%S}</td><td>{fila.fin:%H:%M:%S}</td>'
+            f'<td>{fila.duracion:.1f}</td><td>{fila.Corriente_Max:.2f}</td><td>{fila.Corriente_Integrada:.1f}</td>'
+            f'<td>{fila.Temperatura_Max:.2f}</td><td>{fila.Avance_Medio:.2f}</td><td>{fila.anomalias}</td></tr>')
+    ruta = ruta_informe(directorio, dia, jornada)
+    with etapa("informe html", len(filas)):
+        with open(ruta + ".tmp", "w", encoding="utf-8") as archivo:
+            archivo.write(_PLANTILLA.format(
+                titulo=html.escape(titulo), plotly=plotly, color=COLOR_ANOMALIA,
+                resumen="<br>".join(html.escape(linea) for linea in _resumen_jornada(filas)),
+                filas="\n".join(tabla_html), secciones="\n".join(seccion for parte in partes for seccion in parte[1])))
+        os.replace(ruta + ".tmp", ruta)
+    return ruta
+
+
+def _generar(directorio, funcion, tareas, nombres, procesos, progreso):
+    # Junta las secciones de cada jornada y escribe su informe en cuanto ninguna
+    # tarea posterior puede agregarle tablas (la noche sigue en la carpeta del
+    # día siguiente, por eso se espera a que empiece un día posterior)
+    os.makedirs(directorio, exist_ok=True)
+    plotly = escribir_plotly(directorio)
+    pendientes = {}
+    informes = []
+    errores = {}
+    for nombre, jornadas, error in _en_orden(funcion, tareas, nombres, procesos, progreso):
+        if error is not None:
+            errores[nombre] = error
+            continue
+        for dia, jornada, filas, secciones in jornadas:
+            pendientes.setdefault((dia, jornada), []).append((filas, secciones))
+        if jornadas:
+            primer_dia = min(dia for dia, *_ in jornadas)
+            for clave in sorted(clave for clave in pendientes if clave[0] < primer_dia):
+                informes.append(_escribir_informe(directorio, plotly, *clave, pendientes.pop(clave)))
+    for clave in sorted(pendientes):
+        informes.append(_escribir_informe(directorio, plotly, *clave, pendientes.pop(clave)))
+    return informes, errores
+
+
+def informes_carpetas(carpetas, directorio, duracion_minima=0.0, tolerancia_hueco=0.0, puntos=PUNTOS_INFORME,
+                      procesos=None, progreso=_sin_progreso):
+    # Un informe por jornada de las carpetas indicadas (en orden de fecha), cada
+    # carpeta en un proceso distinto. Devuelve los informes escritos y los
+    # errores de cada carpeta
+    memoria = configuracion_diagnostico()["memoria"]
+    tareas = [(carpeta, duracion_minima, tolerancia_hueco, puntos, memoria) for carpeta in carpetas]
+    nombres = [os.path.basename(os.path.normpath(carpeta)) for carpeta in carpetas]
+    return _generar(directorio, _informe_carpeta, tareas, nombres, procesos, progreso)
+
+
+def informes_sesion(datos, directorio, tablas=None, eventos=None, puntos=PUNTOS_INFORME, procesos=None,
+                    progreso=_sin_progreso):
+    # Lo mismo para una sesión ya cargada: cada proceso recibe solo las filas de
+    # un grupo de TABLAS_POR_TAREA tablas
+    if tablas is None:
+        tablas = tablas_sesion(datos)
+    if eventos is None:
+        eventos = detectar_anomalias(datos, tablas)
+    memoria = configuracion_diagnostico()["memoria"]
+    tareas, nombres = [], []
+    for inicio in range(0, len(tablas), TABLAS_POR_TAREA):
+        grupo = tablas.iloc[inicio:inicio + TABLAS_POR_TAREA]
+        propios = eventos[(eventos["tabla"] >= inicio) & (eventos["tabla"] < inicio + len(grupo))]
+        tareas.append((datos.loc[grupo["inicio"].iloc[0]:grupo["fin"].iloc[-1]], grupo, propios, puntos, memoria))
+        nombres.append(f"Tablas {inicio + 1}-{inicio + len(grupo)}")
+    return _generar(directorio, _informe_tramo, tareas, nombres, procesos, progreso)
@@ -0,0 +1,245 @@
+# Medición de cada etapa de una operación (lectura, fechas, alineación, filtrado,
+# gráficos...): duración, filas y pico de memoria, guardadas como líneas JSON
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+# Registro por defecto de la interfaz, en la carpeta desde donde se ejecuta
+ARCHIVO_DIAGNOSTICO = "diagnostico_daser.jsonl"
+# Al superar este tamaño el registro se renombra a .1 y se empieza otro
+TAMANO_MAXIMO_DIAGNOSTICO = 5 * 2**20
+# Funciones más costosas que se guardan del perfil de cProfile
+FUNCIONES_PERFIL = 20
+# Ejecuciones recientes que se conservan en memoria para la vista de diagnóstico
+HISTORIAL_DIAGNOSTICO = 30
+
+# archivo: registro JSON (None para solo guardar la última ejecución en memoria).
+# memoria: medir picos con tracemalloc. perfil: capturar la ejecución con cProfile
+_configuracion = {"archivo": None, "memoria": False, "perfil": False}
+_local = threading.local()
+_cerrojo = threading.Lock()
+_historial = deque(maxlen=HISTORIAL_DIAGNOSTICO)
+
+
+class Etapa:
+    def __init__(self, nombre, filas=None):
+        self.nombre = nombre
+        self.filas = filas
+        self.segundos = 0.0
+        self.etapas = []
+        self._memoria_inicial = None
+        self._pico = 0
+
+    def como_dict(self):
+        resultado = {"nombre": self.nombre, "segundos": round(self.segundos, 6)}
+        if self.filas is not None:
+            resultado["filas"] = int(self.filas)
+        if self._memoria_inicial is not None:
+            resultado["pico_mb"] = round((self._pico - self._memoria_inicial) / 2**20, 3)
+        if self.etapas:
+            resultado["etapas"] = [etapa if isinstance(etapa, dict) else etapa.como_dict() for etapa in self.etapas]
+        return resultado
+
+
+def configurar_diagnostico(archivo=None, memoria=False, perfil=False):
+    _configuracion.update(archivo=archivo, memoria=memoria, perfil=perfil)
+
+
+def configuracion_diagnostico():
+    return dict(_configuracion)
+
+
+def _pila():
+    # Un proceso creado con fork hereda la pila del hilo que lo creó: se ignora
+    if getattr(_local, "pid", None) != os.getpid():
+        return None
+    return _local.pila
+
+
+def _abrir_memoria(actual, padre):
+    # tracemalloc tiene un único pico global: antes de reiniciarlo se lo
+    # traspasa a la etapa que lo contiene
+    en_uso, pico = tracemalloc.get_traced_memory()
+    if padre is not None:
+        padre._pico = max(padre._pico, pico)
+    tracemalloc.reset_peak()
+    actual._memoria_inicial = en_uso
+    actual._pico = en_uso
+
+
+def _cerrar_memoria(actual, padre):
+    actual._pico = max(actual._pico, tracemalloc.get_traced_memory()[1])
+    if padre is not None:
+        padre._pico = max(padre._pico, actual._pico)
+
+
+@contextmanager
+def etapa(nombre, filas=None):
+    # Fuera de una ejecución no se mide nada, así el costo en la interfaz es nulo.
+    # Quien usa la etapa puede completar `filas` al conocerlas
+    pila = _pila()
+    actual = Etapa(nombre, filas)
+    if not pila:
+        yield actual
+        return
+    padre = pila[-1]
+    padre.etapas.append(actual)
+    pila.append(actual)
+    memoria = tracemalloc.is_tracing()
+    if memoria:
+        _abrir_memoria(actual, padre)
+    inicio = time.perf_counter()
+    try:
+        yield actual
+    finally:
+        actual.segundos = time.perf_counter() - inicio
+        if memoria:
+            _cerrar_memoria(actual, padre)
+        pila.pop()
+
+
+def incorporar_etapas(registro):
+    # Agregar a la etapa en curso lo medido en otro proceso (p. ej. cada carpeta de un lote)
+    pila = _pila()
+    if pila and registro:
+        pila[-1].etapas.append({clave: valor for clave, valor in registro.items()
+                                if clave in ("nombre", "segundos", "filas", "pico_mb", "etapas")})
+
+
+@contextmanager
+def ejecucion(nombre, filas=None):
+    # Operación completa (cargar, filtrar, graficar...). Al terminar se guarda
+    # como la última ejecución y, si hay archivo configurado, como una línea JSON.
+    # Una ejecución dentro de otra se mide como una etapa más
+    if _pila():
+        with etapa(nombre, filas) as actual:
+            yield actual
+        return
+
+    raiz = Etapa(nombre, filas)
+    _local.pila = [raiz]
+    _local.pid = os.getpid()
+    configuracion = dict(_configuracion)
+    iniciar_memoria = configuracion["memoria"] and not tracemalloc.is_tracing()
+    if iniciar_memoria:
+        tracemalloc.start()
+    if tracemalloc.is_tracing():
+        _abrir_memoria(raiz, None)
+    perfil = None
+    if configuracion["perfil"]:
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError:
+            perfil = None  # Ya hay otro perfilador activo (otra ejecución en paralelo)
+
+    error = None
+    inicio = time.perf_counter()
+    try:
+        yield raiz
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        raiz.segundos = time.perf_counter() - inicio
+        if perfil is not None:
+            perfil.disable()
+        if raiz._memoria_inicial is not None:
+            _cerrar_memoria(raiz, None)
+        if iniciar_memoria:
+            tracemalloc.stop()
+        _local.pila = None
+
+        registro = {"fecha": datetime.now().isoformat(timespec="seconds"), "pid": os.getpid()}
+        registro.update(raiz.como_dict())
+        if error:
+            registro["error"] = error
+        if perfil is not None:
+            registro["perfil"] = _resumen_perfil(perfil, configuracion["archivo"])
+        _registrar(registro, configuracion["archivo"])
+
+
+def _resumen_perfil(perfil, archivo):
+    # Funciones con más tiempo acumulado; el perfil completo se guarda en un
+    # .prof junto al registro para abrirlo con pstats o snakeviz
+    estadisticas = pstats.Stats(perfil)
+    resumen = {"funciones": []}
+    filas = sorted(estadisticas.stats.items(), key=lambda item: item[1][3], reverse=True)
+    for (ruta, linea, funcion), (_, llamadas, propio, acumulado, _) in filas[:FUNCIONES_PERFIL]:
+        resumen["funciones"].append({"funcion": f"{os.path.basename(ruta)}:{linea}({funcion})", "llamadas": llamadas,
+                                     "propio": round(propio, 6), "acumulado": round(acumulado, 6)})
+    if archivo:
+        ruta_perfil = f"{os.path.splitext(archivo)[0]}-{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}.prof"
+        try:
+            estadisticas.dump_stats(ruta_perfil)
+            resumen["archivo"] = ruta_perfil
+        except OSError:
+            pass
+    return resumen
+
+
+def _registrar(registro, archivo):
+    with _cerrojo:
+        _historial.append(registro)
+        if not archivo:
+            return
+        try:
+            if os.path.isfile(archivo) and os.path.getsize(archivo) > TAMANO_MAXIMO_DIAGNOSTICO:
+                os.replace(archivo, archivo + ".1")
+            with open(archivo, "a", encoding="utf-8") as salida:
+                salida.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        except OSError:
+            pass  # El diagnóstico nunca debe interrumpir la operación medida
+
+
+def ultima_ejecucion():
+    with _cerrojo:
+        return _historial[-1] if _historial else None
+
+
+def ultimas_ejecuciones():
+    # De la más reciente a la más antigua
+    with _cerrojo:
+        return list(reversed(_historial))
+
+
+def leer_diagnostico(archivo, cantidad=None):
+    # Últimas ejecuciones guardadas en un registro JSON
+    registros = []
+    with open(archivo, encoding="utf-8") as entrada:
+        for linea in entrada:
+            if linea.strip():
+                registros.append(json.loads(linea))
+    return registros[-cantidad:] if cantidad else registros
+
+
+def filas_diagnostico(registro, profundidad=0):
+    # Recorre las etapas en orden: (profundidad, etapa, fracción del total de la ejecución)
+    total = registro.get("segundos") or 0.0
+
+    def recorrer(actual, nivel):
+        yield nivel, actual, (actual["segundos"] / total if total else 0.0)
+        for hija in actual.get("etapas", []):
+            yield from recorrer(hija, nivel + 1)
+
+    yield from recorrer(registro, profundidad)
+
+
+def resumen_diagnostico(registro):
+    # Texto con una línea por etapa, sangrada según su nivel
+    lineas = [f"{registro['nombre']} ({registro.get('fecha', '')})" + (f" - error: {registro['error']}"
+                                                                       if registro.get("error") else "")]
+    for nivel, actual, fraccion in filas_diagnostico(registro):
+        filas = f"{actual['filas']:>10}" if "filas" in actual else f"{'':>10}"
+        pico = f"{actual['pico_mb']:>10.1f} MB" if "pico_mb" in actual else ""
+        lineas.append(f"{'  ' * nivel + actual['nombre']:<36}{actual['segundos']:>10.4f} s{fraccion:>7.0%}{filas}{pico}")
+    for funcion in registro.get("perfil", {}).get("funciones", [])[:10]:
+        lineas.append(f"  {funcion['acumulado']:>10.4f} s {funcion['llamadas']:>8}  {funcion['funcion']}")
+    return "\n".join(lineas)
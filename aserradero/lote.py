@@ -0,0 +1,97 @@
+# Carga de varias carpetas (un rango de fechas) en paralelo
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import pandas as pd
+
+from .cache import cargar_sesion
+from .carga import sesion_vacia
+from .instrumentacion import (configuracion_diagnostico, configurar_diagnostico, ejecucion, etapa,
+                              incorporar_etapas, ultima_ejecucion)
+from .progreso import TareaCancelada, _sin_progreso
+
+
+def fecha_carpeta(nombre):
+    # Fecha de una carpeta "datos DD-MM-YYYY", o None si el nombre no la contiene
+    coincidencia = re.search(r"(\d{1,2})-(\d{1,2})-(\d{4})", nombre)
+    if coincidencia is None:
+        return None
+    dia, mes, anio = (int(valor) for valor in coincidencia.groups())
+    try:
+        return datetime(anio, mes, dia).date()
+    except ValueError:
+        return None
+
+
+def carpetas_en_rango(ruta_base, desde, hasta):
+    # scandir ya sabe qué entradas son carpetas, sin un stat por cada una
+    carpetas = []
+    with os.scandir(ruta_base) as entradas:
+        for entrada in entradas:
+            fecha = fecha_carpeta(entrada.name)
+            if fecha is not None and desde <= fecha <= hasta and entrada.is_dir():
+                carpetas.append((fecha, entrada.path))
+    return [ruta for _, ruta in sorted(carpetas)]
+
+
+def _cargar_carpeta(carpeta, grilla, agregacion, memoria):
+    # Se ejecuta en otro proceso: la medición se devuelve junto con los datos
+    # para sumarla a la ejecución del proceso principal
+    configurar_diagnostico(memoria=memoria)
+    with ejecucion(os.path.basename(carpeta)):
+        datos = cargar_sesion(carpeta, grilla, agregacion)
+    return datos, ultima_ejecucion()
+
+
+def cargar_lote(carpetas, grilla=None, agregacion="mean", procesos=None, progreso=_sin_progreso):
+    # Procesa cada carpeta en un proceso distinto (reutilizando su caché si
+    # existe) y une todo en un único conjunto ordenado por instante
+    resultados = {}
+    errores = {}
+    if len(carpetas) == 1:
+        try:
+            with etapa(os.path.basename(carpetas[0])):
+                resultados[carpetas[0]] = cargar_sesion(carpetas[0], grilla, agregacion, progreso)
+        except TareaCancelada:
+            raise
+        except Exception as e:
+            errores[carpetas[0]] = str(e)
+    elif carpetas:
+        procesos = min(procesos or os.cpu_count() or 1, len(carpetas))
+        pool = ProcessPoolExecutor(max_workers=procesos)
+        try:
+            memoria = configuracion_diagnostico()["memoria"]
+            futuros = {pool.submit(_cargar_carpeta, carpeta, grilla, agregacion, memoria): carpeta
+                       for carpeta in carpetas}
+            progreso(0.0, f"Cargando {len(carpetas)} carpetas en {procesos} procesos")
+            for terminados, futuro in enumerate(as_completed(futuros), start=1):
+                carpeta = futuros[futuro]
+                try:
+                    resultados[carpeta], registro = futuro.result()
+                    incorporar_etapas(registro)
+                except Exception as e:
+                    errores[carpeta] = str(e)
+                progreso(terminados / len(carpetas), f"Cargadas {terminados} de {len(carpetas)} carpetas")
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    cargadas = [carpeta for carpeta in carpetas if carpeta in resultados]
+    if cargadas:
+        with etapa("union") as medida:
+            datos = pd.concat([resultados[carpeta] for carpeta in cargadas]).sort_index(kind="stable")
+            medida.filas = len(datos)
+    else:
+        datos = sesion_vacia()
+
+    # Identificar cada archivo del informe con su carpeta
+    datos.attrs["informe_carga"] = [
+        dict(archivo, archivo=f"{os.path.basename(carpeta)}/{archivo['archivo']}")
+        for carpeta in cargadas
+        for archivo in resultados[carpeta].attrs.get("informe_carga", [])
+    ]
+    datos.attrs.pop("ruta_cache", None)
+    datos.attrs["carpetas"] = [os.path.basename(carpeta) for carpeta in cargadas]
+    datos.attrs["errores"] = {os.path.basename(carpeta): error for carpeta, error in errores.items()}
+    return datos
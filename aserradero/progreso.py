@@ -0,0 +1,35 @@
+# Tareas en segundo plano con progreso y cancelación, sin depender de la interfaz
+import threading
+
+
+def _sin_progreso(fraccion, mensaje=""):
+    pass
+
+
+class TareaCancelada(Exception):
+    pass
+
+
+class Tarea:
+    # Trabajo en segundo plano. La función recibe `progreso(fraccion, mensaje)`,
+    # que además lanza TareaCancelada si el usuario canceló la tarea
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.futuro = None
+        self.estado = (0.0, nombre)
+        self._cancelada = threading.Event()
+
+    def progreso(self, fraccion, mensaje=""):
+        if self._cancelada.is_set():
+            raise TareaCancelada()
+        self.estado = (fraccion, mensaje or self.nombre)
+
+    def cancelar(self):
+        self._cancelada.set()
+        if self.futuro is not None:
+            self.futuro.cancel()
+
+    @property
+    def cancelada(self):
+        return self._cancelada.is_set()
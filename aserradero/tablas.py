@@ -0,0 +1,181 @@
+# Detección de tablas (cortes con Madera) y sus estadísticas
+import os
+
+import numpy as np
+import pandas as pd
+
+from .carga import feather, pa, resumen_memoria
+from .carro import COLUMNA_AVANCE, avance_carro
+from .instrumentacion import etapa
+
+# Variables que se grafican para cada tabla
+VARIABLES_TABLA = ["Corriente", COLUMNA_AVANCE, "Velocidad (ms)", "Temperatura(ºC)", "Distancia(mm)"]
+
+
+def detectar_tablas(datos, duracion_minima=0.0, tolerancia_hueco=0.0):
+    # Una tabla es un tramo continuo con Madera == 1. Los huecos sin madera de
+    # hasta `tolerancia_hueco` segundos se consideran parte de la misma tabla
+    # y se descartan las tablas que duran menos de `duracion_minima` segundos
+    madera = (datos["Madera"].to_numpy() == 1).astype(np.int8)
+    tiempos = datos.index.to_numpy(dtype="datetime64[ns]")
+    cambios = np.diff(madera, prepend=0, append=0)
+    inicios = np.flatnonzero(cambios == 1)
+    fines = np.flatnonzero(cambios == -1) - 1
+
+    if tolerancia_hueco > 0 and len(inicios) > 1:
+        hueco = (tiempos[inicios[1:]] - tiempos[fines[:-1]]) / np.timedelta64(1, "s")
+        unir = hueco <= tolerancia_hueco
+        inicios = inicios[np.r_[True, ~unir]]
+        fines = fines[np.r_[~unir, True]]
+
+    if duracion_minima > 0:
+        duracion = (tiempos[fines] - tiempos[inicios]) / np.timedelta64(1, "s")
+        inicios = inicios[duracion >= duracion_minima]
+        fines = fines[duracion >= duracion_minima]
+
+    # Filas que pertenecen a alguna tabla y número de tabla de cada fila
+    marcas = np.zeros(len(madera) + 1, dtype=np.int64)
+    marcas[inicios] += 1
+    marcas[fines + 1] -= 1
+    dentro = np.cumsum(marcas[:-1]) > 0
+    numero = np.cumsum(marcas[:-1] > 0) - 1
+
+    columnas = {"inicio": "datetime64[ns]", "fin": "datetime64[ns]", "duracion": "float64",
+                "Corriente_Total": "float64", "Corriente_Max": "float64", "Corriente_Min": "float64",
+                "Corriente_Integrada": "float64", "Temperatura_Max": "float64", "Temperatura_Min": "float64",
+                "Temperatura_Rango": "float64", "Distancia_Media": "float64", "Distancia_Max": "float64",
+                "Distancia_Min": "float64", "Pulsos": "int64", "Intervalo_Pulso": "float64",
+                "Pulsos_Segundo": "float64", "Avance_Medio": "float64", "Avance_Max": "float64", "Registro": "int64",
+                "en_curso": "bool"}
+    if not len(inicios):
+        return pd.DataFrame({col: pd.Series(dtype=tipo) for col, tipo in columnas.items()})
+
+    en_tabla = datos[dentro].assign(_tiempo=datos.index[dentro])
+    tablas = en_tabla.groupby(numero[dentro]).agg(
+        inicio=("_tiempo", "first"),
+        fin=("_tiempo", "last"),
+        Corriente_Total=("Corriente", "sum"),
+        Corriente_Max=("Corriente", "max"),
+        Corriente_Min=("Corriente", "min"),
+        Temperatura_Max=("Temperatura(ºC)", "max"),
+        Temperatura_Min=("Temperatura(ºC)", "min"),
+        Distancia_Media=("Distancia(mm)", "mean"),
+        Distancia_Max=("Distancia(mm)", "max"),
+        Distancia_Min=("Distancia(mm)", "min"),
+        Registro=("Corriente", "size"),
+    )
+    tablas["duracion"] = (tablas["fin"] - tablas["inicio"]).dt.total_seconds()
+    tablas["Temperatura_Rango"] = tablas["Temperatura_Max"] - tablas["Temperatura_Min"]
+
+    # Pares de filas consecutivas dentro de la misma tabla
+    par = dentro[:-1] & dentro[1:] & (numero[:-1] == numero[1:])
+    tabla_par = numero[:-1][par]
+    cantidad = len(tablas)
+
+    # Corriente integrada en el tiempo (A·s, regla del trapecio) como indicador de energía
+    corriente = datos["Corriente"].to_numpy(dtype=np.float64)
+    paso = np.diff(tiempos) / np.timedelta64(1, "s")
+    area = (corriente[:-1] + corriente[1:]) / 2 * paso
+    tablas["Corriente_Integrada"] = np.bincount(tabla_par, weights=area[par], minlength=cantidad)
+
+    # Pulsos del carro: cada aumento del contador de Velocidad.txt es un pulso
+    # nuevo y el aumento es el intervalo en ms. Los ceros (Stopped o sin dato) y
+    # los reinicios del contador no cuentan
+    contador = datos["Velocidad (ms)"].to_numpy(dtype=np.float64)
+    aumento = np.diff(contador)
+    pulso = par & (contador[:-1] > 0) & (aumento > 0)
+    pulsos = np.bincount(numero[:-1][pulso], minlength=cantidad)
+    suma_intervalos = np.bincount(numero[:-1][pulso], weights=aumento[pulso], minlength=cantidad)
+    tablas["Pulsos"] = pulsos
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tablas["Intervalo_Pulso"] = np.where(pulsos > 0, suma_intervalos / pulsos, np.nan)
+        tablas["Pulsos_Segundo"] = np.where(tablas["duracion"] > 0, pulsos / tablas["duracion"], 0.0)
+
+    # Avance del carro en cada pulso (pulsos/s, 0 si el intervalo cruza una
+    # parada o un reinicio). El medio es el de todo el tiempo en marcha
+    if COLUMNA_AVANCE in datos.columns:
+        avance = datos[COLUMNA_AVANCE].to_numpy(dtype=np.float64)
+    else:
+        avance = avance_carro(contador, tiempos).astype(np.float64)
+    en_marcha = pulso & (avance[1:] > 0)
+    tabla_marcha = numero[:-1][en_marcha]
+    marchas = np.bincount(tabla_marcha, minlength=cantidad)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tiempo_marcha = np.bincount(tabla_marcha, weights=1.0 / avance[1:][en_marcha], minlength=cantidad)
+        tablas["Avance_Medio"] = np.where(marchas > 0, marchas / tiempo_marcha, 0.0)
+    maximo = np.zeros(cantidad)
+    np.maximum.at(maximo, tabla_marcha, avance[1:][en_marcha])
+    tablas["Avance_Max"] = maximo
+
+    # La última tabla sigue abierta si el archivo termina en pleno corte
+    tablas["en_curso"] = False
+    if madera[-1] == 1 and fines[-1] == len(madera) - 1:
+        tablas.iloc[-1, tablas.columns.get_loc("en_curso")] = True
+    return tablas[list(columnas)].astype(columnas).reset_index(drop=True)
+
+
+def ruta_tablas_sesion(ruta_cache, duracion_minima=0.0, tolerancia_hueco=0.0):
+    # Mismo prefijo que la sesión: guardar_cache_sesion las borra junto con ella
+    base = os.path.splitext(ruta_cache)[0]
+    return f"{base}.tablas-{duracion_minima:g}-{tolerancia_hueco:g}.feather"
+
+
+def tablas_sesion(datos, duracion_minima=0.0, tolerancia_hueco=0.0):
+    # Estadísticas por tabla guardadas junto a la caché de la sesión; solo se
+    # recalculan si no existen para estos umbrales
+    ruta = None
+    if feather is not None and datos.attrs.get("ruta_cache"):
+        ruta = ruta_tablas_sesion(datos.attrs["ruta_cache"], duracion_minima, tolerancia_hueco)
+        if os.path.isfile(ruta):
+            try:
+                with etapa("tablas cache"):
+                    return feather.read_feather(ruta)
+            except (OSError, pa.ArrowInvalid):
+                pass  # Archivo dañado: se vuelve a generar
+
+    with etapa("tablas", len(datos)):
+        tablas = detectar_tablas(datos, duracion_minima, tolerancia_hueco)
+    if ruta:
+        try:
+            feather.write_feather(tablas, ruta + ".tmp", compression="uncompressed")
+            os.replace(ruta + ".tmp", ruta)
+        except (OSError, pa.ArrowException):
+            pass
+    return tablas
+
+
+def detalles_tabla(tabla, anomalias=None):
+    # Líneas de texto con las estadísticas de una fila de detectar_tablas;
+    # `anomalias` es la cantidad de cada evento (una fila de anomalias_por_tabla)
+    detalles = [
+        f"Hora de inicio: {tabla['inicio']:%d-%m-%Y %H:%M:%S}",
+        f"Hora de fin: {tabla['fin']:%d-%m-%Y %H:%M:%S}" + (" (corte en curso)" if tabla["en_curso"] else ""),
+        f"Duración de corte: {tabla['duracion']:.2f} segundos",
+        f"Corriente total: {tabla['Corriente_Total']:.2f} A",
+        f"Corriente máxima: {tabla['Corriente_Max']:.2f} A",
+        f"Corriente mínima: {tabla['Corriente_Min']:.2f} A",
+        f"Corriente integrada: {tabla['Corriente_Integrada']:.2f} A·s",
+        f"Temperatura máxima: {tabla['Temperatura_Max']:.2f} °C",
+        f"Temperatura mínima: {tabla['Temperatura_Min']:.2f} °C",
+        f"Rango de temperatura: {tabla['Temperatura_Rango']:.2f} °C",
+        f"Distancia media: {tabla['Distancia_Media']:.1f} mm ({tabla['Distancia_Min']:.0f} - {tabla['Distancia_Max']:.0f} mm)",
+        f"Pulsos del carro: {tabla['Pulsos']} ({tabla['Pulsos_Segundo']:.2f} pulsos/s"
+        + (f", intervalo medio {tabla['Intervalo_Pulso']:.0f} ms)" if tabla['Pulsos'] else ")"),
+        f"Avance del carro: {tabla['Avance_Medio']:.2f} pulsos/s en marcha (máximo {tabla['Avance_Max']:.2f})",
+    ]
+    if anomalias is not None:
+        detalles.append("Anomalías: " + ", ".join(f"{evento} {cantidad}" for evento, cantidad in anomalias.items()))
+    return detalles
+
+
+def resumen_sesion(datos, tablas):
+    # Resumen en texto de una sesión y sus tablas
+    lineas = [f"Filas: {len(datos)}"]
+    if len(datos):
+        lineas.append(f"Desde {datos.index[0]} hasta {datos.index[-1]}")
+    lineas.append(f"Tablas detectadas: {len(tablas)}")
+    if len(tablas):
+        lineas.append(f"Tiempo de corte: {tablas['duracion'].sum():.1f} s, "
+                      f"corriente integrada: {tablas['Corriente_Integrada'].sum():.1f} A·s")
+    lineas.append(f"Memoria: {resumen_memoria(datos)}")
+    return "\n".join(lineas)
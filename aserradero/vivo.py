@@ -0,0 +1,284 @@
+# Seguimiento de una carpeta mientras la máquina sigue escribiendo
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from .anomalias import actualizar_anomalias, detectar_anomalias
+from .carro import COLUMNA_AVANCE, CONTEXTO_AVANCE, agregar_avance
+from .carga import (ARCHIVOS_REGISTRO, COLUMNAS_MEDIDAS, TOLERANCIA_ALINEACION, _preparar_sesion, alinear_series,
+                    leer_archivo_registro, rutas_registro, sesion_vacia)
+from .progreso import _sin_progreso
+from .tablas import detectar_tablas
+
+# Muestras crudas que se conservan de cada sensor. Si el reloj de un registro
+# retrocede y llegan líneas con una hora ya emitida, se vuelve a alinear desde
+# ahí con estas muestras; las que caen antes se descartan y se cuentan
+RETENCION_VIVO = "10min"
+
+
+class _BufferCreciente:
+    # Columnas guardadas en arreglos numpy cuya capacidad se duplica al llenarse:
+    # agregar filas cuesta lo que ocupan las filas nuevas y la vista no copia datos
+
+    def __init__(self, capacidad_inicial=4096):
+        self.capacidad_inicial = capacidad_inicial
+        self.filas = 0
+        self.columnas = None
+        self.indice = None
+
+    def agregar(self, df):
+        nuevas = len(df)
+        if nuevas == 0:
+            return
+        if self.columnas is None:
+            capacidad = max(self.capacidad_inicial, nuevas)
+            self.columnas = {col: np.empty(capacidad, dtype=df[col].to_numpy().dtype) for col in df.columns}
+            self.indice = np.empty(capacidad, dtype="datetime64[ns]")
+        elif self.filas + nuevas > len(self.indice):
+            capacidad = max(2 * len(self.indice), self.filas + nuevas)
+            for col, arreglo in self.columnas.items():
+                self.columnas[col] = np.resize(arreglo, capacidad)
+            self.indice = np.resize(self.indice, capacidad)
+
+        fin = self.filas + nuevas
+        for col, arreglo in self.columnas.items():
+            arreglo[self.filas:fin] = df[col].to_numpy()
+        self.indice[self.filas:fin] = df.index.to_numpy(dtype="datetime64[ns]")
+        self.filas = fin
+
+    def truncar(self, instante):
+        # Descarta las filas posteriores a `instante`. Las vistas ya entregadas
+        # comparten memoria con el buffer, así que se sigue en arreglos nuevos
+        # para no cambiarlas (solo pasa cuando llegan filas atrasadas)
+        if self.columnas is None:
+            return 0
+        filas = self.posicion(instante, lado="right")
+        descartadas = self.filas - filas
+        if descartadas:
+            self.columnas = {col: arreglo.copy() for col, arreglo in self.columnas.items()}
+            self.indice = self.indice.copy()
+            self.filas = filas
+        return descartadas
+
+    def posicion(self, instante, lado="left"):
+        # Búsqueda binaria en el índice: un .loc sobre la vista revisaría primero
+        # que todo el índice esté ordenado
+        if self.columnas is None:
+            return 0
+        return int(np.searchsorted(self.indice[:self.filas], np.datetime64(instante, "ns"), side=lado))
+
+    def vista(self, columnas):
+        if self.columnas is None:
+            return sesion_vacia()[columnas]
+        indice = pd.DatetimeIndex(self.indice[:self.filas], copy=False, name="datetime")
+        return pd.DataFrame({col: self.columnas[col][:self.filas] for col in columnas}, index=indice, copy=False)
+
+
+class SeguidorEnVivo:
+    # Sigue una carpeta mientras la máquina escribe en sus archivos: recuerda la
+    # posición leída de cada .txt y en cada actualización procesa solo las
+    # líneas nuevas, extendiendo los datos combinados, las tablas detectadas y
+    # las anomalías dentro de ellas
+
+    def __init__(self, carpeta, grilla=None, agregacion="mean", duracion_minima=0.0, tolerancia_hueco=0.0):
+        self.carpeta = carpeta
+        self.grilla = grilla
+        self.agregacion = agregacion
+        self.duracion_minima = duracion_minima
+        self.tolerancia_hueco = tolerancia_hueco
+        self.tolerancia = pd.Timedelta(TOLERANCIA_ALINEACION)
+
+        self.posiciones = dict.fromkeys(ARCHIVOS_REGISTRO, 0)
+        self.encabezados = dict.fromkeys(ARCHIVOS_REGISTRO, b"")
+        # Muestras del último segundo leído, que puede no estar completo todavía
+        self.retenidas = {tipo: None for tipo in ARCHIVOS_REGISTRO}
+        # Muestras crudas recientes de cada sensor, ordenadas por hora: el
+        # contexto para alinear las siguientes y para volver a emitir un tramo
+        self.recientes = {tipo: None for tipo in ARCHIVOS_REGISTRO}
+        self.ultimo_emitido = pd.Timestamp.min
+        # Primer instante de self.datos que cambió en la última actualización:
+        # lo anterior sigue igual y la interfaz solo procesa lo posterior
+        self.cambios_desde = pd.Timestamp.min
+        # Primera hora que todavía se puede volver a emitir con self.recientes
+        self.cubierto = pd.Timestamp.min
+        self.informe = {formato["archivo"]: {"archivo": formato["archivo"], "filas": 0, "lineas_malas": 0,
+                                             "valores_invalidos": 0, "fechas_invalidas": 0, "filas_atrasadas": 0}
+                        for formato in ARCHIVOS_REGISTRO.values()}
+
+        self._buffer = _BufferCreciente()
+        self.datos = self._buffer.vista(COLUMNAS_MEDIDAS)
+        self.tablas = detectar_tablas(self.datos)
+        self.anomalias = detectar_anomalias(self.datos, self.tablas)
+
+    def _leer_lineas_nuevas(self, tipo, ruta):
+        # Una carpeta archivada (.txt.gz) ya no crece: se abre con la carga normal
+        if ruta.endswith(".gz") or not os.path.isfile(ruta):
+            return None
+        tamano = os.path.getsize(ruta)
+        if tamano < self.posiciones[tipo]:
+            # El archivo se reemplazó por uno nuevo: empezar desde el principio
+            self.posiciones[tipo] = 0
+            self.retenidas[tipo] = None
+        if tamano == self.posiciones[tipo]:
+            return None
+
+        with open(ruta, "rb") as archivo:
+            archivo.seek(self.posiciones[tipo])
+            bloque = archivo.read(tamano - self.posiciones[tipo])
+
+        # Procesar solo líneas completas; el resto se lee en la próxima vuelta
+        fin = bloque.rfind(b"\n") + 1
+        if fin == 0:
+            return None
+        bloque = bloque[:fin]
+        if self.posiciones[tipo] == 0:
+            salto = bloque.find(b"\n") + 1
+            self.encabezados[tipo], bloque = bloque[:salto], bloque[salto:]
+        self.posiciones[tipo] += fin
+        if not bloque.strip():
+            return None
+        return io.BytesIO(self.encabezados[tipo] + bloque)
+
+    def _inicio_contexto(self, desde):
+        # Primera muestra cruda necesaria para alinear de nuevo lo posterior a
+        # `desde`: sin grilla, lo que cae dentro de la tolerancia; con grilla,
+        # el relleno hacia adelante cuenta filas de la grilla común y no tiempo,
+        # así que hacen falta las últimas cubetas con datos de cualquier sensor
+        if desde == pd.Timestamp.min:
+            return desde
+        inicio = (desde - self.tolerancia).floor("s")
+        if self.grilla is None:
+            return inicio
+        limite = int(self.tolerancia / pd.Timedelta(self.grilla))
+        segundos = [desde.floor("s")]
+        for df in self.recientes.values():
+            if df is None or limite == 0:
+                continue
+            tiempos = df["datetime"].to_numpy()
+            fin = int(np.searchsorted(tiempos, np.datetime64(desde, "ns"), side="right"))
+            ventana = limite
+            while True:
+                # Cada segundo con muestras aporta al menos una cubeta
+                previos = np.unique(tiempos[max(0, fin - ventana):fin].astype("datetime64[s]"))
+                if len(previos) >= limite or ventana >= fin:
+                    break
+                ventana *= 2
+            segundos.extend(pd.Timestamp(segundo) for segundo in previos[-limite:])
+        segundos = sorted(set(segundos))
+        inicio = segundos[max(0, len(segundos) - 1 - limite)]
+        return min(inicio.floor("s"), inicio.floor(self.grilla))
+
+    def actualizar(self, progreso=_sin_progreso):
+        # Devuelve cuántas filas de self.datos se agregaron o reemplazaron
+        progreso(0.0, "Leyendo líneas nuevas")
+        # Se buscan en cada vuelta: un archivo puede aparecer después de empezar
+        rutas = rutas_registro(self.carpeta)
+        for tipo in ARCHIVOS_REGISTRO:
+            bloque = self._leer_lineas_nuevas(tipo, rutas[tipo])
+            if bloque is None:
+                continue
+            nuevas, informe = leer_archivo_registro(bloque, tipo)
+            acumulado = self.informe[informe["archivo"]]
+            for clave in ("filas", "lineas_malas", "valores_invalidos", "fechas_invalidas"):
+                acumulado[clave] += informe[clave]
+            if self.retenidas[tipo] is not None:
+                nuevas = pd.concat([self.retenidas[tipo], nuevas], ignore_index=True)
+            self.retenidas[tipo] = nuevas
+
+        pendientes = {tipo: df for tipo, df in self.retenidas.items() if df is not None and len(df)}
+        if not pendientes:
+            return 0
+        maximo = max(df["datetime"].max() for df in pendientes.values())
+        corte = maximo - self.tolerancia
+
+        # El último segundo de cada archivo puede estar incompleto y se retiene,
+        # salvo que ese sensor haya quedado atrás (dejó de escribir)
+        desde = self.ultimo_emitido
+        for tipo, df in pendientes.items():
+            ultimo = df["datetime"].max()
+            listas = (df["datetime"] < ultimo) | (df["datetime"] + pd.Timedelta("1s") <= corte)
+            self.retenidas[tipo] = df[~listas]
+            completas = df[listas].astype({"datetime": "datetime64[ns]"})
+            # Líneas con una hora ya emitida: se vuelve a emitir desde su segundo
+            atrasadas = completas["datetime"] < self.cubierto
+            if atrasadas.any():
+                self.informe[ARCHIVOS_REGISTRO[tipo]["archivo"]]["filas_atrasadas"] += int(atrasadas.sum())
+                completas = completas[~atrasadas]
+            if len(completas):
+                atrasada = completas["datetime"].min()
+                if self.grilla is not None:
+                    atrasada = atrasada.floor(self.grilla)
+                desde = min(desde, atrasada - pd.Timedelta(1, "ns"))
+            if self.recientes[tipo] is not None:
+                completas = pd.concat([self.recientes[tipo], completas], ignore_index=True)
+            # Mismo orden que al cargar el archivo completo (estable por hora)
+            if not completas["datetime"].is_monotonic_increasing:
+                completas = completas.sort_values("datetime", kind="stable", ignore_index=True)
+            self.recientes[tipo] = completas
+
+        # Las filas hasta `corte` ya no pueden cambiar con datos futuros
+        for df in self.retenidas.values():
+            if df is not None and len(df):
+                corte = min(corte, df["datetime"].min() - pd.Timedelta(1, "ns"))
+        if self.grilla is not None:
+            corte = corte.floor(self.grilla) - pd.Timedelta(self.grilla)
+        # Un tramo que se vuelve a emitir llega al menos hasta lo ya emitido
+        corte = max(corte, self.ultimo_emitido)
+        if corte <= desde:
+            return 0
+
+        progreso(0.5, "Alineando datos nuevos")
+        # Solo las muestras del tramo y las anteriores que pueden asociarse a él
+        inicio = self._inicio_contexto(desde)
+        recientes = {tipo: df.iloc[df["datetime"].searchsorted(inicio):]
+                     for tipo, df in self.recientes.items() if df is not None}
+        combinado = alinear_series(recientes, self.grilla, self.agregacion)
+        combinado = combinado[(combinado["datetime"] > desde) & (combinado["datetime"] <= corte)]
+        self.ultimo_emitido = corte
+
+        # Conservar las muestras de los últimos RETENCION_VIVO y siempre el
+        # contexto que necesita la próxima alineación
+        limite = min(corte - pd.Timedelta(RETENCION_VIVO), self._inicio_contexto(corte))
+        if limite > self.cubierto:
+            for tipo, df in self.recientes.items():
+                if df is not None:
+                    self.recientes[tipo] = df.iloc[df["datetime"].searchsorted(limite, side="right"):].reset_index(drop=True)
+            self.cubierto = limite + self.tolerancia + pd.Timedelta("1s")
+
+        nuevas = _preparar_sesion(combinado)
+        descartadas = self._buffer.truncar(desde)
+        if nuevas.empty and not descartadas:
+            return 0
+        # El avance del carro de las primeras filas depende de los pulsos anteriores
+        contexto = ()
+        if len(nuevas):
+            inicio = self._buffer.posicion(nuevas.index[0] - pd.Timedelta(seconds=CONTEXTO_AVANCE))
+            contexto = self._buffer.vista(COLUMNAS_MEDIDAS).iloc[inicio:]
+        if len(contexto):
+            unidas = agregar_avance(pd.concat([contexto, nuevas]))
+            nuevas[COLUMNA_AVANCE] = unidas[COLUMNA_AVANCE].to_numpy()[len(contexto):]
+        self._buffer.agregar(nuevas)
+        datos = self._buffer.vista(COLUMNAS_MEDIDAS)
+        datos.attrs["informe_carga"] = list(self.informe.values())
+        self.cambios_desde = desde + pd.Timedelta(1, "ns")
+
+        # Volver a segmentar solo el final: las filas nuevas y las tablas que
+        # seguían en curso o pueden unirse con una nueva (por la tolerancia)
+        progreso(0.8, "Actualizando tablas")
+        margen = pd.Timedelta(seconds=max(self.duracion_minima, self.tolerancia_hueco))
+        desde = (desde if descartadas else nuevas.index[0]) - margen
+        previas = self.tablas
+        if not previas.empty:
+            abiertas = (previas["fin"] >= desde - pd.Timedelta(seconds=self.tolerancia_hueco)) | previas["en_curso"]
+            if abiertas.any():
+                desde = min(desde, previas.loc[abiertas, "inicio"].min())
+            previas = previas[previas["inicio"] < desde]
+        recalculadas = detectar_tablas(datos.iloc[self._buffer.posicion(desde):], self.duracion_minima,
+                                       self.tolerancia_hueco)
+        self.tablas = pd.concat([previas, recalculadas], ignore_index=True) if len(previas) else recalculadas
+        # Las anomalías de las tablas que no se recalcularon tampoco cambian
+        self.anomalias = actualizar_anomalias(self.anomalias, datos, self.tablas, len(previas))
+        self.datos = datos
+        return len(nuevas) + descartadas
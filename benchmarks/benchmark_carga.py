@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+
+import pandas as pd
+
+# Permitir importar el paquete aserradero desde la raíz del repositorio
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import aserradero  # noqa: E402
+
+CARPETA_PRUEBA = os.path.join(RAIZ, "aserradero datos prueba", "datos 13-01-2025")
+REPETICIONES = 5
+
+
+def leer_archivo_anterior(ruta, tipo):
+    # Lectura tal como la hacía cargar_datos_seleccionados antes del cargador dedicado
+    formato = aserradero.ARCHIVOS_REGISTRO[tipo]
+    df = pd.read_csv(ruta, sep=r'\s+', engine='python', on_bad_lines='skip')
+    for col in formato["valores"]:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+    df['datetime'] = pd.to_datetime(df[formato["fecha"]] + ' ' + df[formato["hora"]])
+    return df
+
+
+def medir(funcion, *args):
+    mejor = float("inf")
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        funcion(*args)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def main(carpeta=CARPETA_PRUEBA):
+    motores = ["c"]
+    if aserradero.MOTOR_LECTURA == "pyarrow":
+        motores.append("pyarrow")
+
+    print(f"Carpeta: {carpeta}")
+    print(f"{'archivo':<22}{'filas':>8}{'anterior (s)':>14}" + "".join(f"{m + ' (s)':>14}{'x':>7}" for m in motores))
+    total_anterior = 0.0
+    totales = dict.fromkeys(motores, 0.0)
+    for tipo, formato in aserradero.ARCHIVOS_REGISTRO.items():
+        ruta = os.path.join(carpeta, formato["archivo"])
+        filas = len(aserradero.leer_archivo_registro(ruta, tipo)[0])
+        anterior = medir(leer_archivo_anterior, ruta, tipo)
+        total_anterior += anterior
+        linea = f"{formato['archivo']:<22}{filas:>8}{anterior:>14.4f}"
+        for motor in motores:
+            nuevo = medir(aserradero.leer_archivo_registro, ruta, tipo, motor)
+            totales[motor] += nuevo
+            linea += f"{nuevo:>14.4f}{anterior / nuevo:>7.1f}"
+        print(linea)
+    linea = f"{'total':<22}{'':>8}{total_anterior:>14.4f}"
+    for motor in motores:
+        linea += f"{totales[motor]:>14.4f}{total_anterior / totales[motor]:>7.1f}"
+    print(linea)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,203 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Permitir importar el paquete aserradero desde la raíz del repositorio
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import aserradero  # noqa: E402
+from aserradero.carga import _preparar_sesion  # noqa: E402
+from generar_datos import generar_datos  # noqa: E402
+
+# Días de datos sintéticos de cada escala
+ESCALAS = {"dia": 1, "semana": 7, "mes": 30}
+DIRECTORIO_RESULTADOS = os.path.join(RAIZ, "benchmarks", "resultados")
+# Un paso es una regresión si tarda más que esta fracción sobre la referencia
+UMBRAL_REGRESION = 0.25
+
+
+def medir(funcion, repeticiones=1, memoria=True):
+    # Mejor tiempo de varias repeticiones y, aparte, el pico de memoria que
+    # asigna una ejecución. tracemalloc sigue las asignaciones de numpy y pandas
+    # pero no las de pyarrow, por eso la caché Feather figura casi sin memoria
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        gc.collect()
+        inicio = time.perf_counter()
+        resultado = funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    medida = {"segundos": round(mejor, 4)}
+    if memoria:
+        del resultado
+        gc.collect()
+        tracemalloc.start()
+        resultado = funcion()
+        medida["pico_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        tracemalloc.stop()
+    return resultado, medida
+
+
+def datos_escala(directorio, nombre, dias, horas, tablas):
+    # Los datos generados se reutilizan entre ejecuciones con los mismos parámetros
+    ruta = os.path.join(directorio, f"{nombre}-{dias}d-{horas:g}h-{tablas}t")
+    carpetas = sorted(os.path.join(ruta, carpeta) for carpeta in os.listdir(ruta)) if os.path.isdir(ruta) else []
+    if len(carpetas) != dias:
+        print(f"Generando {dias} días en {ruta}", file=sys.stderr)
+        carpetas = generar_datos(ruta, dias, horas=horas, tablas=tablas)
+    return carpetas
+
+
+def alinear(archivos):
+    # Igual que cargar_lote pero sin caché ni procesos, para medir solo la alineación
+    sesiones = [_preparar_sesion(aserradero.alinear_series(archivo)) for archivo in archivos]
+    return pd.concat(sesiones).sort_index(kind="stable")
+
+
+def medir_escala(carpetas, repeticiones, memoria, directorio_temporal):
+    pasos = {}
+
+    def leer():
+        return [aserradero.leer_archivos_carpeta(carpeta)[0] for carpeta in carpetas]
+
+    archivos, pasos["lectura"] = medir(leer, repeticiones, memoria)
+    datos, pasos["alineacion"] = medir(lambda: alinear(archivos), repeticiones, memoria)
+    archivos = None
+
+    tablas, pasos["segmentacion"] = medir(lambda: aserradero.detectar_tablas(datos, 1.0, 1.0), repeticiones, memoria)
+    eventos, pasos["anomalias"] = medir(lambda: aserradero.detectar_anomalias(datos, tablas), repeticiones, memoria)
+
+    def carro():
+        avance = aserradero.avance_carro(datos["Velocidad (ms)"].to_numpy(), datos.index.to_numpy())
+        return avance, aserradero.ciclos_carro(datos, tablas)
+
+    _, pasos["carro"] = medir(carro, repeticiones, memoria)
+
+    def filtrar():
+        consulta = aserradero.ConsultaTiempo(datos)
+        hora_inicio, hora_fin = aserradero.hora_a_ns("10:00:00"), aserradero.hora_a_ns("11:30:00")
+        return [len(consulta.filtrar("Mañana", madera=1)), len(consulta.filtrar("Noche")),
+                len(consulta.filtrar("Todas", hora_inicio, hora_fin)), len(consulta.filtrar("Tarde", hora_inicio, hora_fin, 0))]
+
+    _, pasos["filtrado"] = medir(filtrar, repeticiones, memoria)
+
+    try:
+        import plotly.express as px
+    except ImportError:
+        px = None
+    if px is not None:
+        def graficar():
+            serie = datos["Corriente"]
+            reducida = aserradero.reducir_serie(serie)
+            fig = px.line(x=reducida.index, y=reducida.to_numpy())
+            return aserradero.escribir_grafico(fig, os.path.join(directorio_temporal, "grafico.html"), [serie])
+
+        _, pasos["graficos"] = medir(graficar, repeticiones, memoria)
+
+        # En un solo proceso, para que el tiempo no dependa de los núcleos de la máquina
+        directorio_informes = os.path.join(directorio_temporal, "informes")
+        _, pasos["informes"] = medir(lambda: aserradero.informes_sesion(datos, directorio_informes, tablas, eventos,
+                                                                        procesos=1), repeticiones, memoria)
+
+    if aserradero.MOTOR_LECTURA == "pyarrow":
+        from aserradero.cache import guardar_cache_sesion, leer_cache_sesion
+        ruta_cache = os.path.join(directorio_temporal, "sesion-0.feather")
+        _, pasos["cache_escritura"] = medir(lambda: guardar_cache_sesion(datos, ruta_cache), repeticiones, memoria)
+        _, pasos["cache_lectura"] = medir(lambda: leer_cache_sesion(ruta_cache), repeticiones, memoria)
+
+    return {"dias": len(carpetas), "filas": len(datos), "tablas": len(tablas),
+            "memoria_sesion_mb": round(aserradero.informe_memoria(datos)["total"] / 2**20, 2), "pasos": pasos}
+
+
+def version_repositorio():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocida"
+
+
+def comparar(actual, referencia, umbral=UMBRAL_REGRESION):
+    # Imprime la relación de tiempos con la referencia y devuelve las regresiones
+    regresiones = []
+    for escala, resultado in actual["escalas"].items():
+        previo = referencia.get("escalas", {}).get(escala)
+        if previo is None:
+            continue
+        for paso, medida in resultado["pasos"].items():
+            if paso not in previo["pasos"]:
+                continue
+            antes = previo["pasos"][paso]["segundos"]
+            relacion = medida["segundos"] / antes if antes else float("inf")
+            marca = "  <-- regresión" if relacion > 1 + umbral else ""
+            print(f"{escala:<8}{paso:<18}{antes:>10.4f}{medida['segundos']:>10.4f}{relacion:>8.2f}x{marca}")
+            if marca:
+                regresiones.append((escala, paso, relacion))
+    return regresiones
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Mide carga, alineación, segmentación, anomalías, filtrado y gráficos "
+                                                 "sobre datos sintéticos de 1 día, 1 semana y 1 mes.")
+    parser.add_argument("--escalas", nargs="*", choices=list(ESCALAS), default=list(ESCALAS))
+    parser.add_argument("--horas", type=float, default=8.0, help="Horas de trabajo por día")
+    parser.add_argument("--tablas", type=int, default=60, help="Tablas por día")
+    parser.add_argument("--repeticiones", type=int, default=1)
+    parser.add_argument("--sin-memoria", action="store_true", help="No medir el pico de memoria (más rápido)")
+    parser.add_argument("--datos", default=os.path.join(tempfile.gettempdir(), "daser_sintetico"),
+                        help="Carpeta donde se generan y reutilizan los datos sintéticos")
+    parser.add_argument("--salida", help="Archivo JSON de resultados (por defecto en benchmarks/resultados)")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior para detectar regresiones")
+    parser.add_argument("--umbral", type=float, default=UMBRAL_REGRESION)
+    args = parser.parse_args(argumentos)
+
+    resultados = {
+        "version": version_repositorio(),
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "entorno": {"python": platform.python_version(), "plataforma": platform.platform(),
+                    "procesador": platform.processor(), "nucleos": os.cpu_count(), "numpy": np.__version__,
+                    "pandas": pd.__version__, "motor_lectura": aserradero.MOTOR_LECTURA},
+        "parametros": {"horas": args.horas, "tablas": args.tablas, "repeticiones": args.repeticiones},
+        "escalas": {},
+    }
+    with tempfile.TemporaryDirectory() as directorio_temporal:
+        for escala in args.escalas:
+            carpetas = datos_escala(args.datos, escala, ESCALAS[escala], args.horas, args.tablas)
+            print(f"Midiendo {escala} ({len(carpetas)} días)", file=sys.stderr)
+            resultado = medir_escala(carpetas, args.repeticiones, not args.sin_memoria, directorio_temporal)
+            resultados["escalas"][escala] = resultado
+            print(f"{escala}: {resultado['filas']} filas, {resultado['tablas']} tablas, "
+                  f"{resultado['memoria_sesion_mb']} MB en memoria")
+            for paso, medida in resultado["pasos"].items():
+                pico = f"{medida['pico_mb']:>10.1f} MB" if "pico_mb" in medida else ""
+                print(f"  {paso:<18}{medida['segundos']:>10.4f} s{pico}")
+
+    salida = args.salida or os.path.join(
+        DIRECTORIO_RESULTADOS, f"escalado-{datetime.now():%Y%m%d-%H%M%S}-{resultados['version']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as archivo:
+        json.dump(resultados, archivo, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as archivo:
+            referencia = json.load(archivo)
+        print(f"\nComparación con {referencia.get('version')} ({referencia.get('fecha')}):")
+        if comparar(resultados, referencia, args.umbral):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+import os
+import shutil
+import sys
+import tempfile
+
+# Permitir importar el paquete aserradero desde la raíz del repositorio
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import aserradero  # noqa: E402
+
+CARPETA_PRUEBA = os.path.join(RAIZ, "aserradero datos prueba", "datos 13-01-2025")
+VENTANAS = [("2025-01-13 11:30:00", "2025-01-13 11:31:00"), ("2025-01-10 15:20:00", "2025-01-10 15:40:00")]
+
+
+def comparar(carpeta, etiqueta):
+    # Las tablas de una ventana deben ser las detectadas en ella, no las de la carpeta entera
+    correcto = True
+    for desde, hasta in VENTANAS:
+        datos = aserradero.cargar_ventana(carpeta, desde, hasta)
+        tablas = aserradero.tablas_sesion(datos)
+        esperadas = aserradero.detectar_tablas(datos)
+        iguales = tablas[["inicio", "fin"]].reset_index(drop=True).equals(esperadas[["inicio", "fin"]])
+        correcto = correcto and iguales
+        print(f"{etiqueta:<14}{desde} - {hasta[11:]}{len(datos):>8} filas{len(tablas):>4} tablas "
+              f"{'iguales' if iguales else 'DISTINTAS'}")
+    return correcto
+
+
+def main(carpeta=CARPETA_PRUEBA):
+    print(f"Carpeta: {carpeta}")
+    correcto = comparar(carpeta, "sin archivar")
+    # Una copia archivada lee solo los bloques de la ventana
+    temporal = tempfile.mkdtemp()
+    try:
+        copia = os.path.join(temporal, os.path.basename(carpeta))
+        shutil.copytree(carpeta, copia)
+        aserradero.archivar_carpeta(copia)
+        correcto = comparar(copia, "archivada") and correcto
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
+    return 0 if correcto else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(*sys.argv[1:2]))
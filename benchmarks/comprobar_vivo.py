@@ -0,0 +1,84 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# Permitir importar el paquete aserradero desde la raíz del repositorio
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import aserradero  # noqa: E402
+
+CARPETA_PRUEBA = os.path.join(RAIZ, "aserradero datos prueba", "datos 13-01-2025")
+ENCUESTAS = 200
+# Sin tolerancia, como en la interfaz: cada tabla cierra en su último segundo
+TOLERANCIA_HUECO = 0.0
+
+
+def leer_lineas(carpeta):
+    # Líneas de cada archivo y, para cada una, la hora más alta escrita hasta
+    # ella: la máquina escribe en orden aunque el reloj del registro retroceda
+    archivos = {}
+    for ruta in aserradero.rutas_registro(carpeta).values():
+        if not os.path.exists(ruta):
+            continue
+        with open(ruta, "rb") as f:
+            lineas = f.read().splitlines(keepends=True)
+        campos = pd.Series([linea.decode("latin-1") for linea in lineas[1:]]).str.split(n=2, expand=True)
+        horas = pd.to_datetime(campos[0] + " " + campos[1], format="%Y/%m/%d %H:%M:%S", errors="coerce")
+        horas = horas.ffill().bfill().to_numpy(dtype="datetime64[ns]")
+        archivos[os.path.basename(ruta)] = (lineas, np.maximum.accumulate(horas))
+    return archivos
+
+
+def reproducir(archivos, destino, grilla, encuestas):
+    # Escribe los archivos por partes, como la máquina, y actualiza en cada parte
+    seguidor = aserradero.SeguidorEnVivo(destino, grilla=grilla, tolerancia_hueco=TOLERANCIA_HUECO)
+    horas = np.sort(np.concatenate([maximos for _, maximos in archivos.values()]))
+    escritas = dict.fromkeys(archivos, 0)
+    peor = 0.0
+    for corte in horas[np.linspace(0, len(horas) - 1, encuestas).astype(int)]:
+        for nombre, (lineas, maximos) in archivos.items():
+            hasta = 1 + int(np.searchsorted(maximos, corte, side="right"))
+            if hasta > max(1, escritas[nombre]):
+                with open(os.path.join(destino, nombre), "ab") as f:
+                    f.writelines(lineas[escritas[nombre]:hasta])
+                escritas[nombre] = hasta
+        inicio = time.perf_counter()
+        seguidor.actualizar()
+        peor = max(peor, time.perf_counter() - inicio)
+    return seguidor, peor
+
+
+def main(carpeta=CARPETA_PRUEBA, encuestas=ENCUESTAS):
+    print(f"Carpeta: {carpeta} ({encuestas} actualizaciones)")
+    archivos = leer_lineas(carpeta)
+    correcto = True
+    for nombre, grilla in aserradero.RESOLUCIONES.items():
+        destino = tempfile.mkdtemp()
+        try:
+            seguidor, peor = reproducir(archivos, destino, grilla, encuestas)
+        finally:
+            shutil.rmtree(destino, ignore_errors=True)
+        # Lo emitido en vivo debe coincidir con la carga completa hasta donde llegó
+        completo = aserradero.cargar_sesion(carpeta, grilla)
+        datos = seguidor.datos
+        esperado = completo.loc[:datos.index[-1]] if len(datos) else completo.iloc[:0]
+        iguales = esperado.index.equals(datos.index) and np.allclose(
+            esperado.to_numpy(np.float64), datos.to_numpy(np.float64))
+        tablas = aserradero.detectar_tablas(esperado, 0.0, TOLERANCIA_HUECO)
+        columnas = ["inicio", "fin", "en_curso"]
+        tablas_iguales = seguidor.tablas[columnas].reset_index(drop=True).equals(tablas[columnas])
+        correcto = correcto and iguales and tablas_iguales
+        print(f"{nombre:<20}{len(datos):>8} de {len(completo):<8} filas {'iguales' if iguales else 'DISTINTAS':<10}"
+              f"{len(seguidor.tablas):>4} tablas {'iguales' if tablas_iguales else 'DISTINTAS':<10}"
+              f"peor actualización {peor:.3f} s")
+    return 0 if correcto else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(*sys.argv[1:2], *[int(n) for n in sys.argv[2:3]]))
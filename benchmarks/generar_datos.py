@@ -0,0 +1,152 @@
+import argparse
+import os
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# Genera carpetas "datos DD-MM-YYYY" con Corr.txt, registro_laser.txt y
+# Velocidad.txt parecidas a las de "aserradero datos prueba": mismas cabeceras,
+# formatos de fecha y hora, frecuencias de muestreo y errores típicos
+# ("/0.03", líneas con un campo de más, "Stopped")
+
+FRECUENCIA_CORRIENTE = 13   # muestras por segundo en Corr.txt
+FRECUENCIA_LASER = 6        # muestras por segundo en registro_laser.txt
+INTERVALO_STOPPED = 2       # segundos entre líneas "Stopped" con el carro detenido
+
+
+def _muestras_por_segundo(rng, segundos, frecuencia):
+    # Cantidad de líneas que escribe el sensor en cada segundo
+    return rng.poisson(frecuencia, len(segundos))
+
+
+def _texto_fecha_hora(instantes, rellenar):
+    # "2025/01/13 09:05:07" o, como Velocidad.txt, "2025/1/13 9:5:7". Se formatea
+    # solo cada segundo distinto y luego se repite, que es mucho más rápido
+    unicos, inversa = np.unique(instantes, return_inverse=True)
+    tiempos = pd.to_datetime(unicos, unit="s")
+    if rellenar:
+        textos = tiempos.strftime("%Y/%m/%d %H:%M:%S")
+    else:
+        textos = pd.Index([f"{t.year}/{t.month}/{t.day} {t.hour}:{t.minute}:{t.second}" for t in tiempos])
+    return np.asarray(textos, dtype=object)[inversa]
+
+
+def _tramos_tablas(rng, inicio, fin, tablas):
+    # Tablas repartidas en la jornada, de 3 a 15 s y sin solaparse
+    duraciones = rng.uniform(3, 15, tablas)
+    libre = (fin - inicio) - duraciones.sum() - 60 * tablas
+    if libre <= 0:
+        raise ValueError("Demasiadas tablas para las horas indicadas.")
+    huecos = rng.dirichlet(np.ones(tablas + 1)) * libre + 30
+    comienzos = inicio + np.cumsum(huecos[:-1]) + np.concatenate([[0], np.cumsum(duraciones[:-1] + 30)])
+    return comienzos, comienzos + duraciones
+
+
+def _dentro(instantes, comienzos, finales):
+    posicion = np.searchsorted(comienzos, instantes, side="right") - 1
+    return (posicion >= 0) & (instantes < finales[np.maximum(posicion, 0)])
+
+
+def generar_carpeta(carpeta, dia, horas=8.0, hora_inicio=8, tablas=60, frecuencia_corriente=FRECUENCIA_CORRIENTE,
+                    frecuencia_laser=FRECUENCIA_LASER, errores=True, semilla=0):
+    rng = np.random.default_rng(semilla)
+    os.makedirs(carpeta, exist_ok=True)
+    # Segundos desde 1970 sin zona horaria, igual que los interpreta pandas
+    inicio = int(pd.Timestamp(datetime(dia.year, dia.month, dia.day, hora_inicio)).timestamp())
+    fin = inicio + int(horas * 3600)
+    segundos = np.arange(inicio, fin)
+    comienzos, finales = _tramos_tablas(rng, inicio, fin, tablas)
+    # El carro se mueve desde un poco antes hasta un poco después de cada tabla
+    marcha_desde, marcha_hasta = comienzos - 20, finales + 15
+
+    # Corr.txt: corriente del motor, alta al cortar y con picos
+    instantes = np.repeat(segundos, _muestras_por_segundo(rng, segundos, frecuencia_corriente))
+    fraccion = rng.random(len(instantes))
+    corriente = np.abs(rng.normal(0.15, 0.1, len(instantes)))
+    en_marcha = _dentro(instantes + fraccion, marcha_desde, marcha_hasta)
+    corriente[en_marcha] = rng.normal(6, 1, en_marcha.sum())
+    cortando = _dentro(instantes + fraccion, comienzos, finales)
+    corriente[cortando] = rng.normal(17, 1.5, cortando.sum())
+    picos = cortando & (rng.random(len(instantes)) < 0.01)
+    corriente[picos] = rng.uniform(22, 28, picos.sum())
+    valores = np.char.mod("%.2f", np.abs(corriente)).astype(object)
+    lineas = _texto_fecha_hora(instantes, rellenar=True) + " " + valores
+    if errores:
+        # Valores con una barra delante y algunas líneas con un campo de más
+        malos = rng.random(len(lineas)) < 0.002
+        lineas[malos] = _texto_fecha_hora(instantes[malos], rellenar=True) + " /" + valores[malos]
+        extra = np.flatnonzero(rng.random(len(lineas)) < 0.0001)
+        lineas[extra] = lineas[extra] + " " + valores[extra]
+    _escribir(os.path.join(carpeta, "Corr.txt"), "Fecha Hora Corriente", lineas)
+
+    # registro_laser.txt: temperatura, distancia a la madera y bandera Madera
+    instantes = np.repeat(segundos, _muestras_por_segundo(rng, segundos, frecuencia_laser))
+    fraccion = rng.random(len(instantes))
+    horas_dia = (instantes - inicio) / 3600
+    temperatura = 27.5 + 1.5 * np.sin(horas_dia / horas * np.pi) + rng.normal(0, 0.03, len(instantes))
+    madera = _dentro(instantes + fraccion, comienzos, finales)
+    distancia = np.where(madera, rng.normal(292, 3, len(instantes)), rng.normal(320, 2, len(instantes))).round()
+    lineas = (_texto_fecha_hora(instantes, rellenar=True) + " " + np.char.mod("%.2f", temperatura).astype(object)
+              + " " + np.char.mod("%.2f", distancia).astype(object) + " " + madera.astype(int).astype(str).astype(object))
+    _escribir(os.path.join(carpeta, "registro_laser.txt"), "Fecha Hora Temperatura(ºC) Distancia(mm) Madera", lineas)
+
+    # Velocidad.txt: un contador en ms por cada pulso del carro; "Stopped" cada
+    # 2 s mientras está detenido. El contador empieza en cero cada día
+    pulsos = []
+    for desde, hasta in zip(marcha_desde, marcha_hasta):
+        intervalos = rng.uniform(0.25, 0.7, int((hasta - desde) / 0.25) + 1)
+        tiempos = desde + np.cumsum(intervalos)
+        pulsos.append(tiempos[tiempos < hasta])
+    pulsos = np.concatenate(pulsos) if pulsos else np.array([])
+    detenido = np.arange(inicio, fin, INTERVALO_STOPPED, dtype=np.float64)
+    detenido = detenido[~_dentro(detenido, marcha_desde, marcha_hasta)]
+    instantes = np.concatenate([pulsos, detenido])
+    orden = np.argsort(instantes, kind="stable")
+    instantes = instantes[orden]
+    contador = np.concatenate([((pulsos - inicio) * 1000).astype(np.int64).astype(str), np.full(len(detenido), "Stopped")])[orden]
+    lineas = _texto_fecha_hora(instantes.astype(np.int64), rellenar=False) + " " + contador.astype(object)
+    _escribir(os.path.join(carpeta, "Velocidad.txt"), "Date Time Milliseconds", lineas)
+    return carpeta
+
+
+def _escribir(ruta, cabecera, lineas):
+    with open(ruta, "w", encoding="utf-8", newline="\n") as archivo:
+        archivo.write(cabecera + "\n")
+        archivo.write("\n".join(lineas))
+        archivo.write("\n")
+
+
+def generar_datos(ruta_base, dias=1, desde=date(2025, 1, 13), semilla=0, **opciones):
+    # Una carpeta por día, con la misma estructura que espera la aplicación
+    carpetas = []
+    for numero in range(dias):
+        dia = desde + timedelta(days=numero)
+        carpeta = os.path.join(ruta_base, f"datos {dia:%d-%m-%Y}")
+        carpetas.append(generar_carpeta(carpeta, dia, semilla=semilla + numero, **opciones))
+    return carpetas
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Genera registros sintéticos del aserradero.")
+    parser.add_argument("ruta", help="Carpeta donde se crean las carpetas 'datos DD-MM-YYYY'")
+    parser.add_argument("--dias", type=int, default=1)
+    parser.add_argument("--desde", default="13-01-2025", help="Primer día DD-MM-YYYY")
+    parser.add_argument("--horas", type=float, default=8.0, help="Horas de trabajo por día")
+    parser.add_argument("--tablas", type=int, default=60, help="Tablas cortadas por día")
+    parser.add_argument("--frecuencia-corriente", type=float, default=FRECUENCIA_CORRIENTE)
+    parser.add_argument("--frecuencia-laser", type=float, default=FRECUENCIA_LASER)
+    parser.add_argument("--sin-errores", action="store_true", help="No agregar líneas mal formadas")
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args(argumentos)
+
+    desde = datetime.strptime(args.desde, "%d-%m-%Y").date()
+    carpetas = generar_datos(args.ruta, args.dias, desde, args.semilla, horas=args.horas, tablas=args.tablas,
+                             frecuencia_corriente=args.frecuencia_corriente, frecuencia_laser=args.frecuencia_laser,
+                             errores=not args.sin_errores)
+    for carpeta in carpetas:
+        print(carpeta)
+
+
+if __name__ == "__main__":
+    main()